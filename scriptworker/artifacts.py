@@ -4,8 +4,6 @@ Importing this script updates the mimetypes database. This maps some known exten
 in S3.
 
 """
-import aiohttp
-import arrow
 import asyncio
 import gzip
 import logging
@@ -16,9 +14,15 @@ from urllib.parse import unquote, urljoin
 
 from scriptworker.client import validate_artifact_url
 from scriptworker.exceptions import ScriptWorkerRetryException, ScriptWorkerTaskException
+from scriptworker.lazy import lazy_import
+from scriptworker.metrics import BYTES_UPLOADED
 from scriptworker.task import get_task_id, get_run_id, get_decision_task_id
+from scriptworker.timing import timed
 from scriptworker.utils import download_file, filepaths_in_dir, raise_future_exceptions, retry_async
 
+aiohttp = lazy_import("aiohttp")
+arrow = lazy_import("arrow")
+
 
 log = logging.getLogger(__name__)
 
@@ -63,7 +67,8 @@ async def upload_artifacts(context):
     for target_path in filepaths_in_dir(context.config['artifact_dir']):
         path = os.path.join(context.config['artifact_dir'], target_path)
 
-        content_type, content_encoding = compress_artifact_if_supported(path)
+        with timed(context, "upload_artifacts.compress"):
+            content_type, content_encoding = compress_artifact_if_supported(path)
         file_list[target_path] = {
             'path': path,
             'target_path': target_path,
@@ -202,6 +207,7 @@ async def create_artifact(context, path, target_path, content_type, content_enco
                     raise ScriptWorkerRetryException(
                         "Bad status {}".format(resp.status),
                     )
+    BYTES_UPLOADED.inc(os.path.getsize(path))
 
 
 def _craft_artifact_put_headers(content_type, encoding=None):
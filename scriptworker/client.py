@@ -6,13 +6,26 @@ scriptworker.exceptions and scriptworker.constants, or other standalone
 modules, to avoid circular imports.
 
 """
-import jsonschema
+import json
 import os
+from collections import OrderedDict
 
 from scriptworker.constants import STATUSES
 from scriptworker.exceptions import ScriptWorkerTaskException
+from scriptworker.lazy import lazy_import
 from scriptworker.utils import load_json, match_url_regex
 
+jsonschema = lazy_import("jsonschema")
+
+# The most recently used compiled validators, keyed by ``id(schema)``.
+# Each value is a ``(schema, validator)`` tuple; holding on to the schema keeps
+# its ``id`` from being reused while it's cached.
+_VALIDATOR_CACHE = OrderedDict()
+_VALIDATOR_CACHE_SIZE = 32
+# The schemas loaded by ``load_json_schema``, keyed by absolute path.
+# Each value is a ``((st_mtime_ns, st_size), schema)`` tuple.
+_SCHEMA_FILE_CACHE = {}
+
 
 def get_task(config):
     """Read the task.json from work_dir.
@@ -33,6 +46,73 @@ def get_task(config):
     return contents
 
 
+def load_json_schema(path, exception=ScriptWorkerTaskException,
+                     message="Can't read schema file %(path)s: %(exc)s"):
+    """Load a jsonschema from a file, cached until the file changes.
+
+    The same schema dict is returned while the file's mtime and size are
+    unchanged, so ``validate_json_schema`` can reuse its compiled validator.
+
+    Args:
+        path (str): the path to the json schema file.
+        exception (exception, optional): the exception to raise on failure.
+            Defaults to ScriptWorkerTaskException.
+        message (str, optional): the message to use for the exception.
+            Defaults to "Can't read schema file %(path)s: %(exc)s"
+
+    Returns:
+        dict: the schema.
+
+    Raises:
+        Exception: as specified, on failure
+
+    """
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = _SCHEMA_FILE_CACHE.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        with open(path, "r") as fh:
+            schema = json.load(fh)
+    except (OSError, ValueError) as exc:
+        raise exception(message % {'path': path, 'exc': str(exc)})
+    _SCHEMA_FILE_CACHE[path] = (signature, schema)
+    return schema
+
+
+def get_schema_validator(schema):
+    """Return a compiled jsonschema validator for ``schema``.
+
+    The schema is checked against its metaschema once, when its validator is
+    built.  Validators are cached by the identity of the schema dict, so
+    callers shouldn't modify a schema in place after validating against it.
+
+    Args:
+        schema (dict): the jsonschema.
+
+    Returns:
+        jsonschema.IValidator: the validator.
+
+    Raises:
+        jsonschema.exceptions.SchemaError: if the schema is invalid.
+
+    """
+    key = id(schema)
+    cached = _VALIDATOR_CACHE.get(key)
+    if cached is not None and cached[0] is schema:
+        _VALIDATOR_CACHE.move_to_end(key)
+        return cached[1]
+    cls = jsonschema.validators.validator_for(schema)
+    cls.check_schema(schema)
+    validator = cls(schema)
+    _VALIDATOR_CACHE[key] = (schema, validator)
+    while len(_VALIDATOR_CACHE) > _VALIDATOR_CACHE_SIZE:
+        _VALIDATOR_CACHE.popitem(last=False)
+    return validator
+
+
 def validate_json_schema(data, schema, name="task"):
     """Given data and a jsonschema, let's validate it.
 
@@ -49,7 +129,7 @@ def validate_json_schema(data, schema, name="task"):
 
     """
     try:
-        jsonschema.validate(data, schema)
+        get_schema_validator(schema).validate(data)
     except jsonschema.exceptions.ValidationError as exc:
         raise ScriptWorkerTaskException(
             "Can't validate {} schema!\n{}".format(name, str(exc)),
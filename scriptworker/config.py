@@ -14,13 +14,15 @@ import logging
 import os
 import re
 import sys
-from yaml import safe_load
 
-from scriptworker.constants import DEFAULT_CONFIG
+from scriptworker.constants import DEFAULT_CONFIG, STATUSES
 from scriptworker.context import Context
+from scriptworker.lazy import lazy_import
 from scriptworker.log import update_logging_config
 from scriptworker.utils import load_json
 
+yaml = lazy_import("yaml")
+
 log = logging.getLogger(__name__)
 
 CREDS_FILES = (
@@ -144,6 +146,8 @@ def check_config(config, path):
             messages.append("{} needs to start with %(gpg_home)s/ to be portable!".format(key))
         if key in ("provisioner_id", "worker_group", "worker_type", "worker_id") and not _is_id_valid(value):
             messages.append('{} doesn\'t match "{}" (required by Taskcluster)'.format(key, _GENERIC_ID_REGEX.pattern))
+        if key == "task_limit_breach_status" and STATUSES.get(value, 0) == 0:
+            messages.append("{} {} isn't a failing status in STATUSES!".format(key, value))
     return messages
 
 
@@ -172,7 +176,7 @@ def create_config(config_path="scriptworker.yaml"):
         print("{} doesn't exist! Exiting...".format(config_path), file=sys.stderr)
         sys.exit(1)
     with open(config_path, "r", encoding="utf-8") as fh:
-        secrets = safe_load(fh)
+        secrets = yaml.safe_load(fh)
     config = dict(deepcopy(DEFAULT_CONFIG))
     if not secrets.get("credentials"):
         secrets['credentials'] = read_worker_creds()
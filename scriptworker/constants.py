@@ -32,16 +32,48 @@ DEFAULT_CONFIG = frozendict({
         "accessToken": "...",
         "certificate": "...",
     }),
+    # if set, talk to the queue at this base url instead of the production
+    # queue, e.g. a local fake queue for load testing
+    "taskcluster_queue_url": "",
 
     # Worker log settings
     "log_datefmt": "%Y-%m-%dT%H:%M:%S",
     "log_fmt": "%(asctime)s %(levelname)8s - %(message)s",
     "log_max_bytes": 1024 * 1024 * 512,
     "log_num_backups": 10,
+    # format and write the worker log in a separate thread, so log calls
+    # don't block the event loop on file i/o or log rotation
+    "log_via_queue": False,
 
     # intervals are expressed in seconds
     "artifact_expiration_hours": 24,
     "task_max_timeout": 60 * 20,
+    # after task_max_timeout, the task script's process group gets SIGTERM,
+    # then SIGKILL this many seconds later
+    "task_kill_grace_period": 10,
+    # resource limits for each process in the task script, set with
+    # setrlimit; 0 means unlimited.  task_rlimit_as is in bytes, and
+    # task_rlimit_cpu is in seconds.
+    "task_rlimit_as": 0,
+    "task_rlimit_cpu": 0,
+    "task_rlimit_nofile": 0,
+    # if set, run each task script in a new cgroup v2 cgroup under this
+    # delegated cgroup, e.g. /sys/fs/cgroup/scriptworker, limited to
+    # task_cgroup_memory_max bytes and task_cgroup_cpu_max_percent of one
+    # cpu; 0 means unlimited.
+    "task_cgroup_parent": "",
+    "task_cgroup_memory_max": 0,
+    "task_cgroup_cpu_max_percent": 0,
+    # the STATUSES name to report when the task script is ended by one of the
+    # limits above, so breaches stand out from ordinary task failures
+    "task_limit_breach_status": "resource-unavailable",
+    # fork each task script from a pre-warmed python interpreter instead of
+    # exec'ing it.  task_script must be (python, script, args...); the
+    # zygote imports task_zygote_preload_modules once, up front.  If it isn't
+    # ready within task_zygote_start_timeout seconds, task scripts are exec'ed.
+    "task_zygote_enabled": False,
+    "task_zygote_preload_modules": (),
+    "task_zygote_start_timeout": 60,
     "reclaim_interval": 300,
     "poll_interval": 5,
     "sign_key_timeout": 60 * 2,
@@ -50,11 +82,46 @@ DEFAULT_CONFIG = frozendict({
 
     "verbose": True,
 
+    # serve worker metrics in the Prometheus text format at
+    # http://metrics_host:metrics_port/metrics, or on the unix socket
+    # metrics_unix_socket if it's set.
+    "metrics_enabled": False,
+    "metrics_host": "127.0.0.1",
+    "metrics_port": 9560,
+    "metrics_unix_socket": "",
+    # sample the event loop lag every loop_lag_interval seconds, and log the
+    # loop thread's stack when it's blocked for more than loop_lag_threshold
+    "loop_lag_monitor_enabled": False,
+    "loop_lag_interval": 0.25,
+    "loop_lag_threshold": 0.5,
+    # if set, run the loop in asyncio debug mode, which logs callbacks that
+    # take longer than this many seconds
+    "asyncio_slow_callback_duration": 0.0,
+
     # Task settings
     "work_dir": "...",
     "log_dir": "...",
     "artifact_dir": "...",
     "task_log_dir": "...",  # set this to ARTIFACT_DIR/public/logs
+    # the task output is read in chunks of up to this many bytes
+    "task_log_chunk_size": 64 * 1024,
+    # the maximum number of task output lines per second to copy into the
+    # worker log; the task log always gets every line.  0 means no limit.
+    "task_log_max_lines_per_second": 0,
+    # the task log keeps the first task_log_head_bytes and the last
+    # task_log_tail_bytes of the task output, and drops the rest
+    "task_log_head_bytes": 1024 * 1024 * 50,
+    "task_log_tail_bytes": 1024 * 1024 * 50,
+    # also upload each task's phase timing record as task_log_dir/timing.json.
+    # It's written before the chain of trust artifact, so it stops at run_task.
+    "task_timing_artifact": False,
+    # serve the task log over http at http://live_log_host:live_log_port/live_backing.log
+    # while the task is running.  A live log client that falls more than
+    # live_log_max_pending_bytes behind is disconnected.
+    "live_log_enabled": False,
+    "live_log_host": "127.0.0.1",
+    "live_log_port": 60099,
+    "live_log_max_pending_bytes": 1024 * 1024 * 10,
     "git_commit_signing_pubkey_dir": "...",
     "artifact_upload_timeout": 60 * 20,
     "aiohttp_max_connections": 15,
@@ -78,6 +145,14 @@ DEFAULT_CONFIG = frozendict({
     # Boolean to use the gpg agent
     "gpg_use_agent": False,
     "gpg_encoding": 'utf-8',
+    # The number of key files to import per gpg call when rebuilding gpg homedirs
+    "gpg_import_batch_size": 100,
+    # The max number of processes to build the ``gpg_homedirs`` in; 1 builds
+    # them sequentially in-process
+    "gpg_homedir_build_processes": 4,
+    # Update the gpg homedirs from the git diff of the key repo when possible,
+    # rather than rebuilding them from scratch
+    "gpg_homedir_incremental_rebuild": True,
 
     "base_gpg_home_dir": "...",
     "gpg_lockfile": os.path.join(os.getcwd(), "gpg_homedir.lock"),
@@ -89,6 +164,10 @@ DEFAULT_CONFIG = frozendict({
     "my_email": "scriptworker@example.com",
 
     "chain_of_trust_hash_algorithm": "sha256",
+    # the number of threads to hash the chain of trust artifacts in
+    "chain_of_trust_hash_threads": 4,
+    # add the task script's resource usage to the chain of trust environment
+    "cot_environment_resource_usage": False,
     "cot_schema_path": os.path.join(os.path.dirname(__file__), "data", "cot_v1_schema.json"),
 
     # for download url validation.  The regexes need to define a 'filepath'.
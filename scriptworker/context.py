@@ -9,14 +9,16 @@ Attributes:
     log (logging.Logger): the log object for the module.
 
 """
-import arrow
 from copy import deepcopy
 import json
 import logging
 import os
 
+from scriptworker.lazy import lazy_import
 from scriptworker.utils import makedirs
-from taskcluster.async import Queue
+
+arrow = lazy_import("arrow")
+taskcluster_async = lazy_import("taskcluster.async")
 
 log = logging.getLogger(__name__)
 
@@ -36,10 +38,16 @@ class Context(object):
             the process object.
         queue (taskcluster.async.Queue): the taskcluster Queue object
             containing the scriptworker credentials.
+        resource_usage (dict): the resource usage of the current task's
+            task script, once it's finished.
         session (aiohttp.ClientSession): the default aiohttp session
         task (dict): the task definition for the current task.
         temp_queue (taskcluster.async.Queue): the taskcluster Queue object
             containing the task-specific temporary credentials.
+        timer (scriptworker.timing.TaskTimer): the phase timer for the
+            current task, if any.
+        zygote (scriptworker.zygote.Zygote): the zygote that launches task
+            scripts, if ``task_zygote_enabled`` is set.
 
     """
 
@@ -47,9 +55,12 @@ class Context(object):
     credentials_timestamp = None
     proc = None
     queue = None
+    resource_usage = None
     session = None
     task = None
     temp_queue = None
+    timer = None
+    zygote = None
     _credentials = None
     _claim_task = None  # This assumes a single task per worker.
     _temp_credentials = None  # This assumes a single task per worker.
@@ -63,8 +74,8 @@ class Context(object):
         info.
 
         When setting ``claim_task``, we also set ``self.task`` and
-        ``self.temp_credentials``, zero out ``self.reclaim_task`` and ``self.proc``,
-        then write a task.json to disk.
+        ``self.temp_credentials``, zero out ``self.reclaim_task``, ``self.proc``
+        and ``self.resource_usage``, then write a task.json to disk.
 
         """
         return self._claim_task
@@ -74,6 +85,7 @@ class Context(object):
         self._claim_task = claim_task
         self.reclaim_task = None
         self.proc = None
+        self.resource_usage = None
         if claim_task:
             self.task = claim_task['task']
             self.temp_credentials = claim_task['credentials']
@@ -110,9 +122,10 @@ class Context(object):
 
         """
         if credentials:
-            return Queue({
-                'credentials': credentials,
-            }, session=self.session)
+            options = {'credentials': credentials}
+            if self.config and self.config['taskcluster_queue_url']:
+                options['baseUrl'] = self.config['taskcluster_queue_url']
+            return taskcluster_async.Queue(options, session=self.session)
 
     @property
     def reclaim_task(self):
@@ -7,39 +7,56 @@ Attributes:
 """
 import logging
 import os
-from scriptworker.client import validate_json_schema
+from concurrent.futures import ThreadPoolExecutor
+from scriptworker.client import load_json_schema, validate_json_schema
 from scriptworker.exceptions import ScriptWorkerException
 from scriptworker.gpg import GPG, sign
-from scriptworker.utils import filepaths_in_dir, format_json, get_hash, load_json
+from scriptworker.utils import format_json, get_hashes, scan_dir
 
 log = logging.getLogger(__name__)
 
 
 # get_cot_artifacts {{{1
-def get_cot_artifacts(context):
+def get_cot_artifacts(context, hash_algs=None):
     """Generate the artifact relative paths and shas for the chain of trust.
 
+    The artifacts are hashed in ``chain_of_trust_hash_threads`` threads, and
+    each file is read once for all of ``hash_algs``.
+
     Args:
         context (scriptworker.context.Context): the scriptworker context.
+        hash_algs (list, optional): the hash algorithms to use.  If None, use
+            ``chain_of_trust_hash_algorithm``.  Defaults to None.
 
     Returns:
         dict: a dictionary of {"path/to/artifact": {"hash_alg": "..."}, ...}
 
     """
-    artifacts = {}
-    filepaths = filepaths_in_dir(context.config['artifact_dir'])
-    hash_alg = context.config['chain_of_trust_hash_algorithm']
-    for filepath in sorted(filepaths):
+    hash_algs = hash_algs or (context.config['chain_of_trust_hash_algorithm'], )
+    # hash the largest files first, so one big file doesn't finish last
+    files = sorted(scan_dir(context.config['artifact_dir']), key=lambda f: f[1].st_size, reverse=True)
+
+    def _hash(file_):
+        filepath, stat = file_
         path = os.path.join(context.config['artifact_dir'], filepath)
-        sha = get_hash(path, hash_alg=hash_alg)
-        artifacts[filepath] = {hash_alg: sha}
-    return artifacts
+        return filepath, get_hashes(path, hash_algs=hash_algs, stat=stat)
+
+    num_threads = min(context.config['chain_of_trust_hash_threads'], len(files))
+    if num_threads <= 1:
+        hashes = dict([_hash(file_) for file_ in files])
+    else:
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            hashes = dict(executor.map(_hash, files))
+    return {filepath: hashes[filepath] for filepath in sorted(hashes)}
 
 
 # get_cot_environment {{{1
 def get_cot_environment(context):
     """Get environment information for the chain of trust artifact.
 
+    If ``cot_environment_resource_usage`` is set, this includes the task
+    script's ``resourceUsage``.
+
     Args:
         context (scriptworker.context.Context): the scriptworker context.
 
@@ -48,7 +65,9 @@ def get_cot_environment(context):
 
     """
     env = {}
-    # TODO
+    # TODO more environment info
+    if context.config['cot_environment_resource_usage'] and context.resource_usage is not None:
+        env['resourceUsage'] = context.resource_usage
     return env
 
 
@@ -104,11 +123,7 @@ def generate_cot(context, path=None):
 
     """
     body = generate_cot_body(context)
-    schema = load_json(
-        context.config['cot_schema_path'], is_path=True,
-        exception=ScriptWorkerException,
-        message="Can't read schema file {}: %(exc)s".format(context.config['cot_schema_path'])
-    )
+    schema = load_json_schema(context.config['cot_schema_path'], exception=ScriptWorkerException)
     validate_json_schema(body, schema, name="chain of trust")
     body = format_json(body)
     path = path or os.path.join(context.config['artifact_dir'], "public", "chainOfTrust.json.asc")
@@ -5,7 +5,6 @@ Attributes:
     log (logging.Logger): the log object for this module.
 
 """
-import aiohttp
 import argparse
 import asyncio
 from copy import deepcopy
@@ -22,11 +21,15 @@ from scriptworker.config import read_worker_creds
 from scriptworker.constants import DEFAULT_CONFIG
 from scriptworker.context import Context
 from scriptworker.exceptions import CoTError, DownloadError, ScriptWorkerGPGException
-from scriptworker.gpg import get_body, GPG
+from scriptworker.gpg import get_body, GPG, pin_gpg_homedir_version
+from scriptworker.lazy import lazy_import
 from scriptworker.log import contextual_log_handler
 from scriptworker.task import get_decision_task_id, get_worker_type, get_task_id
-from scriptworker.utils import format_json, get_hash, load_json, makedirs, match_url_regex, raise_future_exceptions, rm
-from taskcluster.exceptions import TaskclusterFailure
+from scriptworker.timing import timed
+from scriptworker.utils import format_json, get_hash, get_hashes, load_json, makedirs, match_url_regex, raise_future_exceptions, rm
+
+aiohttp = lazy_import("aiohttp")
+taskcluster = lazy_import("taskcluster")
 
 log = logging.getLogger(__name__)
 
@@ -545,7 +548,7 @@ async def build_task_dependencies(chain, task, name, my_task_id):
                 with open(json_path, 'w') as fh:
                     fh.write(format_json(task_defn))
                 await build_task_dependencies(chain, task_defn, task_name, task_id)
-            except TaskclusterFailure as exc:
+            except taskcluster.exceptions.TaskclusterFailure as exc:
                 raise CoTError(str(exc))
 
 
@@ -608,10 +611,13 @@ async def download_cot_artifact(chain, task_id, path):
         chain.context, [url], parent_dir=link.cot_dir, valid_artifact_task_ids=[task_id]
     )
     full_path = link.get_artifact_full_path(path)
-    for alg, expected_sha in link.cot['artifacts'][path].items():
+    expected_shas = link.cot['artifacts'][path]
+    for alg in expected_shas:
         if alg not in chain.context.config['valid_hash_algorithms']:
             raise CoTError("BAD HASH ALGORITHM: {}: {} {}!".format(link.name, alg, full_path))
-        real_sha = get_hash(full_path, hash_alg=alg)
+    real_shas = get_hashes(full_path, hash_algs=list(expected_shas))
+    for alg, expected_sha in expected_shas.items():
+        real_sha = real_shas[alg]
         if expected_sha != real_sha:
             raise CoTError("BAD HASH: {}: Expected {} {}; got {}!".format(link.name, alg, expected_sha, real_sha))
         log.debug("{} matches the expected {} {}".format(full_path, alg, expected_sha))
@@ -692,35 +698,38 @@ def verify_cot_signatures(chain):
         CoTError: on failure.
 
     """
-    for link in chain.links:
-        path = link.get_artifact_full_path('public/chainOfTrust.json.asc')
-        gpg_home = os.path.join(chain.context.config['base_gpg_home_dir'], link.worker_impl)
-        gpg = GPG(chain.context, gpg_home=gpg_home)
-        log.debug("Verifying the {} {} chain of trust signature against {}".format(
-            link.name, link.task_id, gpg_home
-        ))
-        try:
-            with open(path, "r") as fh:
-                contents = fh.read()
-        except OSError as exc:
-            raise CoTError("Can't read {}: {}!".format(path, str(exc)))
-        try:
-            # TODO remove verify_sig pref and kwarg when git repo pubkey
-            # verification works reliably!
-            body = get_body(
-                gpg, contents,
-                verify_sig=chain.context.config['verify_cot_signature']
+    # use one gpg homedir version for every link, even if
+    # ``rebuild_gpg_homedirs`` publishes a new one meanwhile
+    with pin_gpg_homedir_version(chain.context) as base_gpg_home_dir:
+        for link in chain.links:
+            path = link.get_artifact_full_path('public/chainOfTrust.json.asc')
+            gpg_home = os.path.join(base_gpg_home_dir, link.worker_impl)
+            gpg = GPG(chain.context, gpg_home=gpg_home)
+            log.debug("Verifying the {} {} chain of trust signature against {}".format(
+                link.name, link.task_id, gpg_home
+            ))
+            try:
+                with open(path, "r") as fh:
+                    contents = fh.read()
+            except OSError as exc:
+                raise CoTError("Can't read {}: {}!".format(path, str(exc)))
+            try:
+                # TODO remove verify_sig pref and kwarg when git repo pubkey
+                # verification works reliably!
+                body = get_body(
+                    gpg, contents,
+                    verify_sig=chain.context.config['verify_cot_signature']
+                )
+            except ScriptWorkerGPGException as exc:
+                raise CoTError("GPG Error verifying chain of trust for {}: {}!".format(path, str(exc)))
+            link.cot = load_json(
+                body, exception=CoTError,
+                message="{} {}: Invalid cot json body! %(exc)s".format(link.name, link.task_id)
             )
-        except ScriptWorkerGPGException as exc:
-            raise CoTError("GPG Error verifying chain of trust for {}: {}!".format(path, str(exc)))
-        link.cot = load_json(
-            body, exception=CoTError,
-            message="{} {}: Invalid cot json body! %(exc)s".format(link.name, link.task_id)
-        )
-        unsigned_path = link.get_artifact_full_path('chainOfTrust.json')
-        log.debug("Good.  Writing json contents to {}".format(unsigned_path))
-        with open(unsigned_path, "w") as fh:
-            fh.write(format_json(link.cot))
+            unsigned_path = link.get_artifact_full_path('chainOfTrust.json')
+            log.debug("Good.  Writing json contents to {}".format(unsigned_path))
+            with open(unsigned_path, "w") as fh:
+                fh.write(format_json(link.cot))
 
 
 # verify_task_in_task_graph {{{1
@@ -1299,20 +1308,28 @@ async def verify_chain_of_trust(chain):
         )
     ):
         try:
+            context = chain.context
             # build LinkOfTrust objects
-            await build_task_dependencies(chain, chain.task, chain.name, chain.task_id)
+            with timed(context, "verify_chain_of_trust.build_task_dependencies"):
+                await build_task_dependencies(chain, chain.task, chain.name, chain.task_id)
             # download the signed chain of trust artifacts
-            await download_cot(chain)
+            with timed(context, "verify_chain_of_trust.download_cot"):
+                await download_cot(chain)
             # verify the signatures and populate the ``link.cot``s
-            verify_cot_signatures(chain)
+            with timed(context, "verify_chain_of_trust.verify_cot_signatures"):
+                verify_cot_signatures(chain)
             # download all other artifacts needed to verify chain of trust
-            await download_firefox_cot_artifacts(chain)
+            with timed(context, "verify_chain_of_trust.download_cot_artifacts"):
+                await download_firefox_cot_artifacts(chain)
             # verify the task types, e.g. decision
-            task_count = await verify_task_types(chain)
-            check_num_tasks(chain, task_count)
+            with timed(context, "verify_chain_of_trust.verify_task_types"):
+                task_count = await verify_task_types(chain)
+                check_num_tasks(chain, task_count)
             # verify the worker_impls, e.g. docker-worker
-            await verify_worker_impls(chain)
-            await trace_back_to_firefox_tree(chain)
+            with timed(context, "verify_chain_of_trust.verify_worker_impls"):
+                await verify_worker_impls(chain)
+            with timed(context, "verify_chain_of_trust.trace_back_to_firefox_tree"):
+                await trace_back_to_firefox_tree(chain)
         except (DownloadError, KeyError, AttributeError) as exc:
             log.critical("Chain of Trust verification error!", exc_info=True)
             if isinstance(exc, CoTError):
@@ -14,24 +14,36 @@ Attributes:
         the python-gnupg names.
 
 """
-import arrow
 import asyncio
 from asyncio.subprocess import DEVNULL, PIPE, STDOUT
-import gnupg
+import base64
+import binascii
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import fcntl
+import hashlib
 import logging
 import os
-import pexpect
 import pprint
+import shutil
 import subprocess
 import sys
 import tempfile
+import threading
 import traceback
 
 from scriptworker.config import get_context_from_cmdln
+from scriptworker.context import Context
 from scriptworker.exceptions import ScriptWorkerException, ScriptWorkerGPGException, \
     ScriptWorkerRetryException
+from scriptworker.lazy import lazy_import
 from scriptworker.log import pipe_to_log, update_logging_config
-from scriptworker.utils import filepaths_in_dir, makedirs, retry_async, rm
+from scriptworker.metrics import GPG_SECONDS
+from scriptworker.utils import filepaths_in_dir, makedirs, retry_async, rm, scan_dir
+
+arrow = lazy_import("arrow")
+gnupg = lazy_import("gnupg")
+pexpect = lazy_import("pexpect")
 
 log = logging.getLogger(__name__)
 
@@ -45,6 +57,18 @@ GPG_CONFIG_MAPPING = {
     'gpg_use_agent': 'use_agent',
 }
 
+# the file in ``base_gpg_home_dir`` holding the git revision the homedirs
+# were built from.  See ``update_gpg_homedirs_from_diff()``.
+GPG_HOMEDIRS_REVISION_FILENAME = ".git_revision"
+# the lockfile in each gpg homedir version.  Verifications hold a shared lock
+# on it; garbage collection needs an exclusive one.
+GPG_HOMEDIRS_VERSION_LOCK_FILENAME = ".in_use"
+
+# gnupg.GPG instances, keyed by their sorted kwargs and encoding.  See ``GPG()``.
+_GPG_CACHE = {}
+# key indexes, keyed by gpg_home, keyrings, and private.  See ``get_key_index()``.
+_KEY_INDEX_CACHE = {}
+
 
 # helper functions {{{1
 def gpg_default_args(gpg_home):
@@ -129,10 +153,10 @@ def keyid_to_fingerprint(gpg, keyid, private=False):
         ScriptworkerGPGException: if we can't find ``keyid`` in this keyring.
 
     """
-    for key in gpg.list_keys(private):
-        if key['keyid'] == keyid:
-            return key['fingerprint']
-    else:
+    index = get_key_index(gpg, private=private)
+    try:
+        return index['keyid_to_fingerprint'][keyid]
+    except KeyError:
         raise ScriptWorkerGPGException(
             "Can't find keyid {} for {}!".format(
                 keyid, guess_gpg_home(gpg)
@@ -159,10 +183,10 @@ def fingerprint_to_keyid(gpg, fingerprint, private=False):
         ScriptworkerGPGException: if we can't find ``fingerprint`` in this keyring.
 
     """
-    for key in gpg.list_keys(private):
-        if key['fingerprint'] == fingerprint:
-            return key['keyid']
-    else:
+    index = get_key_index(gpg, private=private)
+    try:
+        return index['fingerprint_to_keyid'][fingerprint]
+    except KeyError:
         raise ScriptWorkerGPGException(
             "Can't find fingerprint {} for {}!".format(
                 fingerprint, guess_gpg_home(gpg)
@@ -170,6 +194,75 @@ def fingerprint_to_keyid(gpg, fingerprint, private=False):
         )
 
 
+# key index {{{1
+def _get_keyring_state(gpg):
+    """Describe the on-disk state of the keyrings ``gpg`` reads from.
+
+    Any import, deletion, or signature rewrites the keyring, which changes at
+    least one of the inode, size, or mtime of these files.
+
+    Args:
+        gpg (gnupg.GPG): the GPG instance.
+
+    Returns:
+        tuple: ``(path, inode, size, mtime_ns)`` for each existing keyring file.
+
+    """
+    gpg_home = guess_gpg_home(gpg)
+    paths = list(gpg.keyring or []) + list(gpg.secret_keyring or [])
+    for name in ("pubring.gpg", "pubring.kbx", "secring.gpg", "private-keys-v1.d"):
+        paths.append(os.path.join(gpg_home, name))
+    state = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        state.append((path, stat.st_ino, stat.st_size, stat.st_mtime_ns))
+    return tuple(state)
+
+
+def get_key_index(gpg, private=False):
+    """Return an in-memory index of the keys in ``gpg``'s keyring.
+
+    ``gpg.list_keys`` is a subprocess call that lists the entire keyring, so
+    we only call it when the keyring files have changed since the last call.
+    Otherwise, lookups are dict lookups against the cached index.
+
+    Args:
+        gpg (gnupg.GPG): the GPG instance.
+        private (bool, optional): If True, index the private keyring instead
+            of the public keyring.  Defaults to False.
+
+    Returns:
+        dict: ``keyid_to_fingerprint``, ``fingerprint_to_keyid``, and
+            ``uid_to_fingerprints`` mappings.
+
+    """
+    cache_key = (
+        guess_gpg_home(gpg), tuple(gpg.keyring or ()),
+        tuple(gpg.secret_keyring or ()), private,
+    )
+    state = _get_keyring_state(gpg)
+    cached = _KEY_INDEX_CACHE.get(cache_key)
+    if cached is not None and cached['state'] == state:
+        return cached['index']
+    index = {
+        'keyid_to_fingerprint': {},
+        'fingerprint_to_keyid': {},
+        'uid_to_fingerprints': {},
+    }
+    with GPG_SECONDS.time(operation="list_keys"):
+        keys = gpg.list_keys(private)
+    for key in keys:
+        index['keyid_to_fingerprint'].setdefault(key['keyid'], key['fingerprint'])
+        index['fingerprint_to_keyid'].setdefault(key['fingerprint'], key['keyid'])
+        for uid in key.get('uids', []):
+            index['uid_to_fingerprints'].setdefault(uid, []).append(key['fingerprint'])
+    _KEY_INDEX_CACHE[cache_key] = {'state': state, 'index': index}
+    return index
+
+
 # create_gpg_conf {{{1
 def create_gpg_conf(gpg_home, keyserver=None, my_fingerprint=None):
     """Create a gpg.conf with Mozilla infosec guidelines.
@@ -204,9 +297,22 @@ def create_gpg_conf(gpg_home, keyserver=None, my_fingerprint=None):
 
 
 # GPG {{{1
+def _prune_gpg_caches():
+    """Drop cached GPG instances and key indexes for homedirs that no longer exist."""
+    for cache_key, gpg in list(_GPG_CACHE.items()):
+        if not os.path.isdir(gpg.gnupghome):
+            del _GPG_CACHE[cache_key]
+    for cache_key in list(_KEY_INDEX_CACHE.keys()):
+        if not os.path.isdir(cache_key[0]):
+            del _KEY_INDEX_CACHE[cache_key]
+
+
 def GPG(context, gpg_home=None):
     """Get a python-gnupg GPG instance based on the settings in ``context``.
 
+    Instantiating ``gnupg.GPG`` runs ``gpg --version``, so instances are
+    cached per unique set of settings and reused while their gpg_home exists.
+
     Args:
         context (scriptworker.context.Context): the scriptworker context.
         gpg_home (str, optional): override ``context.config['gpg_home']`` if
@@ -223,10 +329,15 @@ def GPG(context, gpg_home=None):
             # allow for the keyring paths to contain %(gpg_home)s (recommended)
             kwargs[gnupg_key] = context.config[config_key] % {'gpg_home': gpg_home}
     kwargs['gnupghome'] = gpg_home
-    gpg = gnupg.GPG(**kwargs)
-    # gpg.encoding defaults to latin-1, but python3 defaults to utf-8 for
-    # everything else
-    gpg.encoding = context.config['gpg_encoding']
+    cache_key = tuple(sorted(kwargs.items())) + (('encoding', context.config['gpg_encoding']), )
+    gpg = _GPG_CACHE.get(cache_key)
+    if gpg is None or not os.path.isdir(gpg_home):
+        _prune_gpg_caches()
+        gpg = gnupg.GPG(**kwargs)
+        # gpg.encoding defaults to latin-1, but python3 defaults to utf-8 for
+        # everything else
+        gpg.encoding = context.config['gpg_encoding']
+        _GPG_CACHE[cache_key] = gpg
     return gpg
 
 
@@ -265,10 +376,9 @@ def generate_key(gpg, name, comment, email, key_length=4096, expiration=None):
 def import_key(gpg, key_data, return_type='fingerprints'):
     """Import ascii key_data.
 
-    In theory this can be multiple keys.  However, jenkins is barfing on
-    multiple key import tests, although multiple key import tests are working
-    locally.  Until we identify what the problem is (likely gpg version?)
-    we should only import 1 key at a time.
+    This can be multiple keys.  ``import_key_files`` uses this to import many
+    key files per gpg call, and falls back to importing a single key at a time
+    for any file whose keys it can't find in the batch results.
 
     Args:
         gpg (gnupg.GPG): the GPG instance.
@@ -282,7 +392,8 @@ def import_key(gpg, key_data, return_type='fingerprints'):
             https://pythonhosted.org/python-gnupg/#importing-and-receiving-keys
 
     """
-    import_result = gpg.import_keys(key_data)
+    with GPG_SECONDS.time(operation="import"):
+        import_result = gpg.import_keys(key_data)
     if return_type == 'fingerprints':
         return import_result.fingerprints
     return import_result.results
@@ -312,6 +423,28 @@ def export_key(gpg, fingerprint, private=False):
     return key
 
 
+def delete_keys(gpg, fingerprints):
+    """Delete the public keys ``fingerprints`` from the keyring.
+
+    Args:
+        gpg (gnupg.GPG): the GPG instance.
+        fingerprints (list): the fingerprints of the keys to delete.
+
+    Raises:
+        ScriptWorkerGPGException: on failure.
+
+    """
+    fingerprints = list(fingerprints)
+    if not fingerprints:
+        return
+    log.info("Deleting {} keys from {}".format(len(fingerprints), gpg.gnupghome))
+    result = gpg.delete_keys(fingerprints)
+    if result.status != 'ok':
+        raise ScriptWorkerGPGException(
+            "Failed deleting keys {}: {}\n{}".format(fingerprints, result.status, result.stderr)
+        )
+
+
 def sign_key(context, target_fingerprint, signing_key=None,
              exportable=False, gpg_home=None):
     """Sign the ``target_fingerprint`` key with ``signing_key`` or default key.
@@ -370,6 +503,120 @@ def sign_key(context, target_fingerprint, signing_key=None,
         )
 
 
+def _answer_gpg_prompts(cmd, commands, timeout, desc):
+    """Run a ``--command-fd 0 --status-fd 1`` gpg command, answering its prompts.
+
+    gpg announces each prompt on the status fd as ``[GNUPG:] GET_LINE <keyword>``
+    or ``[GNUPG:] GET_BOOL <keyword>``, and reads the answer from the command fd.
+    We answer ``keyedit.prompt`` with the next of ``commands`` (then ``quit``),
+    every ``GET_BOOL`` with ``y``, and any other ``GET_LINE`` with the default.
+    There's no pty and no regex matching of the human readable output.
+
+    Args:
+        cmd (list): the gpg command, including ``--command-fd 0 --status-fd 1``.
+        commands (list): the commands to send to ``keyedit.prompt``.
+        timeout (int): kill gpg after this many seconds.
+        desc (str): a description for exception messages.
+
+    Raises:
+        ScriptWorkerGPGException: on a passphrase prompt, timeout, or non-zero exit.
+
+    """
+    commands = list(commands)
+    output = []
+    error = None
+    proc = subprocess.Popen(
+        cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+    )
+    timer = threading.Timer(timeout, proc.kill)
+    timer.start()
+    try:
+        for line in iter(proc.stdout.readline, b''):
+            line = line.decode('utf-8', 'replace').rstrip()
+            output.append(line)
+            parts = line.split()
+            if len(parts) < 3 or parts[0] != '[GNUPG:]':
+                continue
+            if parts[1] == 'GET_LINE':
+                answer = ''
+                if parts[2] == 'keyedit.prompt':
+                    answer = commands.pop(0) if commands else 'quit'
+            elif parts[1] == 'GET_BOOL':
+                answer = 'y'
+            elif parts[1] == 'GET_HIDDEN':
+                error = "gpg asked for a passphrase"
+                proc.kill()
+                break
+            else:
+                continue
+            proc.stdin.write("{}\n".format(answer).encode('utf-8'))
+            proc.stdin.flush()
+    except (BrokenPipeError, OSError) as exc:
+        error = str(exc)
+    finally:
+        timer.cancel()
+        proc.stdin.close()
+        proc.stdout.close()
+        exitcode = proc.wait()
+    if exitcode or error:
+        raise ScriptWorkerGPGException(
+            "Failed signing {}! exit {} {}\n{}".format(
+                desc, exitcode, error or '', '\n'.join(output)
+            )
+        )
+
+
+def sign_keys(context, target_fingerprints, signing_key=None,
+              exportable=False, gpg_home=None):
+    """Sign each of ``target_fingerprints`` with ``signing_key`` or default key, non-interactively.
+
+    gpg only certifies a single key per ``--edit-key`` call, but unlike
+    ``sign_key`` we don't spawn gpg under a pty and match its prompts with
+    ``pexpect``; we answer its ``--status-fd`` prompts through ``--command-fd``.
+    We also skip the automatic trustdb check after every signature, and
+    check the trustdb once at the end.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+        target_fingerprints (list): the fingerprints of the keys to sign.
+        signing_key (str, optional): the fingerprint of the signing key to sign
+            with.  If not set, this defaults to the default-key in the gpg.conf.
+            Defaults to None.
+        exportable (bool, optional): whether the signatures should be exportable.
+            Defaults to False.
+        gpg_home (str, optional): override the gpg_home with a different
+            gnupg home directory here.  Defaults to None.
+
+    Raises:
+        ScriptWorkerGPGException: on a failed signature.
+
+    """
+    gpg_path = guess_gpg_path(context)
+    gpg_home = guess_gpg_home(context, gpg_home=gpg_home)
+    target_fingerprints = list(target_fingerprints)
+    args = [
+        "--batch", "--no-tty", "--no-auto-check-trustdb",
+        "--command-fd", "0", "--status-fd", "1",
+    ]
+    message = "Signing {} keys in {}".format(len(target_fingerprints), gpg_home)
+    if signing_key:
+        args.extend(['-u', signing_key])
+        message += " with {}".format(signing_key)
+    log.info("{}...".format(message))
+    command = "sign" if exportable else "lsign"
+    cmd_args = gpg_default_args(gpg_home) + args
+    for target_fingerprint in target_fingerprints:
+        cmd = [gpg_path] + cmd_args + ["--edit-key", target_fingerprint]
+        log.debug(subprocess.list2cmdline(cmd))
+        with GPG_SECONDS.time(operation="sign_keys"):
+            _answer_gpg_prompts(
+                cmd, [command, "save"], context.config['sign_key_timeout'],
+                target_fingerprint
+            )
+    if target_fingerprints:
+        check_ownertrust(context, gpg_home=gpg_home)
+
+
 # ownertrust {{{1
 def check_ownertrust(context, gpg_home=None):
     """In theory, this will repair a broken trustdb.
@@ -384,7 +631,8 @@ def check_ownertrust(context, gpg_home=None):
     """
     gpg_home = guess_gpg_home(context, gpg_home=gpg_home)
     gpg_path = guess_gpg_path(context)
-    subprocess.check_call([gpg_path] + gpg_default_args(gpg_home) + ["--check-trustdb"])
+    with GPG_SECONDS.time(operation="check_trustdb"):
+        subprocess.check_call([gpg_path] + gpg_default_args(gpg_home) + ["--check-trustdb"])
 
 
 def update_ownertrust(context, my_fingerprint, trusted_fingerprints=None, gpg_home=None):
@@ -492,7 +740,8 @@ def sign(gpg, data, **kwargs):
         str: the ascii armored signed data.
 
     """
-    return str(gpg.sign(data, **kwargs))
+    with GPG_SECONDS.time(operation="sign"):
+        return str(gpg.sign(data, **kwargs))
 
 
 def verify_signature(gpg, signed_data, **kwargs):
@@ -513,7 +762,8 @@ def verify_signature(gpg, signed_data, **kwargs):
 
     """
     log.info("Verifying signature (gnupghome {})".format(guess_gpg_home(gpg)))
-    verified = gpg.verify(signed_data, **kwargs)
+    with GPG_SECONDS.time(operation="verify"):
+        verified = gpg.verify(signed_data, **kwargs)
     if verified.trust_level is not None and verified.trust_level >= verified.TRUST_FULLY:
         log.info("Fully trusted signature from {}, {}".format(verified.username, verified.key_id))
     else:
@@ -932,12 +1182,13 @@ def get_list_sigs_output(context, key_fingerprint, gpg_home=None, validate=True,
     gpg_home = guess_gpg_home(context, gpg_home=gpg_home)
     gpg_path = guess_gpg_path(context)
     log.info("Getting --list-sigs output for {} in {}...".format(key_fingerprint, gpg_home))
-    sig_output = subprocess.check_output(
-        [gpg_path] + gpg_default_args(gpg_home) +
-        ["--with-colons", "--list-sigs", "--with-fingerprint", "--with-fingerprint",
-         key_fingerprint],
-        stderr=subprocess.STDOUT
-    ).decode('utf-8')
+    with GPG_SECONDS.time(operation="list_sigs"):
+        sig_output = subprocess.check_output(
+            [gpg_path] + gpg_default_args(gpg_home) +
+            ["--with-colons", "--list-sigs", "--with-fingerprint", "--with-fingerprint",
+             key_fingerprint],
+            stderr=subprocess.STDOUT
+        ).decode('utf-8')
     if "No public key" in sig_output:
         raise ScriptWorkerGPGException("No gpg key {} in {}!".format(key_fingerprint, gpg_home))
     if validate:
@@ -945,6 +1196,108 @@ def get_list_sigs_output(context, key_fingerprint, gpg_home=None, validate=True,
     return sig_output
 
 
+def _iter_list_sigs_records(lines):
+    """Split multi-key ``--list-sigs --with-colons`` output into per-key records.
+
+    Each record starts at a ``pub`` line.  Any lines before the first ``pub``
+    line, like the ``tru`` line, are prepended to every record, so each
+    record parses the same as single-key output.
+
+    Args:
+        lines (iterable): the lines of output, without trailing newlines.
+
+    Yields:
+        list: the lines for a single key.
+
+    """
+    header = []
+    record = None
+    for line in lines:
+        if line.startswith('pub:'):
+            if record is not None:
+                yield record
+            record = list(header)
+        if record is None:
+            header.append(line)
+        else:
+            record.append(line)
+    if record is not None:
+        yield record
+
+
+def get_list_sigs_outputs(context, key_fingerprints, gpg_home=None, validate=True, expected=None):
+    """Get output from a single gpg --list-sigs call for several keys.
+
+    The output is parsed as it streams in, one key at a time, and every key
+    is validated before raising, so the exception covers all the bad keys.
+    gpg's stderr is kept out of the parsed output, and read once stdout is
+    done; it's only used for error messages.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+        key_fingerprints (list): the fingerprints of the keys we want to get
+            signature information about.
+        gpg_home (str, optional): override the gpg_home with a different
+            gnupg home directory here.  Defaults to None.
+        validate (bool, optional): Validate each key's output via
+            parse_list_sigs_output().  Defaults to True.
+        expected (dict, optional): This is passed on to parse_list_sigs_output()
+            for every key if validate is True.  Defaults to None.
+
+    Returns:
+        dict: fingerprint to the per-key output from gpg --list-sigs, if validate
+            is False, or to the output from parse_list_sigs_output, if validate
+            is True.
+
+    Raises:
+        ScriptWorkerGPGException: if there is an issue with any of the keys,
+            or gpg exits non-zero.
+
+    """
+    gpg_home = guess_gpg_home(context, gpg_home=gpg_home)
+    gpg_path = guess_gpg_path(context)
+    key_fingerprints = sorted(set([fp.upper() for fp in key_fingerprints]))
+    results = {}
+    if not key_fingerprints:
+        return results
+    log.info("Getting --list-sigs output for {} keys in {}...".format(len(key_fingerprints), gpg_home))
+    cmd = [gpg_path] + gpg_default_args(gpg_home) + [
+        "--with-colons", "--list-sigs", "--with-fingerprint", "--with-fingerprint",
+    ] + key_fingerprints
+    messages = []
+    found = set()
+    # the parsing below reads gpg's stdout as it runs, so it's included in the timing
+    with GPG_SECONDS.time(operation="list_sigs"):
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            lines = (line.decode('utf-8').rstrip('\n') for line in proc.stdout)
+            for record in _iter_list_sigs_records(lines):
+                fpr_lines = [line for line in record if line.startswith('fpr:')]
+                fingerprint = _parse_fpr_line(fpr_lines[0], "list-sigs") if fpr_lines else None
+                found.add(fingerprint)
+                output = '\n'.join(record) + '\n'
+                if not validate:
+                    results[fingerprint] = output
+                    continue
+                try:
+                    results[fingerprint] = parse_list_sigs_output(output, fingerprint, expected=expected)
+                except ScriptWorkerGPGException as exc:
+                    messages.append("{}: {}".format(fingerprint, str(exc)))
+        finally:
+            proc.stdout.close()
+            stderr = proc.stderr.read().decode('utf-8', 'replace')
+            proc.stderr.close()
+            exitcode = proc.wait()
+    missing = set(key_fingerprints).difference(found)
+    if missing:
+        messages.append("No gpg keys {} in {}!".format(sorted(missing), gpg_home))
+    if exitcode:
+        messages.append("{} exited {}:\n{}".format(subprocess.list2cmdline(cmd), exitcode, stderr.rstrip()))
+    if messages:
+        raise ScriptWorkerGPGException('\n'.join(messages))
+    return results
+
+
 # consume pubkey libraries {{{1
 def has_suffix(path, suffixes):
     """Given a list of suffixes, return True if path ends with one of them.
@@ -960,9 +1313,209 @@ def has_suffix(path, suffixes):
     return False
 
 
+def _dearmor(key_data):
+    """Decode the ascii armored blocks in ``key_data``.
+
+    Args:
+        key_data (str): one or more ascii armored blocks.
+
+    Returns:
+        list: the binary contents of each armored block.
+
+    Raises:
+        ScriptWorkerGPGException: on malformed armor.
+
+    """
+    blocks = []
+    lines = None
+    in_headers = False
+    for line in key_data.splitlines():
+        line = line.strip()
+        if line.startswith("-----BEGIN PGP "):
+            lines = []
+            in_headers = True
+        elif line.startswith("-----END PGP "):
+            if lines is None:
+                raise ScriptWorkerGPGException("Armor END without BEGIN!")
+            try:
+                blocks.append(base64.b64decode(''.join(lines), validate=True))
+            except (binascii.Error, ValueError) as exc:
+                raise ScriptWorkerGPGException("Bad armor: {}".format(str(exc)))
+            lines = None
+        elif lines is not None:
+            if in_headers:
+                if not line or ':' in line:
+                    # Armor headers, e.g. ``Version: GnuPG v2``, end with a blank line
+                    in_headers = bool(line)
+                    continue
+                in_headers = False
+            # skip the ``=XXXX`` checksum line
+            if line and not line.startswith('='):
+                lines.append(line)
+    if lines is not None:
+        raise ScriptWorkerGPGException("Armor BEGIN without END!")
+    return blocks
+
+
+def _iter_packets(data):
+    """Yield ``(tag, body)`` for each OpenPGP packet in ``data``.
+
+    https://tools.ietf.org/html/rfc4880#section-4.2
+
+    Args:
+        data (bytes): the binary OpenPGP data.
+
+    Raises:
+        ScriptWorkerGPGException: on a malformed or partial-length packet.
+
+    """
+    pos = 0
+    while pos < len(data):
+        ctb = data[pos]
+        pos += 1
+        if not ctb & 0x80:
+            raise ScriptWorkerGPGException("Invalid packet header at {}!".format(pos - 1))
+        if ctb & 0x40:
+            # new format packet
+            tag = ctb & 0x3f
+            first = data[pos:pos + 1]
+            if not first:
+                raise ScriptWorkerGPGException("Truncated packet header!")
+            first = first[0]
+            if first < 192:
+                length, pos = first, pos + 1
+            elif first < 224:
+                length = ((first - 192) << 8) + data[pos + 1] + 192
+                pos += 2
+            elif first == 255:
+                length = int.from_bytes(data[pos + 1:pos + 5], 'big')
+                pos += 5
+            else:
+                raise ScriptWorkerGPGException("Partial body lengths aren't supported in key packets!")
+        else:
+            # old format packet
+            tag = (ctb >> 2) & 0x0f
+            length_type = ctb & 0x03
+            if length_type == 3:
+                length = len(data) - pos
+            else:
+                num_bytes = (1, 2, 4)[length_type]
+                length = int.from_bytes(data[pos:pos + num_bytes], 'big')
+                pos += num_bytes
+        if pos + length > len(data):
+            raise ScriptWorkerGPGException("Truncated packet!")
+        yield tag, data[pos:pos + length]
+        pos += length
+
+
+def get_armored_key_fingerprints(key_data):
+    """Compute the fingerprints of the primary public keys in ``key_data``, without gpg.
+
+    A v4 fingerprint is the sha1 of ``0x99``, the two-byte packet length, and the
+    public key packet body.  We only support v4 public keys; anything else
+    raises, so the caller can fall back to asking gpg.
+
+    https://tools.ietf.org/html/rfc4880#section-12.2
+
+    Args:
+        key_data (str): ascii armored public key(s).
+
+    Returns:
+        list: the uppercase hex fingerprints of the primary keys, in order.
+
+    Raises:
+        ScriptWorkerGPGException: if ``key_data`` isn't a parseable set of v4
+            public keys.
+
+    """
+    fingerprints = []
+    for block in _dearmor(key_data):
+        for tag, body in _iter_packets(block):
+            # 6 is a primary public key; 5 is a primary secret key
+            if tag == 5:
+                raise ScriptWorkerGPGException("Secret keys aren't supported!")
+            if tag != 6:
+                continue
+            if not body or body[0] != 4:
+                raise ScriptWorkerGPGException("Only v4 keys are supported!")
+            h = hashlib.sha1()
+            h.update(b'\x99' + len(body).to_bytes(2, 'big') + body)
+            fingerprints.append(h.hexdigest().upper())
+    if not fingerprints:
+        raise ScriptWorkerGPGException("No public keys found!")
+    return fingerprints
+
+
+def _import_key_file(gpg, path, contents, messages):
+    """Import a single key file, and record its errors in ``messages``.
+
+    Args:
+        gpg (gnupg.GPG): the GPG instance.
+        path (str): the path of the key file, for error messages.
+        contents (str): the contents of the key file.
+        messages (list): the list of error messages to append to.
+
+    Returns:
+        list: the fingerprints imported.
+
+    """
+    fingerprints = []
+    for fp in import_key(gpg, contents, return_type='result'):
+        if fp['fingerprint'] is not None:
+            fingerprints.append(fp['fingerprint'])
+        else:
+            messages.append("Can't import key from {}: {}!".format(path, fp['text']))
+    return fingerprints
+
+
+def import_key_files(gpg, paths, messages):
+    """Import the keys in ``paths`` with a single gpg call.
+
+    We compute each file's fingerprints in python, so we can map the batch
+    import results back to the files.  Any file we can't parse, or whose keys
+    aren't in the batch import results, is imported individually, so its
+    error is reported against its own path.
+
+    Args:
+        gpg (gnupg.GPG): the GPG instance.
+        paths (list): the paths of the ascii armored key files to import.
+        messages (list): the list of error messages to append to.
+
+    Returns:
+        list: the fingerprints imported, in ``paths`` order.
+
+    """
+    contents = {}
+    expected = {}
+    for path in paths:
+        with open(path, "r") as fh:
+            contents[path] = fh.read()
+        try:
+            expected[path] = get_armored_key_fingerprints(contents[path])
+        except ScriptWorkerGPGException as exc:
+            log.debug("Can't get fingerprints from {}: {}".format(path, str(exc)))
+            expected[path] = None
+    batch = [path for path in paths if expected[path]]
+    imported = set()
+    if batch:
+        log.debug("Importing {} key files in one batch...".format(len(batch)))
+        result = import_key(gpg, '\n'.join([contents[path] for path in batch]), return_type='result')
+        imported = set([fp['fingerprint'] for fp in result if fp['fingerprint'] is not None])
+    fingerprints = []
+    for path in paths:
+        if expected[path] and imported.issuperset(expected[path]):
+            fingerprints.extend(expected[path])
+        else:
+            fingerprints.extend(_import_key_file(gpg, path, contents[path], messages))
+    return fingerprints
+
+
 def consume_valid_keys(context, keydir=None, ignore_suffixes=(), gpg_home=None):
     """Given a keydir, traverse the keydir, and import all gpg public keys.
 
+    Keys are imported in batches of ``context.config['gpg_import_batch_size']``
+    files per gpg call.
+
     Args:
         context (scriptworker.context.Context): the scriptworker context.
         keydir (str, optional): the path of the directory to traverse.  If None,
@@ -984,18 +1537,13 @@ def consume_valid_keys(context, keydir=None, ignore_suffixes=(), gpg_home=None):
     messages = []
     if not os.path.isdir(os.path.realpath(keydir)):
         raise ScriptWorkerGPGException("consume_valid_keys: {} is not a dir!".format(keydir))
-    filepaths = filepaths_in_dir(keydir)
-    for filepath in filepaths:
-        if has_suffix(filepath, ignore_suffixes):
-            continue
-        path = os.path.join(keydir, filepath)
-        with open(path, "r") as fh:
-            result = import_key(gpg, fh.read(), return_type='result')
-            for fp in result:
-                if fp['fingerprint'] is not None:
-                    fingerprints.append(fp['fingerprint'])
-                else:
-                    messages.append("Can't import key from {}: {}!".format(path, fp['text']))
+    paths = [
+        os.path.join(keydir, filepath) for filepath, _ in scan_dir(keydir)
+        if not has_suffix(filepath, ignore_suffixes)
+    ]
+    batch_size = max(context.config['gpg_import_batch_size'], 1)
+    for i in range(0, len(paths), batch_size):
+        fingerprints.extend(import_key_files(gpg, paths[i:i + batch_size], messages))
     if messages:
         raise ScriptWorkerGPGException('\n'.join(messages))
     return fingerprints
@@ -1086,12 +1634,10 @@ def rebuild_gpg_home_flat(context, real_gpg_home, my_pub_key_path,
             ignore_suffixes=ignore_suffixes, gpg_home=tmp_gpg_home
         )
         # sign all the keys
-        for fingerprint in fingerprints:
-            log.info("signing {} with {}".format(fingerprint, my_fingerprint))
-            sign_key(
-                context, fingerprint, signing_key=my_fingerprint,
-                gpg_home=tmp_gpg_home
-            )
+        sign_keys(
+            context, fingerprints, signing_key=my_fingerprint,
+            gpg_home=tmp_gpg_home
+        )
         # Copy tmp_gpg_home/* to real_gpg_home/* before nuking tmp_gpg_home/
         overwrite_gpg_home(tmp_gpg_home, real_gpg_home)
 
@@ -1136,20 +1682,17 @@ def rebuild_gpg_home_signed(context, real_gpg_home, my_pub_key_path,
             context, keydir=trusted_path,
             ignore_suffixes=ignore_suffixes, gpg_home=tmp_gpg_home
         )
-        trusted_fingerprints_to_keyid = {}
         # sign all the keys
-        for fingerprint in set(trusted_fingerprints):
-            sign_key(
-                context, fingerprint, signing_key=my_fingerprint,
-                gpg_home=tmp_gpg_home
-            )
-            get_list_sigs_output(
-                context, fingerprint, gpg_home=tmp_gpg_home,
-                expected={
-                    'sig_keyids': [my_keyid],
-                },
-            )
-            trusted_fingerprints_to_keyid[fingerprint] = fingerprint_to_keyid(gpg, fingerprint)
+        sign_keys(
+            context, sorted(set(trusted_fingerprints)), signing_key=my_fingerprint,
+            gpg_home=tmp_gpg_home
+        )
+        get_list_sigs_outputs(
+            context, trusted_fingerprints, gpg_home=tmp_gpg_home,
+            expected={
+                'sig_keyids': [my_keyid],
+            },
+        )
         # trust trusted_fingerprints
         update_ownertrust(
             context, my_fingerprint, trusted_fingerprints=trusted_fingerprints,
@@ -1222,6 +1765,72 @@ async def get_latest_tag(path,
     return tag.decode('utf-8').rstrip()
 
 
+async def get_git_diff(path, old_revision, new_revision,
+                       exec_function=asyncio.create_subprocess_exec):
+    """Get the files changed in path between two revisions.
+
+    Renames are reported as a delete plus an add.
+
+    Args:
+        path (str): the path to run ``git diff --name-status`` in.
+        old_revision (str): the revision to diff from.
+        new_revision (str): the revision to diff to.
+
+    Returns:
+        dict: the changed files, relative to ``path``, mapped to their
+            status: ``A`` (added), ``M`` (modified) or ``D`` (deleted).
+
+    Raises:
+        ScriptWorkerRetryException: on failure.
+
+    """
+    proc = await exec_function(
+        'git', "diff", "--name-status", "--no-renames", old_revision, new_revision,
+        cwd=path, stdout=PIPE, stderr=DEVNULL, stdin=DEVNULL, close_fds=True,
+    )
+    output, err = await proc.communicate()
+    exitcode = await proc.wait()
+    if exitcode:
+        raise ScriptWorkerRetryException(
+            "Can't diff {}..{} at {}: {}!".format(old_revision, new_revision, path, err)
+        )
+    diff = {}
+    for line in output.decode('utf-8').splitlines():
+        status, filename = line.split('\t', 1)
+        # treat type changes (T) as modifications
+        diff[filename] = status[0] if status[0] in ('A', 'D') else 'M'
+    return diff
+
+
+async def get_git_file_contents(path, revision, filename,
+                                exec_function=asyncio.create_subprocess_exec):
+    """Get the contents of filename at revision.
+
+    Args:
+        path (str): the path to run ``git show REVISION:FILENAME`` in.
+        revision (str): the revision to get the contents at.
+        filename (str): the path of the file, relative to ``path``.
+
+    Returns:
+        str: the file contents.
+
+    Raises:
+        ScriptWorkerRetryException: on failure.
+
+    """
+    proc = await exec_function(
+        'git', "show", "{}:{}".format(revision, filename), cwd=path,
+        stdout=PIPE, stderr=DEVNULL, stdin=DEVNULL, close_fds=True,
+    )
+    contents, err = await proc.communicate()
+    exitcode = await proc.wait()
+    if exitcode:
+        raise ScriptWorkerRetryException(
+            "Can't get {} at {} in {}: {}!".format(filename, revision, path, err)
+        )
+    return contents.decode('utf-8')
+
+
 async def update_signed_git_repo(context, repo="origin", ref="master",
                                  exec_function=asyncio.create_subprocess_exec,
                                  log_function=pipe_to_log):
@@ -1335,18 +1944,46 @@ def write_last_good_git_revision(context, revision):
 
 
 # build gpg homedirs from repo {{{1
+def _build_gpg_homedir(config, function, args, kwargs):
+    """Build a single gpg homedir in a child process.
+
+    The parent ``context`` holds things like the event loop and aiohttp
+    session, which don't pickle, so we only send the config across.
+
+    Args:
+        config (dict): the scriptworker config.
+        function (function): the rebuild function, e.g. ``rebuild_gpg_home_flat``.
+        args (tuple): the positional args to pass to ``function`` after ``context``.
+        kwargs (dict): the keyword args to pass to ``function``.
+
+    """
+    context = Context()
+    context.config = config
+    function(context, *args, **kwargs)
+
+
 def build_gpg_homedirs_from_repo(
     context, tag, basedir=None, verify_function=verify_signed_tag,
     flat_function=rebuild_gpg_home_flat, signed_function=rebuild_gpg_home_signed,
 ):
     """Build gpg homedirs in ``basedir``, from the context-defined git repo.
 
+    If ``gpg_homedir_build_processes`` is more than 1, the homedirs are built
+    concurrently in a process pool; ``flat_function`` and ``signed_function``
+    must be picklable, i.e. module-level functions.
+
     Args:
         context (scriptworker.context.Context): the scriptworker context.
         tag (str): the tag name to verify
         basedir (str, optional): the path to the base directory to create the
             gpg homedirs in.  This directory will be wiped if it exists.
             If None, use ``context.config['base_gpg_home_dir']``.  Defaults to None.
+        verify_function (function, optional): the function to verify ``tag``
+            with.  Defaults to ``verify_signed_tag``.
+        flat_function (function, optional): the function to build flat
+            homedirs with.  Defaults to ``rebuild_gpg_home_flat``.
+        signed_function (function, optional): the function to build signed
+            homedirs with.  Defaults to ``rebuild_gpg_home_signed``.
 
     Returns:
         str: on success.
@@ -1367,27 +2004,385 @@ def build_gpg_homedirs_from_repo(
     rm(basedir)
     makedirs(basedir)
     # create gpg homedirs
+    builds = []
     for worker_impl, worker_config in context.config['gpg_homedirs'].items():
         source_path = os.path.join(repo_path, worker_impl)
         real_gpg_home = os.path.join(basedir, worker_impl)
         my_pub_key_path = context.config['pubkey_path']
         my_priv_key_path = context.config['privkey_path']
         if worker_config['type'] == 'flat':
-            flat_function(
-                context, real_gpg_home, my_pub_key_path, my_priv_key_path,
-                source_path, ignore_suffixes=worker_config['ignore_suffixes']
-            )
+            builds.append((
+                flat_function,
+                (real_gpg_home, my_pub_key_path, my_priv_key_path, source_path),
+                {'ignore_suffixes': worker_config['ignore_suffixes']},
+            ))
         else:
             trusted_path = os.path.join(source_path, "trusted")
             untrusted_path = os.path.join(source_path, "valid")
-            signed_function(
-                context, real_gpg_home, my_pub_key_path, my_priv_key_path,
-                trusted_path, untrusted_path=untrusted_path,
-                ignore_suffixes=worker_config['ignore_suffixes']
+            builds.append((
+                signed_function,
+                (real_gpg_home, my_pub_key_path, my_priv_key_path, trusted_path),
+                {'untrusted_path': untrusted_path,
+                 'ignore_suffixes': worker_config['ignore_suffixes']},
+            ))
+    num_processes = min(context.config['gpg_homedir_build_processes'], len(builds))
+    if num_processes <= 1:
+        for function, args, kwargs in builds:
+            function(context, *args, **kwargs)
+    else:
+        log.info("Building {} gpg homedirs in {} processes".format(len(builds), num_processes))
+        with ProcessPoolExecutor(max_workers=num_processes) as executor:
+            futures = [
+                executor.submit(_build_gpg_homedir, dict(context.config), function, args, kwargs)
+                for function, args, kwargs in builds
+            ]
+            # wait for every build before raising, so no child is still
+            # writing into ``basedir``
+            exceptions = [future.exception() for future in futures]
+        for exc in exceptions:
+            if exc is not None:
+                raise exc
+    return basedir
+
+
+# incremental gpg homedir rebuild {{{1
+def get_gpg_homedirs_revision(basedir):
+    """Return the git revision the gpg homedirs in ``basedir`` were built from.
+
+    Args:
+        basedir (str): the base directory of the gpg homedirs.
+
+    Returns:
+        str: the git revision, if known
+        None: if the revision file doesn't exist
+
+    """
+    path = os.path.join(basedir, GPG_HOMEDIRS_REVISION_FILENAME)
+    if os.path.exists(path):
+        with open(path, "r") as fh:
+            return fh.read().rstrip()
+
+
+def write_gpg_homedirs_revision(basedir, revision):
+    """Record the git revision the gpg homedirs in ``basedir`` were built from.
+
+    This is noop if ``basedir`` doesn't exist.
+
+    Args:
+        basedir (str): the base directory of the gpg homedirs.
+        revision (str): the git revision.
+
+    """
+    if not os.path.isdir(basedir):
+        return
+    with open(os.path.join(basedir, GPG_HOMEDIRS_REVISION_FILENAME), "w") as fh:
+        fh.write(revision)
+
+
+def _update_gpg_homedir_keys(context, gpg_home, key_dirs, diff, old_revision,
+                             my_fingerprint, ignore_suffixes):
+    """Apply the key changes in ``diff`` to a single gpg homedir.
+
+    Every key from the old version of a modified or deleted file is deleted,
+    so dropped signatures and uids don't linger.  Then the added and modified
+    files are imported, along with any unchanged file that holds one of the
+    deleted keys.  Like the full rebuild, the keys we sign are then checked
+    for our signature.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+        gpg_home (str): the gpg homedir to update.
+        key_dirs (list): a list of (dir, sign) tuples.  ``dir`` is a key
+            directory relative to ``git_key_repo_dir``; ``sign`` is whether
+            to sign the keys in it with ``my_fingerprint``.
+        diff (dict): the output of ``get_git_diff``.
+        old_revision (str): the git revision ``gpg_home`` was built from.
+        my_fingerprint (str): the fingerprint of our own key.
+        ignore_suffixes (list): the suffixes to ignore in the key dirs.
+
+    Returns:
+        dict: the changed files per key dir, as ``{dir: {filename: status}}``.
+
+    Raises:
+        ScriptWorkerGPGException: on error.
+
+    """
+    repo_path = context.config['git_key_repo_dir']
+    event_loop = asyncio.get_event_loop()
+    changed = {}
+    for key_dir, _ in key_dirs:
+        changed[key_dir] = {
+            filename: status for filename, status in diff.items()
+            if filename.startswith(key_dir + '/') and not has_suffix(filename, ignore_suffixes)
+        }
+    if not any(changed.values()):
+        return changed
+    stale = set()
+    for files in changed.values():
+        for filename, status in files.items():
+            if status != 'A':
+                contents = event_loop.run_until_complete(
+                    get_git_file_contents(repo_path, old_revision, filename)
+                )
+                stale.update(get_armored_key_fingerprints(contents))
+    stale.discard(my_fingerprint)
+    gpg = GPG(context, gpg_home=gpg_home)
+    my_keyid = fingerprint_to_keyid(gpg, my_fingerprint)
+    delete_keys(gpg, sorted(stale))
+    messages = []
+    for key_dir, sign in key_dirs:
+        keydir = os.path.join(repo_path, key_dir)
+        paths = []
+        if os.path.isdir(keydir):
+            for filepath in filepaths_in_dir(keydir):
+                if has_suffix(filepath, ignore_suffixes):
+                    continue
+                path = os.path.join(keydir, filepath)
+                if os.path.join(key_dir, filepath) not in changed[key_dir]:
+                    if not stale:
+                        continue
+                    with open(path, "r") as fh:
+                        if not stale.intersection(get_armored_key_fingerprints(fh.read())):
+                            continue
+                paths.append(path)
+        log.info("{}: importing {} key files from {}".format(gpg_home, len(paths), key_dir))
+        fingerprints = import_key_files(gpg, paths, messages)
+        if sign:
+            sign_keys(context, fingerprints, signing_key=my_fingerprint, gpg_home=gpg_home)
+            get_list_sigs_outputs(
+                context, fingerprints, gpg_home=gpg_home,
+                expected={
+                    'sig_keyids': [my_keyid],
+                },
+            )
+    if messages:
+        raise ScriptWorkerGPGException('\n'.join(messages))
+    return changed
+
+
+def update_gpg_homedirs_from_diff(context, tag, old_revision, new_revision,
+                                  basedir=None, verify_function=verify_signed_tag):
+    """Update a copy of the live gpg homedirs from ``old_revision`` to ``new_revision``.
+
+    The live homedirs in ``base_gpg_home_dir`` are copied to ``basedir``, and
+    only the keys in files that changed between the two revisions are
+    deleted, imported and signed.  Ownertrust is recomputed if a signed
+    homedir's trusted keys changed, and checked in every signed homedir.
+
+    Our own key isn't in the git diff, so if ``pubkey_path`` no longer
+    matches the live homedirs' secret key, we raise to force a full rebuild.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+        tag (str): the tag name to verify
+        old_revision (str): the git revision the live homedirs were built from.
+        new_revision (str): the git revision to update to.
+        basedir (str, optional): the path to the base directory to update the
+            gpg homedirs in.  This directory will be wiped if it exists.
+            If None, use ``context.config['base_gpg_home_dir']``.  Defaults to None.
+        verify_function (function, optional): the function to verify ``tag``
+            with.  Defaults to ``verify_signed_tag``.
+
+    Returns:
+        str: on success.
+
+    Raises:
+        ScriptWorkerGPGException: if the live homedirs aren't at ``old_revision``,
+            if our own key has changed, or on update exception.  The caller
+            should fall back to ``build_gpg_homedirs_from_repo``.
+
+    """
+    live_basedir = context.config['base_gpg_home_dir']
+    basedir = basedir or live_basedir
+    repo_path = context.config['git_key_repo_dir']
+    event_loop = asyncio.get_event_loop()
+    event_loop.run_until_complete(verify_function(context, tag))
+    live_revision = get_gpg_homedirs_revision(live_basedir)
+    if live_revision != old_revision:
+        raise ScriptWorkerGPGException(
+            "{} was built from {}, not {}; can't update it incrementally!".format(
+                live_basedir, live_revision, old_revision
+            )
+        )
+    diff = event_loop.run_until_complete(get_git_diff(repo_path, old_revision, new_revision))
+    with open(context.config['pubkey_path'], "r") as fh:
+        my_fingerprint = get_armored_key_fingerprints(fh.read())[0]
+    if basedir != live_basedir:
+        rm(basedir)
+        # skip the gpg-agent sockets and the version lockfile
+        shutil.copytree(
+            live_basedir, basedir,
+            ignore=shutil.ignore_patterns("S.*", GPG_HOMEDIRS_VERSION_LOCK_FILENAME)
+        )
+    for worker_impl, worker_config in context.config['gpg_homedirs'].items():
+        gpg_home = os.path.join(basedir, worker_impl)
+        if not os.path.isdir(gpg_home):
+            raise ScriptWorkerGPGException("{} doesn't exist to update!".format(gpg_home))
+        own_fingerprints = set(get_key_index(GPG(context, gpg_home=gpg_home), private=True)['fingerprint_to_keyid'])
+        if own_fingerprints != {my_fingerprint}:
+            raise ScriptWorkerGPGException(
+                "{} was built with secret key(s) {}, not {}; can't update it incrementally!".format(
+                    gpg_home, sorted(own_fingerprints), my_fingerprint
+                )
+            )
+        trusted_dir = os.path.join(worker_impl, "trusted")
+        if worker_config['type'] == 'flat':
+            key_dirs = ((worker_impl, True), )
+        else:
+            key_dirs = ((trusted_dir, True), (os.path.join(worker_impl, "valid"), False))
+        changed = _update_gpg_homedir_keys(
+            context, gpg_home, key_dirs, diff, old_revision, my_fingerprint,
+            worker_config['ignore_suffixes']
+        )
+        if changed.get(trusted_dir):
+            trusted_fingerprints = []
+            trusted_path = os.path.join(repo_path, trusted_dir)
+            for filepath in filepaths_in_dir(trusted_path):
+                if not has_suffix(filepath, worker_config['ignore_suffixes']):
+                    with open(os.path.join(trusted_path, filepath), "r") as fh:
+                        trusted_fingerprints.extend(get_armored_key_fingerprints(fh.read()))
+            update_ownertrust(
+                context, my_fingerprint, trusted_fingerprints=trusted_fingerprints,
+                gpg_home=gpg_home
             )
+        if worker_config['type'] != 'flat':
+            check_ownertrust(context, gpg_home=gpg_home)
     return basedir
 
 
+# versioned gpg homedirs {{{1
+def get_gpg_homedir_versions_dir(context):
+    """Return the directory holding the gpg homedir versions.
+
+    ``base_gpg_home_dir`` is a symlink to one of the versions in here.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+
+    Returns:
+        str: the base_gpg_home_dir with .versions at the end.
+
+    """
+    return '{}.versions'.format(context.config['base_gpg_home_dir'])
+
+
+def create_gpg_homedir_version(context):
+    """Create a new, empty gpg homedir version to build into.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+
+    Returns:
+        str: the path to the new version.
+
+    """
+    versions_dir = get_gpg_homedir_versions_dir(context)
+    makedirs(versions_dir)
+    return tempfile.mkdtemp(
+        prefix="{}-".format(arrow.utcnow().format("YYYYMMDDHHmmss")), dir=versions_dir
+    )
+
+
+def publish_gpg_homedir_version(context, version_path):
+    """Point ``base_gpg_home_dir`` at ``version_path``.
+
+    The symlink is replaced atomically, so readers see either the old or the
+    new version, never a partial one.  A ``base_gpg_home_dir`` that is still
+    a real directory is removed first.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+        version_path (str): the path to the gpg homedir version.
+
+    """
+    base = context.config['base_gpg_home_dir']
+    log.info("Publishing gpg homedirs {} at {}".format(version_path, base))
+    tmp_link = "{}.{}.link".format(base, os.getpid())
+    rm(tmp_link)
+    os.symlink(version_path, tmp_link)
+    if os.path.isdir(base) and not os.path.islink(base):
+        rm(base)
+    os.replace(tmp_link, base)
+
+
+def _open_version_lockfile(version_path):
+    return open(os.path.join(version_path, GPG_HOMEDIRS_VERSION_LOCK_FILENAME), "a")
+
+
+@contextmanager
+def pin_gpg_homedir_version(context):
+    """Hold the current gpg homedir version, so it isn't garbage collected.
+
+    Resolve the ``base_gpg_home_dir`` symlink once and hold a shared lock on
+    that version, so every gpg homedir used inside the block comes from the
+    same version, even if a new one is published meanwhile.  If
+    ``base_gpg_home_dir`` isn't a symlink, yield it as-is.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+
+    Yields:
+        str: the path to the gpg homedir version to use.
+
+    Raises:
+        ScriptWorkerGPGException: if ``base_gpg_home_dir`` points at a
+            missing version.
+
+    """
+    base = context.config['base_gpg_home_dir']
+    previous_path = None
+    while os.path.islink(base):
+        version_path = os.path.realpath(base)
+        if version_path == previous_path:
+            # the symlink still points at the missing version, so it won't resolve
+            raise ScriptWorkerGPGException(
+                "{} points at missing gpg homedir version {}!".format(base, version_path)
+            )
+        previous_path = version_path
+        try:
+            fh = _open_version_lockfile(version_path)
+        except FileNotFoundError:
+            # garbage collected after we resolved the symlink; resolve again
+            continue
+        with fh:
+            fcntl.flock(fh, fcntl.LOCK_SH)
+            if os.path.isdir(version_path):
+                yield version_path
+                return
+    yield base
+
+
+def gc_gpg_homedir_versions(context):
+    """Remove the gpg homedir versions that aren't current or in use.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+
+    Returns:
+        list: the removed versions.
+
+    """
+    versions_dir = get_gpg_homedir_versions_dir(context)
+    current = os.path.realpath(context.config['base_gpg_home_dir'])
+    removed = []
+    if not os.path.isdir(versions_dir):
+        return removed
+    for name in sorted(os.listdir(versions_dir)):
+        version_path = os.path.join(versions_dir, name)
+        if version_path == current or not os.path.isdir(version_path):
+            continue
+        with _open_version_lockfile(version_path) as fh:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                log.info("gpg homedir version {} is in use; skipping".format(version_path))
+                continue
+            log.info("Removing old gpg homedir version {}".format(version_path))
+            rm(version_path)
+            removed.append(version_path)
+    return removed
+
+
 # rebuild_gpg_homedirs {{{1
 def _update_git_and_rebuild_homedirs(context, basedir=None):
     log.info("Updating git repo")
@@ -1415,7 +2410,21 @@ def _update_git_and_rebuild_homedirs(context, basedir=None):
     if new_revision != old_revision:
         log.info("Found new git revision {}!".format(new_revision))
         log.info("Updating gpg homedirs...")
-        build_gpg_homedirs_from_repo(context, tag, basedir=basedir)
+        updated = False
+        if old_revision and context.config['gpg_homedir_incremental_rebuild']:
+            try:
+                update_gpg_homedirs_from_diff(
+                    context, tag, old_revision, new_revision, basedir=basedir
+                )
+                updated = True
+            # ValueError covers UnicodeDecodeError from undecodable key files
+            except (ScriptWorkerException, OSError, ValueError, subprocess.CalledProcessError) as exc:
+                log.warning(
+                    "Incremental gpg homedir update failed; rebuilding from scratch: {}".format(exc)
+                )
+        if not updated:
+            build_gpg_homedirs_from_repo(context, tag, basedir=basedir)
+        write_gpg_homedirs_revision(basedir, new_revision)
         log.info("Writing last_good_git_revision...")
         write_last_good_git_revision(context, new_revision)
         return new_revision
@@ -1426,8 +2435,8 @@ def _update_git_and_rebuild_homedirs(context, basedir=None):
 def get_tmp_base_gpg_home_dir(context):
     """Return the base_gpg_home_dir with a .tmp at the end.
 
-    This function is really only here so we don't have to duplicate this
-    logic.
+    This was the staging dir for the older lockfile handoff to the worker;
+    gpg homedirs are now published through ``publish_gpg_homedir_version``.
 
     Args:
         context (scriptworker.context.Context): the scriptworker context.
@@ -1448,7 +2457,8 @@ def is_lockfile_present(context, name, level=logging.WARNING):
         level (int, optional): the level to log to. Defaults to ``logging.WARNING``
 
     Returns:
-        str: "locked" on r/w lock; "ready" if ready to copy.
+        str: "locked" on r/w lock; "ready" if left by an older scriptworker
+            that handed the homedirs off through the lockfile.
         None: if lockfile is not present
 
     """
@@ -1486,6 +2496,10 @@ def rebuild_gpg_homedirs():
     """Rebuild the gpg homedirs in the background.
 
     This is an entry point, and should be called before scriptworker is run.
+    The homedirs are built into a new version in
+    ``get_gpg_homedir_versions_dir``, which is published by pointing the
+    ``base_gpg_home_dir`` symlink at it.  The lockfile only prevents
+    concurrent rebuilds.
 
     Raises:
         SystemExit: on failure.
@@ -1494,21 +2508,27 @@ def rebuild_gpg_homedirs():
     context, _ = get_context_from_cmdln(sys.argv[1:])
     update_logging_config(context, file_name='rebuild_gpg_homedirs.log')
     log.info("rebuild_gpg_homedirs()...")
-    basedir = get_tmp_base_gpg_home_dir(context)
-    if is_lockfile_present(context, "rebuild_gpg_homedirs"):
+    state = is_lockfile_present(context, "rebuild_gpg_homedirs")
+    if state == "ready":
+        # left over from the older .tmp dir handoff to the worker
+        rm(get_tmp_base_gpg_home_dir(context))
+    elif state:
         return
     create_lockfile(context)
-    new_revision = None
+    basedir = create_gpg_homedir_version(context)
+    published = False
     try:
-        new_revision = _update_git_and_rebuild_homedirs(context, basedir=basedir)
+        if _update_git_and_rebuild_homedirs(context, basedir=basedir):
+            publish_gpg_homedir_version(context, basedir)
+            published = True
     except ScriptWorkerException as exc:
         traceback.print_exc()
         sys.exit(exc.exit_code)
     finally:
-        if new_revision:
-            create_lockfile(context, message="ready")
-        else:
-            rm_lockfile(context)
+        if not published:
+            rm(basedir)
+        gc_gpg_homedir_versions(context)
+        rm_lockfile(context)
         event_loop = asyncio.get_event_loop()
         # Get rid of spurious event_loop errors.
         event_loop.close()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""Lazy imports for scriptworker's heavier dependencies.
+
+``aiohttp``, ``taskcluster``, ``jsonschema`` and friends take a noticeable
+fraction of a second to import, and not every entry point or task script
+needs all of them.  Modules refer to them through ``lazy_import`` instead,
+so they're only imported on first use.
+
+"""
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """A stand-in for a module that imports it on first attribute access.
+
+    Attribute lookups are always forwarded to the real module in
+    ``sys.modules``, rather than cached, so patching the real module (e.g.
+    in tests) is seen through the ``LazyModule`` as well.
+
+    """
+
+    def __getattr__(self, name):
+        """Import the real module, and return its attribute ``name``."""
+        return getattr(importlib.import_module(self.__name__), name)
+
+    def __repr__(self):
+        """Show that this is a lazy module."""
+        return "<lazy module '{}'>".format(self.__name__)
+
+
+def lazy_import(name):
+    """Return a ``LazyModule`` for ``name``, which is imported on first use.
+
+    Args:
+        name (str): the full dotted name of the module, e.g. ``taskcluster.async``.
+
+    Returns:
+        LazyModule: the lazy module.
+
+    """
+    return LazyModule(name)
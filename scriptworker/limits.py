@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+"""Resource limits for the task script.
+
+The ``task_rlimit_*`` configs are set with ``setrlimit`` in the task
+script's ``preexec_fn``, so they apply to each process in the task, and are
+inherited by its children.
+
+If ``task_cgroup_parent`` is set, each task script also runs in a new cgroup
+v2 cgroup under it, with ``task_cgroup_memory_max`` and
+``task_cgroup_cpu_max_percent`` applied to the whole process tree.  The
+parent must be a cgroup the worker can write to, with the ``memory`` and
+``cpu`` controllers enabled in its ``cgroup.subtree_control``; if the task
+cgroup can't be set up, the task runs without it.
+
+Attributes:
+    log (logging.Logger): the log object for the module.
+    CGROUP_CPU_PERIOD (int): the ``cpu.max`` period, in microseconds.
+
+"""
+import asyncio
+import logging
+import os
+import resource
+import signal
+import tempfile
+
+log = logging.getLogger(__name__)
+
+CGROUP_CPU_PERIOD = 100000
+
+
+# get_rlimits {{{1
+def get_rlimits(config):
+    """Get the task script rlimits from the config.
+
+    ``RLIMIT_CPU``'s hard limit is one second over its soft limit, so the
+    task script gets SIGXCPU, rather than SIGKILL, when it runs out of CPU
+    time; ``get_limit_breach`` looks for that.
+
+    Args:
+        config (dict): the running config.
+
+    Returns:
+        list: ``(resource, (soft, hard))`` tuples, for ``resource.setrlimit``.
+
+    """
+    rlimits = []
+    if config['task_rlimit_as']:
+        rlimits.append((resource.RLIMIT_AS, (config['task_rlimit_as'], config['task_rlimit_as'])))
+    if config['task_rlimit_cpu']:
+        rlimits.append((resource.RLIMIT_CPU, (config['task_rlimit_cpu'], config['task_rlimit_cpu'] + 1)))
+    if config['task_rlimit_nofile']:
+        rlimits.append((resource.RLIMIT_NOFILE, (config['task_rlimit_nofile'], config['task_rlimit_nofile'])))
+    return rlimits
+
+
+# get_preexec_fn {{{1
+def get_preexec_fn(rlimits=(), cgroup=None):
+    """Get the ``preexec_fn`` for the task script.
+
+    The task script becomes a process group leader, so it can be killed with
+    its children, joins ``cgroup`` if there is one, and gets ``rlimits``.
+
+    Args:
+        rlimits (list, optional): ``(resource, (soft, hard))`` tuples from
+            ``get_rlimits``.  Defaults to ().
+        cgroup (str, optional): the path of the task cgroup, if any.
+            Defaults to None.
+
+    Returns:
+        function: the ``preexec_fn``.
+
+    """
+    def preexec_fn():
+        os.setsid()
+        if cgroup is not None:
+            # writing 0 moves the writing process
+            with open(os.path.join(cgroup, "cgroup.procs"), "w") as fh:
+                fh.write("0")
+        for resource_, limits in rlimits:
+            resource.setrlimit(resource_, limits)
+    return preexec_fn
+
+
+# create_task_cgroup {{{1
+def _write_cgroup_file(cgroup, name, value):
+    with open(os.path.join(cgroup, name), "w") as fh:
+        fh.write(value)
+
+
+def create_task_cgroup(config):
+    """Create a cgroup for the task script under ``task_cgroup_parent``.
+
+    Args:
+        config (dict): the running config.
+
+    Returns:
+        str: the path of the new cgroup, or None if ``task_cgroup_parent``
+            isn't set, or the cgroup couldn't be set up.
+
+    """
+    parent = config['task_cgroup_parent']
+    if not parent:
+        return None
+    cgroup = None
+    try:
+        cgroup = tempfile.mkdtemp(prefix="task-", dir=parent)
+        if config['task_cgroup_memory_max']:
+            _write_cgroup_file(cgroup, "memory.max", str(config['task_cgroup_memory_max']))
+            # without this, the task would swap instead of hitting the limit
+            if os.path.exists(os.path.join(cgroup, "memory.swap.max")):
+                _write_cgroup_file(cgroup, "memory.swap.max", "0")
+        if config['task_cgroup_cpu_max_percent']:
+            _write_cgroup_file(cgroup, "cpu.max", "{} {}".format(
+                config['task_cgroup_cpu_max_percent'] * CGROUP_CPU_PERIOD // 100, CGROUP_CPU_PERIOD
+            ))
+    except OSError as exc:
+        log.warning("Can't set up a task cgroup under {}; running the task without it: {}".format(parent, exc))
+        if cgroup is not None:
+            try:
+                os.rmdir(cgroup)
+            except OSError:
+                pass
+        return None
+    log.debug("Created task cgroup {}".format(cgroup))
+    return cgroup
+
+
+# remove_task_cgroup {{{1
+async def remove_task_cgroup(cgroup, attempts=20, sleep_time=.1):
+    """Kill anything left in the task cgroup, and remove it.
+
+    Processes that left the task script's process group are still in the
+    cgroup, so they're killed here with ``cgroup.kill``, if the kernel has it.
+    The cgroup can only be removed once they've exited.
+
+    Args:
+        cgroup (str): the path of the task cgroup.  If None, this is a no-op.
+        attempts (int, optional): the number of times to try removing the
+            cgroup.  Defaults to 20.
+        sleep_time (float, optional): the number of seconds between attempts.
+            Defaults to .1.
+
+    """
+    if cgroup is None:
+        return
+    if os.path.exists(os.path.join(cgroup, "cgroup.kill")):
+        _write_cgroup_file(cgroup, "cgroup.kill", "1")
+    for attempt in range(attempts):
+        try:
+            os.rmdir(cgroup)
+            return
+        except OSError as exc:
+            if attempt == attempts - 1:
+                log.warning("Can't remove task cgroup {}: {}".format(cgroup, exc))
+            else:
+                await asyncio.sleep(sleep_time)
+
+
+# get_limit_breach {{{1
+def get_limit_breach(returncode, cgroup=None):
+    """Find out whether the task script was ended by a resource limit.
+
+    This catches the task script getting SIGXCPU from ``RLIMIT_CPU`` or
+    SIGXFSZ, and the OOM killer firing in the task cgroup.  Failed
+    allocations under ``RLIMIT_AS`` and ``RLIMIT_NOFILE`` are errors inside
+    the task script, so they're up to the task script to report.  A task
+    script that exits 0 didn't breach anything, even if one of its
+    processes was OOM killed.
+
+    Args:
+        returncode (int): the task script's return code.
+        cgroup (str, optional): the path of the task cgroup, if any.
+            Defaults to None.
+
+    Returns:
+        tuple: ``(limit, description)``, where ``limit`` is one of ``cpu``,
+            ``fsize`` or ``memory``; or None if there wasn't a breach.
+
+    """
+    if not returncode:
+        return None
+    if returncode == -signal.SIGXCPU:
+        return "cpu", "the task script exceeded task_rlimit_cpu"
+    if returncode == -signal.SIGXFSZ:
+        return "fsize", "the task script exceeded the file size limit"
+    if cgroup is not None:
+        try:
+            with open(os.path.join(cgroup, "memory.events")) as fh:
+                events = dict(line.split() for line in fh if line.strip())
+        except OSError:
+            events = {}
+        if int(events.get("oom_kill", 0)):
+            return "memory", "{} process(es) in the task cgroup were killed for exceeding " \
+                "task_cgroup_memory_max".format(events["oom_kill"])
+    return None
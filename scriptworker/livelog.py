@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""Serve the task log over http while the task is running.
+
+Each ``GET /live_backing.log`` gets the log so far, then streams the rest of
+the task output with chunked transfer encoding until the task finishes.  The
+on-disk head of the log is read in ``LIVE_LOG_CHUNK_SIZE`` chunks in the
+default executor, so attaching to a large log doesn't block the event loop.
+
+Attributes:
+    log (logging.Logger): the log object for this module.
+
+"""
+import asyncio
+import collections
+import logging
+
+from scriptworker.lazy import lazy_import
+
+aiohttp_web = lazy_import("aiohttp.web")
+
+log = logging.getLogger(__name__)
+
+LIVE_LOG_PATH = "/live_backing.log"
+LIVE_LOG_CHUNK_SIZE = 64 * 1024
+
+
+# LiveLogClient {{{1
+class LiveLogClient(object):
+    """Buffer the task output for one live log request.
+
+    This is added to ``BoundedLogFile.listeners``.  If the client falls more
+    than ``max_pending_bytes`` behind, it stops buffering and is marked as
+    overflowed, so a slow client can't use unbounded memory.
+
+    Attributes:
+        max_pending_bytes (int): the maximum number of bytes to buffer.
+        chunks (collections.deque): the buffered output.
+        pending_bytes (int): the number of bytes in ``chunks``.
+        overflowed (bool): whether the client fell too far behind.
+        closed (bool): whether the task log is complete.
+        event (asyncio.Event): set when there's something new to send.
+
+    """
+
+    def __init__(self, max_pending_bytes):
+        """Initialize LiveLogClient."""
+        self.max_pending_bytes = max_pending_bytes
+        self.chunks = collections.deque()
+        self.pending_bytes = 0
+        self.overflowed = False
+        self.closed = False
+        self.event = asyncio.Event()
+
+    def __call__(self, text):
+        """Buffer ``text`` to send to the client."""
+        if self.overflowed:
+            return
+        data = text.encode('utf-8')
+        if self.pending_bytes + len(data) > self.max_pending_bytes:
+            self.overflowed = True
+        else:
+            self.chunks.append(data)
+            self.pending_bytes += len(data)
+        self.event.set()
+
+    def close(self):
+        """Mark the task log as complete."""
+        self.closed = True
+        self.event.set()
+
+
+# live_log_handler {{{1
+async def _write_log_head(response, path, length):
+    """Stream the first ``length`` bytes of ``path`` to ``response``."""
+    loop = asyncio.get_event_loop()
+    with open(path, "rb") as fh:
+        while length > 0:
+            data = await loop.run_in_executor(None, fh.read, min(LIVE_LOG_CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            response.write(data)
+            await response.drain()
+
+
+async def live_log_handler(request):
+    """Stream the task log to the client.
+
+    Args:
+        request (aiohttp.web.Request): the request.
+
+    Returns:
+        aiohttp.web.StreamResponse: the response.
+
+    """
+    app = request.app
+    log_file = app['log_file']
+    response = aiohttp_web.StreamResponse(headers={'Content-Type': 'text/plain; charset=utf-8'})
+    response.enable_chunked_encoding()
+    # subscribe and snapshot the log so far without yielding to the event
+    # loop, so no output is missed or sent twice
+    client = LiveLogClient(app['max_pending_bytes'])
+    log_file.listeners.append(client)
+    path, head_length, tail_chunks = log_file.get_snapshot()
+    app['clients'].add(client)
+    try:
+        await response.prepare(request)
+        # aiohttp sends the headers with the first write, even if it's empty
+        response.write(b"")
+        await response.drain()
+        await _write_log_head(response, path, head_length)
+        for chunk in tail_chunks:
+            response.write(chunk)
+            await response.drain()
+        while not client.closed and not client.overflowed:
+            await client.event.wait()
+            client.event.clear()
+            while client.chunks:
+                response.write(client.chunks.popleft())
+            client.pending_bytes = 0
+            await response.drain()
+        if client.overflowed:
+            response.write(b"\n[scriptworker: live log client fell behind; disconnecting]\n")
+        await response.write_eof()
+    finally:
+        log_file.listeners.remove(client)
+        app['clients'].discard(client)
+    return response
+
+
+# start_live_log_server {{{1
+async def start_live_log_server(context, log_file):
+    """Start serving ``log_file`` at ``live_log_host``:``live_log_port``.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+        log_file (scriptworker.log.BoundedLogFile): the task log.
+
+    Returns:
+        aiohttp.web.Application: the live log app, to pass to
+            ``stop_live_log_server``.  ``app['url']`` is the live log url.
+
+    """
+    app = aiohttp_web.Application()
+    app['log_file'] = log_file
+    app['clients'] = set()
+    app['max_pending_bytes'] = context.config['live_log_max_pending_bytes']
+    app.router.add_get(LIVE_LOG_PATH, live_log_handler)
+    app['handler'] = app.make_handler(access_log=None)
+    app['server'] = await asyncio.get_event_loop().create_server(
+        app['handler'], context.config['live_log_host'], context.config['live_log_port']
+    )
+    host, port = app['server'].sockets[0].getsockname()[:2]
+    app['url'] = "http://{}:{}{}".format(host, port, LIVE_LOG_PATH)
+    log.info("Serving the live task log at {}".format(app['url']))
+    return app
+
+
+# stop_live_log_server {{{1
+async def stop_live_log_server(app, timeout=10):
+    """Finish the live log responses, and stop the live log server.
+
+    Args:
+        app (aiohttp.web.Application): the app from ``start_live_log_server``.
+        timeout (int, optional): the number of seconds to let the clients
+            finish before closing their connections.  Defaults to 10.
+
+    """
+    for client in list(app['clients']):
+        client.close()
+    app['server'].close()
+    await app['server'].wait_closed()
+    await app.shutdown()
+    await app['handler'].shutdown(timeout)
+    await app.cleanup()
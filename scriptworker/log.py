@@ -3,18 +3,28 @@
 
 Attributes:
     log (logging.Logger): the log object for this module.
+    MAX_PARTIAL_LINE_LENGTH (int): the length at which ``pipe_to_log`` writes
+        out a line that hasn't ended yet.
 
 """
+import atexit
+import codecs
+import collections
 import logging
 import logging.handlers
 import os
+import queue
+import time
 
 from contextlib import contextmanager
 
-from scriptworker.utils import makedirs, to_unicode
+from scriptworker.utils import makedirs
 
 log = logging.getLogger(__name__)
 
+# ``pipe_to_log`` writes out an unterminated line once it's this long
+MAX_PARTIAL_LINE_LENGTH = 1024 * 1024
+
 
 def update_logging_config(context, log_name=None, file_name='worker.log'):
     """Update python logging settings from config.
@@ -25,6 +35,10 @@ def update_logging_config(context, log_name=None, file_name='worker.log'):
     * Use formatting from config settings.
     * Log to screen if ``verbose``
     * Add a rotating logfile from config settings.
+    * If ``log_via_queue``, the screen and logfile handlers run in a
+      ``QueueListener`` thread, behind a ``QueueHandler``.  Log calls then
+      only put the record on the queue, and the formatting, file writes and
+      log rotation happen off the event loop.
 
     Args:
         context (scriptworker.context.Context): the scriptworker context.
@@ -32,6 +46,10 @@ def update_logging_config(context, log_name=None, file_name='worker.log'):
             If None, use the top level module ('scriptworker').
             Defaults to None.
 
+    Returns:
+        logging.handlers.QueueListener: the running listener, if
+            ``log_via_queue``.  It's stopped at exit.  Otherwise None.
+
     """
     log_name = log_name or __name__.split('.')[0]
     top_level_logger = logging.getLogger(log_name)
@@ -39,13 +57,14 @@ def update_logging_config(context, log_name=None, file_name='worker.log'):
     datefmt = context.config['log_datefmt']
     fmt = context.config['log_fmt']
     formatter = logging.Formatter(fmt=fmt, datefmt=datefmt)
+    handlers = []
 
     if context.config.get("verbose"):
         top_level_logger.setLevel(logging.DEBUG)
         if len(top_level_logger.handlers) == 0:
             handler = logging.StreamHandler()
             handler.setFormatter(formatter)
-            top_level_logger.addHandler(handler)
+            handlers.append(handler)
     else:
         top_level_logger.setLevel(logging.INFO)
 
@@ -57,29 +76,105 @@ def update_logging_config(context, log_name=None, file_name='worker.log'):
         backupCount=context.config['log_num_backups'],
     )
     handler.setFormatter(formatter)
-    top_level_logger.addHandler(handler)
+    handlers.append(handler)
+
+    listener = None
+    if context.config.get("log_via_queue"):
+        log_queue = queue.Queue(-1)
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        handlers = [logging.handlers.QueueHandler(log_queue)]
+    for handler in handlers:
+        top_level_logger.addHandler(handler)
     top_level_logger.addHandler(logging.NullHandler())
+    return listener
+
 
+class _LogRateLimiter(object):
+    """Send lines to ``log``, dropping the lines over a per-second limit.
 
-async def pipe_to_log(pipe, filehandles=(), level=logging.INFO):
+    Attributes:
+        level (int): the level to log to.
+        max_lines_per_second (int): the maximum number of lines to log per
+            second.  If 0, log every line.
+        window_start (float): the ``time.monotonic`` start of the current second.
+        logged (int): the number of lines logged in the current second.
+        dropped (int): the number of lines dropped since the last report.
+
+    """
+
+    def __init__(self, level, max_lines_per_second):
+        """Initialize _LogRateLimiter."""
+        self.level = level
+        self.max_lines_per_second = max_lines_per_second
+        self.window_start = time.monotonic()
+        self.logged = 0
+        self.dropped = 0
+
+    def log_lines(self, lines):
+        """Log ``lines``, up to the per-second limit."""
+        if self.max_lines_per_second:
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.flush()
+                self.window_start = now
+                self.logged = 0
+            allowed = max(self.max_lines_per_second - self.logged, 0)
+            self.dropped += max(len(lines) - allowed, 0)
+            lines = lines[:allowed]
+            self.logged += len(lines)
+        for line in lines:
+            log.log(self.level, line.rstrip())
+
+    def flush(self):
+        """Log the number of dropped lines, if any."""
+        if self.dropped:
+            log.log(self.level, "[{} lines not logged; over the limit of {} lines per second]".format(
+                self.dropped, self.max_lines_per_second
+            ))
+            self.dropped = 0
+
+
+async def pipe_to_log(pipe, filehandles=(), level=logging.INFO, chunk_size=64 * 1024,
+                      max_lines_per_second=0):
     """Log from a subprocess PIPE.
 
+    The pipe is read in chunks of up to ``chunk_size`` bytes, and each chunk's
+    complete lines are written to the ``filehandles`` in one write, so a busy
+    task doesn't block on a full pipe while we handle it line by line.  Lines
+    longer than ``MAX_PARTIAL_LINE_LENGTH`` are written in pieces.
+
     Args:
         pipe (filehandle): subprocess process STDOUT or STDERR
         filehandles (list of filehandles, optional): the filehandle(s) to write
             to.  If empty, don't write to a separate file.  Defaults to ().
         level (int, optional): the level to log to.  Defaults to ``logging.INFO``.
+        chunk_size (int, optional): the maximum number of bytes to read at a
+            time.  Defaults to 64KB.
+        max_lines_per_second (int, optional): the maximum number of lines to
+            send to ``log`` per second; the rest are only written to the
+            ``filehandles``, and counted.  If 0, log every line.  Defaults to 0.
 
     """
-    while True:
-        line = await pipe.readline()
-        if line:
-            line = to_unicode(line)
-            log.log(level, line.rstrip())
+    limiter = _LogRateLimiter(level, max_lines_per_second)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    partial = ''
+    eof = False
+    while not eof:
+        data = await pipe.read(chunk_size)
+        eof = not data
+        text = partial + decoder.decode(data, final=eof)
+        end = text.rfind('\n') + 1
+        if eof or (end == 0 and len(text) >= MAX_PARTIAL_LINE_LENGTH):
+            end = len(text)
+        text, partial = text[:end], text[end:]
+        if text:
             for filehandle in filehandles:
-                print(line, file=filehandle, end="")
-        else:
-            break
+                filehandle.write(text)
+            # split on \n only, so e.g. \r progress output stays on one line, like in the task log
+            limiter.log_lines(text.rstrip('\n').split('\n'))
+    limiter.flush()
 
 
 def get_log_filename(context):
@@ -96,21 +191,150 @@ def get_log_filename(context):
     return os.path.join(context.config['task_log_dir'], 'live_backing.log')
 
 
+class BoundedLogFile(object):
+    """A write-only text log file that keeps only its head and tail.
+
+    The first ``head_bytes`` bytes written go straight to ``filehandle``.
+    After that, the last ``tail_bytes`` bytes are kept in memory; the bytes
+    in between are dropped and counted.  On ``close``, a truncation marker
+    and the tail are written out.
+
+    Attributes:
+        filehandle (filehandle): the binary filehandle to write to.
+        head_bytes (int): the number of bytes to write before truncating.
+        tail_bytes (int): the number of trailing bytes to keep.
+        written_bytes (int): the number of bytes written to ``filehandle``
+            so far.
+        dropped_bytes (int): the number of bytes dropped from the middle.
+        listeners (list): callables that are passed each ``write``'s text,
+            e.g. to stream the log live.
+
+    """
+
+    def __init__(self, filehandle, head_bytes, tail_bytes):
+        """Initialize BoundedLogFile."""
+        self.filehandle = filehandle
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.written_bytes = 0
+        self.dropped_bytes = 0
+        self.listeners = []
+        self._tail = collections.deque()
+        self._tail_len = 0
+
+    def write(self, text):
+        """Write ``text``, keeping it if it's in the head or tail.
+
+        ``text`` is also passed to each of the ``listeners``.
+
+        Args:
+            text (str): the text to write.
+
+        Returns:
+            int: the length of ``text``.
+
+        """
+        data = text.encode('utf-8')
+        room = self.head_bytes - self.written_bytes
+        if room > 0:
+            head = data[:_utf8_boundary(data, room)]
+            self.filehandle.write(head)
+            self.written_bytes += len(head)
+            data = data[len(head):]
+        if data:
+            self._tail.append(data)
+            self._tail_len += len(data)
+            while self._tail_len > self.tail_bytes:
+                excess = self._tail_len - self.tail_bytes
+                if len(self._tail[0]) <= excess:
+                    excess = len(self._tail.popleft())
+                else:
+                    self._tail[0] = self._tail[0][excess:]
+                self._tail_len -= excess
+                self.dropped_bytes += excess
+        for listener in self.listeners:
+            listener(text)
+        return len(text)
+
+    def flush(self):
+        """Flush the head to disk."""
+        self.filehandle.flush()
+
+    def _get_tail_chunks(self):
+        """Return the dropped byte count and the tail chunks, with the truncation marker."""
+        chunks = list(self._tail)
+        dropped_bytes = self.dropped_bytes
+        if dropped_bytes:
+            # don't start the tail in the middle of a character
+            while chunks:
+                start = _utf8_boundary(chunks[0], 0)
+                dropped_bytes += start
+                if start < len(chunks[0]):
+                    chunks[0] = chunks[0][start:]
+                    break
+                chunks.pop(0)
+            chunks.insert(0, "\n[scriptworker: {} bytes of task output truncated]\n".format(
+                dropped_bytes
+            ).encode('utf-8'))
+        return dropped_bytes, chunks
+
+    def get_snapshot(self):
+        """Get what the log would contain if it were closed now.
+
+        The head is flushed to disk and returned as a length to read from the
+        log file, so callers can stream it instead of holding it in memory.
+        The tail chunks are shared with this object, not copied.
+
+        Returns:
+            tuple: (path, head length, list of tail ``bytes`` chunks)
+
+        """
+        self.flush()
+        return self.filehandle.name, self.written_bytes, self._get_tail_chunks()[1]
+
+    def close(self):
+        """Write the truncation marker, if needed, and the tail."""
+        self.dropped_bytes, chunks = self._get_tail_chunks()
+        tail = b''.join(chunks)
+        self._tail.clear()
+        self._tail_len = 0
+        if self.dropped_bytes:
+            log.warning("Truncated the task log; dropped {} bytes".format(self.dropped_bytes))
+        self.filehandle.write(tail)
+        self.written_bytes += len(tail)
+
+
+def _utf8_boundary(data, index):
+    """Move ``index`` forward past any utf-8 continuation bytes in ``data``."""
+    while index < len(data) and data[index] & 0xC0 == 0x80:
+        index += 1
+    return index
+
+
 @contextmanager
 def get_log_filehandle(context):
-    """Open the log and error filehandles.
+    """Open the task log filehandle.
+
+    The log keeps the first ``task_log_head_bytes`` and the last
+    ``task_log_tail_bytes`` bytes of the task output; see ``BoundedLogFile``.
 
     Args:
         context (scriptworker.context.Context): the scriptworker context.
 
     Yields:
-        log filehandle
+        BoundedLogFile: the log filehandle
 
     """
     log_file_name = get_log_filename(context)
     makedirs(context.config['task_log_dir'])
-    with open(log_file_name, "w", encoding="utf-8") as filehandle:
-        yield filehandle
+    with open(log_file_name, "wb", buffering=1024 * 1024) as fh:
+        filehandle = BoundedLogFile(
+            fh, context.config['task_log_head_bytes'], context.config['task_log_tail_bytes']
+        )
+        try:
+            yield filehandle
+        finally:
+            filehandle.close()
 
 
 @contextmanager
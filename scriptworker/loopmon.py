@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+"""Event loop lag monitoring.
+
+A sampling coroutine sleeps for ``interval`` seconds at a time, and measures
+how late it wakes up; that's the loop lag.  A watchdog thread watches the
+sampler's heartbeat, and if the loop is blocked for longer than
+``threshold``, it logs the loop thread's stack while it's still blocked, so
+the blocking call can be found.
+
+Attributes:
+    log (logging.Logger): the log object for the module.
+
+"""
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from scriptworker.metrics import LOOP_LAG_SECONDS
+
+log = logging.getLogger(__name__)
+
+
+# LoopLagMonitor {{{1
+class LoopLagMonitor(object):
+    """Sample the event loop lag, and log the stack when the loop is blocked.
+
+    Attributes:
+        loop (asyncio.AbstractEventLoop): the loop to monitor.
+        interval (float): the number of seconds between samples.
+        threshold (float): log the loop thread's stack if the loop is blocked
+            for longer than this many seconds.
+        samples (collections.deque): the most recent lag samples, in seconds.
+            Their percentiles are logged each time it fills up again.
+
+    """
+
+    def __init__(self, loop=None, interval=0.25, threshold=0.5, max_samples=1000):
+        """Initialize LoopLagMonitor."""
+        self.loop = loop or asyncio.get_event_loop()
+        self.interval = interval
+        self.threshold = threshold
+        self.samples = collections.deque(maxlen=max_samples)
+        self._num_samples = 0
+        self._heartbeat = None
+        self._loop_thread_id = None
+        self._sampler = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start the sampler and the watchdog thread.
+
+        This must be called from the loop's thread.
+
+        """
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._sampler = asyncio.ensure_future(self._sample(), loop=self.loop)
+        self._watchdog = threading.Thread(target=self._watch, name="LoopLagMonitor", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        """Stop the sampler and the watchdog thread.
+
+        The watchdog is joined before the heartbeat stops, so it can't report
+        a stale block after ``stop`` returns.
+
+        """
+        self._stopped.set()
+        if self._watchdog is not None:
+            # the watchdog wakes up as soon as _stopped is set
+            self._watchdog.join(self.interval)
+        self._watchdog = None
+        if self._sampler is not None:
+            self._sampler.cancel()
+            try:
+                await self._sampler
+            except asyncio.CancelledError:
+                pass
+        self._sampler = None
+        self._heartbeat = None
+
+    def record(self, lag):
+        """Record a lag sample.
+
+        Args:
+            lag (float): the lag in seconds.
+
+        """
+        self.samples.append(lag)
+        LOOP_LAG_SECONDS.observe(lag)
+        self._num_samples += 1
+        if self._num_samples % self.samples.maxlen == 0:
+            log.debug("Event loop lag over the last {} samples: {}".format(
+                len(self.samples), self.percentiles()
+            ))
+
+    async def _sample(self):
+        while True:
+            start = self.loop.time()
+            await asyncio.sleep(self.interval)
+            self._heartbeat = time.monotonic()
+            self.record(max(self.loop.time() - start - self.interval, 0))
+
+    def _watch(self):
+        reported = None
+        while not self._stopped.wait(self.interval):
+            heartbeat = self._heartbeat
+            if heartbeat is None:
+                continue
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked > self.threshold and heartbeat != reported:
+                reported = heartbeat
+                frame = sys._current_frames().get(self._loop_thread_id)
+                stack = "".join(traceback.format_stack(frame)) if frame else "(no stack)"
+                log.warning("Event loop blocked for more than {:.3f}s; loop thread stack:\n{}".format(
+                    blocked, stack
+                ))
+
+    def percentiles(self, percents=(50, 90, 99, 100)):
+        """Get percentiles of the recent lag samples.
+
+        Args:
+            percents (tuple, optional): the percentiles to get.  Defaults to
+                ``(50, 90, 99, 100)``.
+
+        Returns:
+            dict: ``{"p50": seconds, ...}``, or an empty dict with no samples.
+
+        """
+        samples = sorted(self.samples)
+        if not samples:
+            return {}
+        return {
+            "p{}".format(percent): samples[min(int(len(samples) * percent / 100), len(samples) - 1)]
+            for percent in percents
+        }
+
+
+# start_loop_monitoring {{{1
+def start_loop_monitoring(context, loop=None):
+    """Set up the loop lag monitor and asyncio slow callback logging from config.
+
+    If ``asyncio_slow_callback_duration`` is set, the loop is put in asyncio
+    debug mode, which logs each callback that takes longer than that.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+        loop (asyncio.AbstractEventLoop, optional): the loop to monitor.
+            If None, use the current event loop.  Defaults to None.
+
+    Returns:
+        LoopLagMonitor: the started monitor, or None if
+            ``loop_lag_monitor_enabled`` is False.
+
+    """
+    loop = loop or asyncio.get_event_loop()
+    if context.config['asyncio_slow_callback_duration']:
+        loop.set_debug(True)
+        loop.slow_callback_duration = context.config['asyncio_slow_callback_duration']
+    if not context.config['loop_lag_monitor_enabled']:
+        return None
+    monitor = LoopLagMonitor(
+        loop=loop, interval=context.config['loop_lag_interval'],
+        threshold=context.config['loop_lag_threshold'],
+    )
+    monitor.start()
+    return monitor
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+"""In-process worker metrics, served in the Prometheus text format.
+
+The metrics are module-level ``Counter`` and ``Histogram`` objects, updated
+where the work happens.  If ``metrics_enabled`` is set, the worker serves
+them at ``/metrics`` on ``metrics_host``:``metrics_port``, or on the unix
+socket ``metrics_unix_socket`` if that's set.
+
+Attributes:
+    log (logging.Logger): the log object for the module.
+    REGISTRY (list): the metrics to serve, in order.
+
+"""
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from scriptworker.lazy import lazy_import
+
+aiohttp_web = lazy_import("aiohttp.web")
+
+log = logging.getLogger(__name__)
+
+REGISTRY = []
+METRICS_PATH = "/metrics"
+DEFAULT_BUCKETS = (.01, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    return "{{{}}}".format(",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    ))
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+# _Metric {{{1
+class _Metric(object):
+    """The name, labels and registration shared by ``Counter`` and ``Histogram``.
+
+    Attributes:
+        name (str): the metric name.
+        documentation (str): the metric help text.
+        labelnames (tuple): the label names.
+
+    """
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        """Initialize the metric, and add it to ``registry``."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError("{} expects labels {}; got {}".format(self.name, self.labelnames, sorted(labels)))
+        return tuple(labels[name] for name in self.labelnames)
+
+
+# Counter {{{1
+class Counter(_Metric):
+    """A monotonically increasing count, optionally split by labels."""
+
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        """Increment the count.
+
+        Args:
+            amount (float, optional): the amount to add.  Defaults to 1.
+            **labels: the label values.
+
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        """Get the count for ``labels``.
+
+        Returns:
+            float: the count.
+
+        """
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self):
+        """Get the Prometheus text lines for this counter.
+
+        Returns:
+            list: the lines.
+
+        """
+        with self._lock:
+            values = sorted(self._values.items())
+        return ["{}{} {}".format(self.name, _format_labels(self.labelnames, key), _format_value(value))
+                for key, value in values]
+
+
+# Histogram {{{1
+class Histogram(_Metric):
+    """A distribution of observed values, e.g. latencies in seconds.
+
+    Attributes:
+        buckets (tuple): the bucket upper bounds, without ``+Inf``.
+
+    """
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        """Initialize Histogram, and add it to ``registry``."""
+        super(Histogram, self).__init__(name, documentation, labelnames=labelnames, registry=registry)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"), )
+
+    def observe(self, value, **labels):
+        """Add an observation.
+
+        Args:
+            value (float): the observed value.
+            **labels: the label values.
+
+        """
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the ``with`` block takes, even if it raises.
+
+        Args:
+            **labels: the label values.
+
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def get(self, **labels):
+        """Get the observation count and sum for ``labels``.
+
+        Returns:
+            tuple: (count, sum)
+
+        """
+        counts, total = self._values.get(self._key(labels), ([0] * len(self.buckets), 0))
+        return counts[-1], total
+
+    def collect(self):
+        """Get the Prometheus text lines for this histogram.
+
+        Returns:
+            list: the lines.
+
+        """
+        lines = []
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in values:
+            for bound, count in zip(self.buckets, counts):
+                lines.append("{}_bucket{} {}".format(
+                    self.name, _format_labels(self.labelnames, key, extra=[("le", _format_value(bound))]), count
+                ))
+            lines.append("{}_count{} {}".format(self.name, _format_labels(self.labelnames, key), counts[-1]))
+            lines.append("{}_sum{} {}".format(self.name, _format_labels(self.labelnames, key), _format_value(total)))
+        return lines
+
+
+# generate_latest {{{1
+def generate_latest(registry=REGISTRY):
+    """Render the metrics in the Prometheus text format.
+
+    Args:
+        registry (list, optional): the metrics to render.  Defaults to ``REGISTRY``.
+
+    Returns:
+        str: the metrics.
+
+    """
+    lines = []
+    for metric in registry:
+        lines.append("# HELP {} {}".format(metric.name, metric.documentation))
+        lines.append("# TYPE {} {}".format(metric.name, metric.type_name))
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+# worker metrics {{{1
+TASKS_CLAIMED = Counter("scriptworker_tasks_claimed_total", "Tasks claimed.")
+TASKS_COMPLETED = Counter(
+    "scriptworker_tasks_completed_total", "Tasks reported to the queue, by status.", labelnames=("status", )
+)
+CLAIM_WORK_SECONDS = Histogram("scriptworker_claim_work_seconds", "claimWork latency.")
+EMPTY_CLAIMS = Counter("scriptworker_empty_claims_total", "claimWork calls that returned no tasks.")
+RESOURCE_LIMIT_BREACHES = Counter(
+    "scriptworker_resource_limit_breaches_total", "Task scripts ended by a resource limit, by limit.",
+    labelnames=("limit", )
+)
+RECLAIMS = Counter("scriptworker_reclaims_total", "reclaimTask calls, by result.", labelnames=("result", ))
+BYTES_UPLOADED = Counter("scriptworker_uploaded_bytes_total", "Artifact bytes uploaded.")
+BYTES_DOWNLOADED = Counter("scriptworker_downloaded_bytes_total", "Bytes downloaded.")
+GPG_SECONDS = Histogram(
+    "scriptworker_gpg_seconds",
+    "gpg subprocess durations in the worker process, by operation.  gpg calls in the "
+    "homedir rebuild's child processes aren't included.",
+    labelnames=("operation", )
+)
+COT_VERIFICATION_SECONDS = Histogram(
+    "scriptworker_cot_verification_seconds", "verify_chain_of_trust durations."
+)
+LOOP_LAG_SECONDS = Histogram(
+    "scriptworker_loop_lag_seconds", "Event loop scheduling delay.",
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30),
+)
+
+
+# metrics_handler {{{1
+async def metrics_handler(request):
+    """Serve the metrics.
+
+    Args:
+        request (aiohttp.web.Request): the request.
+
+    Returns:
+        aiohttp.web.Response: the response.
+
+    """
+    return aiohttp_web.Response(
+        text=generate_latest(request.app['registry']),
+        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'},
+    )
+
+
+# start_metrics_server {{{1
+async def start_metrics_server(context, registry=REGISTRY):
+    """Serve the metrics at ``/metrics``, if ``metrics_enabled`` is set.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+        registry (list, optional): the metrics to serve.  Defaults to ``REGISTRY``.
+
+    Returns:
+        aiohttp.web.Application: the metrics app, to pass to
+            ``stop_metrics_server``, or None if ``metrics_enabled`` is False.
+
+    """
+    if not context.config['metrics_enabled']:
+        return None
+    loop = asyncio.get_event_loop()
+    app = aiohttp_web.Application()
+    app['registry'] = registry
+    app.router.add_get(METRICS_PATH, metrics_handler)
+    app['handler'] = app.make_handler(access_log=None)
+    if context.config['metrics_unix_socket']:
+        app['server'] = await loop.create_unix_server(app['handler'], context.config['metrics_unix_socket'])
+        app['url'] = "unix:{}".format(context.config['metrics_unix_socket'])
+    else:
+        app['server'] = await loop.create_server(
+            app['handler'], context.config['metrics_host'], context.config['metrics_port']
+        )
+        host, port = app['server'].sockets[0].getsockname()[:2]
+        app['url'] = "http://{}:{}{}".format(host, port, METRICS_PATH)
+    log.info("Serving metrics at {}".format(app['url']))
+    return app
+
+
+# stop_metrics_server {{{1
+async def stop_metrics_server(app, timeout=10):
+    """Stop the metrics server.
+
+    Args:
+        app (aiohttp.web.Application): the app from ``start_metrics_server``.
+            If None, this is a no-op.
+        timeout (int, optional): the number of seconds to let open requests
+            finish.  Defaults to 10.
+
+    """
+    if app is None:
+        return
+    app['server'].close()
+    await app['server'].wait_closed()
+    await app.shutdown()
+    await app['handler'].shutdown(timeout)
+    await app.cleanup()
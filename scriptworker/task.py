@@ -5,20 +5,31 @@ Attributes:
     log (logging.Logger): the log object for the module
 
 """
-import aiohttp
 import asyncio
 from asyncio.subprocess import PIPE
 from copy import deepcopy
+import json
 import logging
 import os
 import pprint
+import resource
 import signal
+import time
+import types
 
-import taskcluster
-import taskcluster.exceptions
 
-from scriptworker.constants import REVERSED_STATUSES
+from scriptworker.constants import REVERSED_STATUSES, STATUSES
+from scriptworker.lazy import lazy_import
+from scriptworker.limits import create_task_cgroup, get_limit_breach, get_preexec_fn, get_rlimits, \
+    remove_task_cgroup
+from scriptworker.livelog import start_live_log_server, stop_live_log_server
 from scriptworker.log import get_log_filehandle, pipe_to_log
+from scriptworker.metrics import CLAIM_WORK_SECONDS, EMPTY_CLAIMS, RECLAIMS, RESOURCE_LIMIT_BREACHES, \
+    TASKS_CLAIMED, TASKS_COMPLETED
+from scriptworker.zygote import launch_in_zygote
+
+aiohttp = lazy_import("aiohttp")
+taskcluster = lazy_import("taskcluster")
 
 log = logging.getLogger(__name__)
 
@@ -93,12 +104,62 @@ def get_worker_type(task):
     return task['workerType']
 
 
+# get_resource_usage {{{1
+def get_resource_usage(before, after, wall_seconds):
+    """Get the resource usage of a process tree from two ``RUSAGE_CHILDREN`` snapshots.
+
+    ``RUSAGE_CHILDREN`` adds up the usage of every descendant that has been
+    waited for, so the difference between a snapshot from before the task
+    script started and one from after it was reaped is the task script's
+    process tree, as long as the worker waited for no other children in
+    between.  ``ru_maxrss`` is a maximum rather than a sum, so it's only
+    known if the task script's tree set a new maximum.
+
+    Args:
+        before (resource.struct_rusage): the snapshot from before the launch.
+            If None, ``after`` is the task script's own rusage from
+            ``wait4``, e.g. from the zygote.
+        after (resource.struct_rusage): the snapshot from after the reap.
+        wall_seconds (float): the task script's wall time.
+
+    Returns:
+        dict: the resource usage.  ``maxRssKiB`` is None if it's unknown.
+
+    """
+    if before is None:
+        before = types.SimpleNamespace(
+            ru_utime=0, ru_stime=0, ru_maxrss=0, ru_inblock=0, ru_oublock=0, ru_nvcsw=0, ru_nivcsw=0,
+        )
+    return {
+        "wallSeconds": round(wall_seconds, 6),
+        "userCpuSeconds": round(after.ru_utime - before.ru_utime, 6),
+        "systemCpuSeconds": round(after.ru_stime - before.ru_stime, 6),
+        "maxRssKiB": after.ru_maxrss if after.ru_maxrss > before.ru_maxrss else None,
+        "blockInputOps": after.ru_inblock - before.ru_inblock,
+        "blockOutputOps": after.ru_oublock - before.ru_oublock,
+        "voluntaryContextSwitches": after.ru_nvcsw - before.ru_nvcsw,
+        "involuntaryContextSwitches": after.ru_nivcsw - before.ru_nivcsw,
+    }
+
+
 # run_task {{{1
 async def run_task(context):
     """Run the task, sending stdout+stderr to files.
 
     https://github.com/python/asyncio/blob/master/examples/subprocess_shell.py
 
+    The task script gets ``task_max_timeout`` seconds to finish; then its
+    process group is killed by ``supervise_process``.  Its resource usage is
+    logged and saved in ``context.resource_usage``.
+
+    The task script runs with the resource limits from
+    ``scriptworker.limits``.  If it's ended by one of them, the breach is
+    logged and counted, and the ``task_limit_breach_status`` status is
+    returned instead of its exit code.
+
+    If ``task_zygote_enabled`` is set, the task script is forked from the
+    zygote instead of exec'ed, if it can be.
+
     Args:
         context (scriptworker.context.Context): the scriptworker context.
 
@@ -106,26 +167,72 @@ async def run_task(context):
         int: exit code
 
     """
-    loop = asyncio.get_event_loop()
+    timeout = context.config['task_max_timeout']
+    cgroup = create_task_cgroup(context.config)
     kwargs = {  # pragma: no branch
         'stdout': PIPE,
         'stderr': PIPE,
         'stdin': None,
         'close_fds': True,
-        'preexec_fn': lambda: os.setsid(),
     }
-    context.proc = await asyncio.create_subprocess_exec(*context.config['task_script'], **kwargs)
-    loop.call_later(context.config['task_max_timeout'], max_timeout, context, context.proc, context.config['task_max_timeout'])
+    rlimits = get_rlimits(context.config)
+    kwargs['preexec_fn'] = get_preexec_fn(rlimits, cgroup)
+    start = time.monotonic()
+    rusage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    try:
+        context.proc = await launch_in_zygote(context, rlimits=rlimits, cgroup=cgroup)
+        if context.proc is None:
+            context.proc = await asyncio.create_subprocess_exec(*context.config['task_script'], **kwargs)
+    except Exception:
+        await remove_task_cgroup(cgroup)
+        raise
 
     tasks = []
     with get_log_filehandle(context) as log_filehandle:
-        tasks.append(pipe_to_log(context.proc.stderr, filehandles=[log_filehandle]))
-        tasks.append(pipe_to_log(context.proc.stdout, filehandles=[log_filehandle]))
-        await asyncio.wait(tasks)
-        exitcode = await context.proc.wait()
-        status_line = "exit code: {}".format(exitcode)
-        log.info(status_line)
-        print(status_line, file=log_filehandle)
+        live_log_app = None
+        try:
+            if context.config['live_log_enabled']:
+                live_log_app = await start_live_log_server(context, log_filehandle)
+            for pipe in (context.proc.stderr, context.proc.stdout):
+                tasks.append(pipe_to_log(
+                    pipe, filehandles=[log_filehandle],
+                    chunk_size=context.config['task_log_chunk_size'],
+                    max_lines_per_second=context.config['task_log_max_lines_per_second'],
+                ))
+            stage = await supervise_process(
+                context.proc, timeout, context.config['task_kill_grace_period'], aws=tasks
+            )
+            if stage is not None:
+                timeout_line = "Exceeded task_max_timeout of {} seconds; the task script was ended by {}".format(
+                    timeout, stage
+                )
+                log.warning(timeout_line)
+                print(timeout_line, file=log_filehandle)
+            exitcode = context.proc.returncode
+            # the zygote reaps the task scripts it launches, and reports their rusage
+            if getattr(context.proc, 'rusage', None) is not None:
+                rusage_before, rusage_after = None, context.proc.rusage
+            else:
+                rusage_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            context.resource_usage = get_resource_usage(rusage_before, rusage_after, time.monotonic() - start)
+            log.info("Task script resource usage: {}".format(json.dumps(context.resource_usage, sort_keys=True)))
+            status_line = "exit code: {}".format(exitcode)
+            log.info(status_line)
+            print(status_line, file=log_filehandle)
+            breach = get_limit_breach(exitcode, cgroup)
+            if breach is not None:
+                limit, description = breach
+                breach_line = "Resource limit exceeded: {}".format(description)
+                log.warning(breach_line)
+                print(breach_line, file=log_filehandle)
+                RESOURCE_LIMIT_BREACHES.inc(limit=limit)
+                exitcode = STATUSES[context.config['task_limit_breach_status']]
+        finally:
+            if context.proc.returncode is None:
+                await kill_process_group(context.proc, context.config['task_kill_grace_period'])
+            await remove_task_cgroup(cgroup)
+            if live_log_app is not None:
+                await stop_live_log_server(live_log_app)
 
     context.proc = None
     return exitcode
@@ -159,14 +266,17 @@ async def reclaim_task(context, task):
                 get_task_id(context.claim_task),
                 get_run_id(context.claim_task),
             )
+            RECLAIMS.inc(result="success")
             clean_response = deepcopy(context.reclaim_task)
             clean_response['credentials'] = "{********}"
             log.debug("Reclaim task response:\n{}".format(pprint.pformat(clean_response)))
         except taskcluster.exceptions.TaskclusterRestFailure as exc:
             if exc.status_code == 409:
+                RECLAIMS.inc(result="409")
                 log.debug("409: not reclaiming task.")
                 break
             else:
+                RECLAIMS.inc(result="error")
                 raise
 
 
@@ -177,7 +287,8 @@ async def complete_task(context, result):
     Decide whether to call reportCompleted, reportFailed, or reportException
     based on the exit status of the script.
 
-    If the task has expired or been cancelled, we'll get a 409 status.
+    If the task has expired or been cancelled, we'll get a 409 status.  The
+    task is only counted in ``TASKS_COMPLETED`` once it's been reported.
 
     Args:
         context (scriptworker.context.Context): the scriptworker context.
@@ -200,6 +311,7 @@ async def complete_task(context, result):
             log.info("Reporting task failed...")
             response = await context.temp_queue.reportFailed(*args)
         log.debug("Task status response:\n{}".format(pprint.pformat(response)))
+        TASKS_COMPLETED.inc(status=REVERSED_STATUSES.get(result, 'failure'))
     except taskcluster.exceptions.TaskclusterRestFailure as exc:
         if exc.status_code == 409:
             log.info("409: not reporting complete/failed.")
@@ -207,54 +319,81 @@ async def complete_task(context, result):
             raise
 
 
-# kill {{{1
-async def kill(pid, sleep_time=1):
-    """Kill ``pid`` with various signals.
+# kill_process_group {{{1
+def _signal_process_group(pgid, sig):
+    try:
+        os.killpg(pgid, sig)
+    except ProcessLookupError:
+        pass
+
+
+async def kill_process_group(proc, grace_period):
+    """Kill ``proc`` and the rest of its process group.
+
+    ``proc`` is the process group leader, since ``run_task`` launches it with
+    ``os.setsid``.  The group gets SIGTERM, and ``proc`` gets
+    ``grace_period`` seconds to exit; then anything left in the group gets
+    SIGKILL.  ``proc`` is reaped by the event loop's child watcher, so
+    there's no polling.
 
     Args:
-        pid (int): the process id to kill.
-        sleep_time (int, optional): how long to sleep between killing the pid
-            and checking if the pid is still running.
+        proc (asyncio.subprocess.Process): the process group leader.
+        grace_period (int): the number of seconds between SIGTERM and SIGKILL.
+
+    Returns:
+        str: the stage that ended ``proc``: ``exit`` if it had already
+            exited, ``sigterm``, or ``sigkill``.
 
     """
-    siglist = [signal.SIGINT, signal.SIGTERM]
-    while True:
-        sig = signal.SIGKILL
-        if siglist:  # pragma: no branch
-            sig = siglist.pop(0)
+    stage = "exit" if proc.returncode is not None else "sigterm"
+    log.debug("Sending SIGTERM to process group {}".format(proc.pid))
+    _signal_process_group(proc.pid, signal.SIGTERM)
+    if stage == "sigterm":
         try:
-            os.kill(pid, sig)
-            await asyncio.sleep(sleep_time)
-            os.kill(pid, 0)
-        except (OSError, ProcessLookupError):
-            return
+            await asyncio.wait_for(proc.wait(), grace_period)
+        except asyncio.TimeoutError:
+            stage = "sigkill"
+    log.debug("Sending SIGKILL to process group {}".format(proc.pid))
+    _signal_process_group(proc.pid, signal.SIGKILL)
+    await proc.wait()
+    return stage
 
 
-# max_timeout {{{1
-def max_timeout(context, proc, timeout):
-    """Make sure the proc pid's process and process group are killed.
+# supervise_process {{{1
+async def supervise_process(proc, timeout, grace_period, aws=()):
+    """Wait for ``proc`` to exit, killing its process group at the deadline.
 
-    First, kill the process group (-pid) and then the pid.
+    The deadline also covers ``aws``, e.g. the coroutines reading ``proc``'s
+    output, so a child that holds the output pipes open after ``proc`` exits
+    can't keep the task running past ``timeout``.  If ``aws`` still haven't
+    finished ``grace_period`` seconds after the kill, e.g. because a
+    process left the group, they're cancelled.
 
     Args:
-        context (scriptworker.context.Context): the scriptworker context.
-        proc (subprocess.Process): the subprocess proc.  This is compared against context.proc
-            to make sure we're killing the right pid.
-        timeout (int): Used for the log message.
+        proc (asyncio.subprocess.Process): the process group leader.
+        timeout (int): the number of seconds before the process group is
+            killed.
+        grace_period (int): the number of seconds between SIGTERM and SIGKILL.
+        aws (list, optional): coroutines or futures to wait for along with
+            ``proc``.  Defaults to ().
+
+    Returns:
+        str: None if everything finished before the deadline; otherwise the
+            stage that ended ``proc``, as returned by ``kill_process_group``.
 
     """
-    # We may be called with proc1.  proc1 may finish, and proc2 may start
-    # before this function is called.  Make sure we're still running the
-    # proc we were called with.
-    if proc != context.proc:
-        return
-    pid = context.proc.pid
-    log.warning("Exceeded timeout of {} seconds: {}".format(timeout, pid))
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(asyncio.wait([
-        asyncio.ensure_future(kill(-pid)),
-        asyncio.ensure_future(kill(pid))
-    ]))
+    futures = [asyncio.ensure_future(proc.wait())] + [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        _, pending = await asyncio.wait(futures, timeout=timeout)
+        if not pending:
+            return None
+        log.warning("Exceeded timeout of {} seconds: {}".format(timeout, proc.pid))
+        stage = await kill_process_group(proc, grace_period)
+        await asyncio.wait(futures, timeout=grace_period)
+        return stage
+    finally:
+        for future in futures:
+            future.cancel()
 
 
 # claim_work {{{1
@@ -277,10 +416,17 @@ async def claim_work(context):
         'tasks': 1,
     }
     try:
-        return await context.queue.claimWork(
-            context.config['provisioner_id'],
-            context.config['worker_type'],
-            payload
-        )
+        with CLAIM_WORK_SECONDS.time():
+            tasks = await context.queue.claimWork(
+                context.config['provisioner_id'],
+                context.config['worker_type'],
+                payload
+            )
+        num_tasks = len((tasks or {}).get('tasks', []))
+        if num_tasks:
+            TASKS_CLAIMED.inc(num_tasks)
+        else:
+            EMPTY_CLAIMS.inc()
+        return tasks
     except (taskcluster.exceptions.TaskclusterFailure, aiohttp.ClientError) as exc:
         log.warning("{} {}".format(exc.__class__, exc))
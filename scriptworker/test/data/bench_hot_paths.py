@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+"""Microbenchmarks for scriptworker's hot paths.
+
+Every input is synthetic and generated from a fixed random seed, so the
+results from two scriptworker versions on the same machine are comparable.
+The results are printed as json, with the min, median and mean seconds per
+run, and the median throughput in ``unit`` per second, for each
+benchmark.  To compare releases, save the output of each and diff them.
+
+The scriptworker loggers are set to INFO with a ``NullHandler``, so log
+records are created like they would be in a worker, but not written.
+
+Usage:
+    $0 [num_runs] [benchmark ...]
+"""
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from copy import deepcopy
+
+from scriptworker.artifacts import compress_artifact_if_supported
+from scriptworker.config import get_frozen_copy, get_unfrozen_copy
+from scriptworker.constants import DEFAULT_CONFIG
+from scriptworker.context import Context
+from scriptworker.cot.generate import generate_cot, get_cot_artifacts
+from scriptworker.cot.verify import ChainOfTrust, LinkOfTrust, verify_link_in_task_graph
+from scriptworker.gpg import parse_list_sigs_output
+from scriptworker.log import pipe_to_log
+from scriptworker.utils import clear_hash_cache, filepaths_in_dir, get_hash, makedirs, match_url_regex
+from scriptworker.version import __version_string__
+
+log = logging.getLogger(__name__)
+SEED = 20171018
+GPG_HOME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gpg")
+NUM_FILES = 2000
+HASH_BYTES = 32 * 1024 * 1024
+LOG_BYTES = 8 * 1024 * 1024
+NUM_GRAPH_TASKS = 5000
+NUM_SIGS = 1000
+NUM_URLS = 10000
+PIPE_BYTES = 16 * 1024 * 1024
+
+
+# helpers {{{1
+def random_bytes(rng, num_bytes):
+    return rng.getrandbits(num_bytes * 8).to_bytes(num_bytes, "little")
+
+
+def random_text(rng, num_bytes):
+    words = ("INFO", "DEBUG", "signing", "artifact", "public/build/target.tar.gz", "sha256", "ok", "0x1f")
+    lines = []
+    size = 0
+    while size < num_bytes:
+        line = "{:06d} {}\n".format(len(lines), " ".join(rng.choice(words) for _ in range(rng.randint(3, 15))))
+        lines.append(line)
+        size += len(line)
+    return "".join(lines)
+
+
+def write_tree(rng, path, num_files, max_size=16 * 1024):
+    total = 0
+    for num in range(num_files):
+        parts = ["dir{}".format(rng.randint(0, 9)) for _ in range(rng.randint(0, 3))]
+        filepath = os.path.join(path, *parts, "file{}.bin".format(num))
+        makedirs(os.path.dirname(filepath))
+        size = rng.randint(0, max_size)
+        with open(filepath, "wb") as fh:
+            fh.write(random_bytes(rng, size))
+        total += size
+    return total
+
+
+def get_context(tmp):
+    context = Context()
+    context.config = get_unfrozen_copy(DEFAULT_CONFIG)
+    for key, value in context.config.items():
+        if value == "...":
+            context.config[key] = os.path.join(tmp, key)
+    context.config['gpg_home'] = GPG_HOME
+    context.config['scriptworker_provisioners'] = [context.config['provisioner_id']]
+    context.config['scriptworker_worker_types'] = [context.config['worker_type']]
+    context.claim_task = {
+        "runId": 0,
+        "status": {"taskId": "taskId"},
+        "task": {
+            "dependencies": ["decision_task_id"],
+            "payload": {},
+            "provisionerId": context.config['provisioner_id'],
+            "scopes": ["project:releng:signing:cert:nightly-signing"],
+            "taskGroupId": "decision_task_id",
+            "workerType": context.config['worker_type'],
+        },
+        "workerGroup": "worker_group",
+        # no credentials, so we don't create a temp queue
+        "credentials": {},
+    }
+    return context
+
+
+def get_task_defn(rng, num):
+    return {
+        "taskGroupId": "decision_task_id",
+        "schedulerId": "gecko-level-3",
+        "provisionerId": "aws-provisioner-v1",
+        "workerType": "gecko-3-b-linux",
+        "scopes": ["queue:route:index.gecko.v2.{}".format(num)],
+        "dependencies": ["decision_task_id", "task{}".format(rng.randint(0, num))],
+        "routes": ["index.gecko.v2.mozilla-central.build{}".format(num)],
+        "metadata": {
+            "name": "build-{}".format(num),
+            "source": "https://hg.mozilla.org/mozilla-central/file/tip/taskcluster/ci",
+        },
+        "payload": {
+            "image": "sha256:{:064x}".format(rng.getrandbits(256)),
+            "command": ["/builds/worker/bin/run-task", "--", "build", str(num)],
+            "env": {"BUILD_NUMBER": str(num), "MOZ_BUILD_DATE": "20171018000000"},
+            "artifacts": {
+                "public/build": {"path": "/builds/worker/artifacts", "type": "directory", "expires": "2018-10-18"},
+            },
+        },
+        "extra": {"treeherder": {"symbol": "B{}".format(num)}},
+    }
+
+
+def get_list_sigs_output(rng, num_sigs):
+    keyid = "{:016X}".format(rng.getrandbits(64))
+    lines = [
+        "tru::1:1472876460:0:3:1:5",
+        "pub:u:4096:1:{}:1472876457:::u:::escaESCA:".format(keyid),
+        "fpr:::::::::{:024X}{}:".format(rng.getrandbits(96), keyid),
+        "uid:u::::1472876457::{:040X}::bench (bench) <bench>:".format(rng.getrandbits(160)),
+        "sig:::1:{}:1472876457::::bench (bench) <bench>:13x:::::8:".format(keyid),
+    ]
+    for num in range(num_sigs):
+        lines.append("sig:::1:{:016X}:1472876459::::signer{} (signer) <signer{}>:10l:::::8:".format(
+            rng.getrandbits(64), num, num
+        ))
+    return "\n".join(lines) + "\n"
+
+
+def get_urls(rng, num_urls):
+    hosts = ("hg.mozilla.org", "github.com", "example.com")
+    repos = ("mozilla-central", "mozilla-unified", "releases/mozilla-beta", "projects/date", "try", "users/foo/bar")
+    return ["{}://{}/{}/rev/{:040x}".format(
+        rng.choice(("https", "ssh", "http")), rng.choice(hosts), rng.choice(repos), rng.getrandbits(160)
+    ) for _ in range(num_urls)]
+
+
+# benchmarks {{{1
+# Each benchmark takes (tmp, rng), creates its inputs, and returns
+# ``(func, setup, unit, size)``.  ``setup`` runs untimed before each call
+# to ``func``, and ``size`` is the number of ``unit``s that each call handles.
+def bench_filepaths_in_dir(tmp, rng):
+    path = os.path.join(tmp, "tree")
+    write_tree(rng, path, NUM_FILES)
+    return (lambda: filepaths_in_dir(path)), None, "files", NUM_FILES
+
+
+def bench_get_hash(tmp, rng):
+    path = os.path.join(tmp, "hash.bin")
+    with open(path, "wb") as fh:
+        fh.write(random_bytes(rng, HASH_BYTES))
+    return (lambda: get_hash(path)), clear_hash_cache, "bytes", HASH_BYTES
+
+
+def bench_compress_artifact_if_supported(tmp, rng):
+    path = os.path.join(tmp, "live_backing.log")
+    contents = random_text(rng, LOG_BYTES)
+
+    def setup():
+        with open(path, "w") as fh:
+            fh.write(contents)
+
+    return (lambda: compress_artifact_if_supported(path)), setup, "bytes", len(contents.encode("utf-8"))
+
+
+def bench_get_cot_artifacts(tmp, rng):
+    context = get_context(tmp)
+    size = write_tree(rng, context.config['artifact_dir'], NUM_FILES)
+    return (lambda: get_cot_artifacts(context)), clear_hash_cache, "bytes", size
+
+
+def bench_generate_cot(tmp, rng):
+    context = get_context(tmp)
+    context.config['sign_chain_of_trust'] = True
+    write_tree(rng, context.config['artifact_dir'], 20)
+    path = os.path.join(tmp, "chainOfTrust.json.asc")
+    return (lambda: generate_cot(context, path=path)), clear_hash_cache, "calls", 1
+
+
+def bench_verify_link_in_task_graph(tmp, rng):
+    context = get_context(tmp)
+    chain = ChainOfTrust(context, "signing", task_id="taskId")
+    decision_link = LinkOfTrust(context, "decision", "decision_task_id")
+    decision_link.task_graph = {
+        "task{}".format(num): {"task": get_task_defn(rng, num)} for num in range(NUM_GRAPH_TASKS)
+    }
+    # a retrigger of the last task in the graph: a new taskId, so every
+    # task in the graph is fuzzy matched before we find it.
+    build_link = LinkOfTrust(context, "build", "retriggered_task_id")
+    build_link.task = deepcopy(decision_link.task_graph["task{}".format(NUM_GRAPH_TASKS - 1)]["task"])
+    chain.links = [decision_link, build_link]
+    return (lambda: verify_link_in_task_graph(chain, decision_link, build_link)), None, "tasks", NUM_GRAPH_TASKS
+
+
+def bench_parse_list_sigs_output(tmp, rng):
+    output = get_list_sigs_output(rng, NUM_SIGS)
+    return (lambda: parse_list_sigs_output(output, "bench")), None, "sigs", NUM_SIGS + 1
+
+
+def bench_match_url_regex(tmp, rng):
+    rules = DEFAULT_CONFIG['valid_vcs_rules']
+    urls = get_urls(rng, NUM_URLS)
+
+    def func():
+        for url in urls:
+            match_url_regex(rules, url, lambda m: m)
+
+    return func, None, "urls", NUM_URLS
+
+
+def bench_get_frozen_copy(tmp, rng):
+    graph = {"task{}".format(num): {"task": get_task_defn(rng, num)} for num in range(NUM_GRAPH_TASKS)}
+    return (lambda: get_frozen_copy(graph)), None, "tasks", NUM_GRAPH_TASKS
+
+
+def bench_pipe_to_log(tmp, rng):
+    loop = asyncio.get_event_loop()
+    contents = random_text(rng, PIPE_BYTES).encode("utf-8")
+    devnull = open(os.devnull, "w")
+    readers = []
+
+    def setup():
+        reader = asyncio.StreamReader(loop=loop)
+        reader.feed_data(contents)
+        reader.feed_eof()
+        readers[:] = [reader]
+
+    def func():
+        loop.run_until_complete(pipe_to_log(readers[0], filehandles=[devnull]))
+
+    return func, setup, "bytes", len(contents)
+
+
+BENCHMARKS = (
+    ("filepaths_in_dir", bench_filepaths_in_dir),
+    ("get_hash", bench_get_hash),
+    ("compress_artifact_if_supported", bench_compress_artifact_if_supported),
+    ("get_cot_artifacts", bench_get_cot_artifacts),
+    ("generate_cot", bench_generate_cot),
+    ("verify_link_in_task_graph", bench_verify_link_in_task_graph),
+    ("parse_list_sigs_output", bench_parse_list_sigs_output),
+    ("match_url_regex", bench_match_url_regex),
+    ("get_frozen_copy", bench_get_frozen_copy),
+    ("pipe_to_log", bench_pipe_to_log),
+)
+
+
+# run_benchmarks {{{1
+def run_benchmark(bench, num_runs):
+    with tempfile.TemporaryDirectory() as tmp:
+        func, setup, unit, size = bench(tmp, random.Random(SEED))
+        elapsed = []
+        for _ in range(num_runs):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func()
+            elapsed.append(time.perf_counter() - start)
+    median = statistics.median(elapsed)
+    return {
+        "runs": num_runs,
+        "min": min(elapsed),
+        "median": median,
+        "mean": statistics.mean(elapsed),
+        "unit": unit,
+        "size": size,
+        "perSecond": size / median if median else None,
+    }
+
+
+def run_benchmarks(names, num_runs):
+    sw_log = logging.getLogger("scriptworker")
+    sw_log.setLevel(logging.INFO)
+    sw_log.addHandler(logging.NullHandler())
+    sw_log.propagate = False
+    results = {}
+    for name, bench in BENCHMARKS:
+        if names and name not in names:
+            continue
+        results[name] = run_benchmark(bench, num_runs)
+        log.info("{}: median {:.4f}s, {:.1f} {}/s".format(
+            name, results[name]['median'], results[name]['perSecond'] or 0, results[name]['unit']
+        ))
+    return {
+        "scriptworkerVersion": __version_string__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": SEED,
+        "results": results,
+    }
+
+
+def main(args, name=None):
+    if name not in (None, "__main__"):
+        return
+    log.setLevel(logging.DEBUG)
+    log.addHandler(logging.StreamHandler())
+    num_runs = 5
+    names = ()
+    if len(args) > 0:
+        num_runs = int(args[0])
+        names = args[1:]
+    unknown = set(names) - set(name for name, _ in BENCHMARKS)
+    if unknown:
+        log.error("Unknown benchmark(s) {}; choose from {}".format(
+            sorted(unknown), [name for name, _ in BENCHMARKS]
+        ))
+        sys.exit(1)
+    print(json.dumps(run_benchmarks(names, num_runs), indent=2, sort_keys=True))
+
+
+main(sys.argv[1:], name=__name__)
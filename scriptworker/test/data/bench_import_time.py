@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Measure the cold import time of scriptworker modules.
+
+Each measurement imports the module in a fresh python process, and reports
+the heavy third party modules that were pulled in at import time.
+
+Usage:
+    $0 [num_runs] [module ...]
+"""
+import json
+import logging
+import statistics
+import subprocess
+import sys
+
+log = logging.getLogger(__name__)
+DEFAULT_MODULES = (
+    "scriptworker.client",
+    "scriptworker.worker",
+    "scriptworker.cot.verify",
+    "scriptworker.gpg",
+)
+HEAVY_MODULES = ("aiohttp", "arrow", "gnupg", "jsonschema", "pexpect", "taskcluster", "yaml")
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def time_import(module):
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT.format(module=module)])
+    return json.loads(output.decode('utf-8'))
+
+
+def run_benchmarks(modules, num_runs):
+    results = {}
+    for module in modules:
+        runs = [time_import(module) for _ in range(num_runs)]
+        elapsed = [run['elapsed'] for run in runs]
+        loaded = set([name.split('.')[0] for name in runs[-1]['modules']])
+        results[module] = {
+            "min": min(elapsed),
+            "median": statistics.median(elapsed),
+            "heavy_modules": sorted(loaded.intersection(HEAVY_MODULES)),
+        }
+        log.info("{}: min {:.3f}s median {:.3f}s heavy modules {}".format(
+            module, results[module]['min'], results[module]['median'],
+            results[module]['heavy_modules'],
+        ))
+    return results
+
+
+def main(args, name=None):
+    if name not in (None, "__main__"):
+        return
+    log.setLevel(logging.DEBUG)
+    log.addHandler(logging.StreamHandler())
+    num_runs = 10
+    modules = DEFAULT_MODULES
+    if len(args) > 0:
+        num_runs = int(args[0])
+        if len(args) > 1:
+            modules = args[1:]
+    run_benchmarks(modules, num_runs)
+
+
+main(sys.argv[1:], name=__name__)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""Compare per-key `sign_key` against batch `sign_keys` on a pubkey dir.
+
+The pubkey dir can be created with gen1000keys.py; only its `unsigned`
+subdirectory is used.
+
+Usage:
+    $0 [pubkey_dir] [num_keys]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from scriptworker.constants import DEFAULT_CONFIG
+from scriptworker.context import Context
+import scriptworker.gpg
+
+log = logging.getLogger(__name__)
+TRUSTED_KEY_DIR = os.path.join(os.path.dirname(__file__), "gpg", "keys")
+DEFAULT_PUBKEY_DIR = os.path.join(os.path.dirname(__file__), "pubkeys")
+
+
+def build_context(gpg_home):
+    context = Context()
+    context.config = dict(DEFAULT_CONFIG)
+    context.config['gpg_home'] = gpg_home
+    return context
+
+
+def prepare_gpg_home(context, unsigned_dir, num_keys):
+    gpg = scriptworker.gpg.GPG(context)
+    path = os.path.join(TRUSTED_KEY_DIR, "docker@example.com")
+    for suffix in (".sec", ".pub"):
+        with open("{}{}".format(path, suffix), "r") as fh:
+            my_fingerprint = scriptworker.gpg.import_key(gpg, fh.read())[0]
+    scriptworker.gpg.create_gpg_conf(context.config['gpg_home'], my_fingerprint=my_fingerprint)
+    scriptworker.gpg.check_ownertrust(context)
+    fingerprints = scriptworker.gpg.consume_valid_keys(context, keydir=unsigned_dir)
+    return my_fingerprint, fingerprints[:num_keys]
+
+
+def bench_sign_key(context, my_fingerprint, fingerprints):
+    for fingerprint in fingerprints:
+        scriptworker.gpg.sign_key(context, fingerprint, signing_key=my_fingerprint)
+
+
+def bench_sign_keys(context, my_fingerprint, fingerprints):
+    scriptworker.gpg.sign_keys(context, fingerprints, signing_key=my_fingerprint)
+
+
+def run_benchmarks(pubkey_dir, num_keys):
+    unsigned_dir = os.path.join(pubkey_dir, "unsigned")
+    results = {}
+    for name, func in (("sign_key", bench_sign_key), ("sign_keys", bench_sign_keys)):
+        with tempfile.TemporaryDirectory() as tmp:
+            context = build_context(tmp)
+            my_fingerprint, fingerprints = prepare_gpg_home(context, unsigned_dir, num_keys)
+            start = time.monotonic()
+            func(context, my_fingerprint, fingerprints)
+            results[name] = time.monotonic() - start
+            log.info("{}: signed {} keys in {:.2f} seconds".format(
+                name, len(fingerprints), results[name]
+            ))
+    if results["sign_keys"]:
+        log.info("speedup: {:.2f}x".format(results["sign_key"] / results["sign_keys"]))
+    return results
+
+
+def main(args, name=None):
+    if name not in (None, "__main__"):
+        return
+    log.setLevel(logging.DEBUG)
+    log.addHandler(logging.StreamHandler())
+    pubkey_dir = DEFAULT_PUBKEY_DIR
+    num_keys = None
+    if len(args) > 0:
+        pubkey_dir = args[0]
+        if len(args) > 1:
+            num_keys = int(args[1])
+            if len(args) > 2:
+                print("Usage: {} [PUBKEY_DIR] [NUM_KEYS]".format(sys.argv[0]))
+                sys.exit(1)
+    run_benchmarks(pubkey_dir, num_keys)
+
+
+main(sys.argv[1:], name=__name__)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""Compare exec'ing a task script against forking it from the zygote.
+
+The task script imports the given modules and exits, like a
+signingscript-style task script with a trivial task.  Each launch is timed
+from the launch to the exit.
+
+Usage:
+    $0 [num_runs] [module ...]
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from scriptworker.zygote import Zygote
+
+log = logging.getLogger(__name__)
+DEFAULT_MODULES = ("aiohttp", "arrow", "jsonschema", "taskcluster", "yaml")
+
+
+async def time_exec(script):
+    start = time.monotonic()
+    proc = await asyncio.create_subprocess_exec(sys.executable, script, preexec_fn=os.setsid)
+    await proc.wait()
+    return time.monotonic() - start
+
+
+async def time_zygote(zygote, script):
+    start = time.monotonic()
+    proc = await zygote.launch([script], os.getcwd(), os.environ)
+    await asyncio.wait([proc.stdout.read(), proc.stderr.read()])
+    await proc.wait()
+    return time.monotonic() - start
+
+
+async def run_benchmarks(modules, num_runs):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        script = os.path.join(tmp, "script.py")
+        with open(script, "w") as fh:
+            fh.write("".join("import {}\n".format(module) for module in modules))
+        zygote = Zygote(sys.executable, preload_modules=modules)
+        start = time.monotonic()
+        await zygote.start()
+        log.info("zygote startup: {:.3f}s".format(time.monotonic() - start))
+        try:
+            for name, func in (("exec", time_exec), ("zygote", lambda s: time_zygote(zygote, s))):
+                elapsed = [await func(script) for _ in range(num_runs)]
+                results[name] = {"min": min(elapsed), "median": statistics.median(elapsed)}
+                log.info("{}: min {:.3f}s median {:.3f}s".format(
+                    name, results[name]['min'], results[name]['median']
+                ))
+        finally:
+            await zygote.stop()
+    log.info("zygote saves {:.3f}s per task (median)".format(
+        results['exec']['median'] - results['zygote']['median']
+    ))
+    return results
+
+
+def main(args, name=None):
+    if name not in (None, "__main__"):
+        return
+    log.setLevel(logging.DEBUG)
+    log.addHandler(logging.StreamHandler())
+    num_runs = 10
+    modules = DEFAULT_MODULES
+    if len(args) > 0:
+        num_runs = int(args[0])
+        if len(args) > 1:
+            modules = args[1:]
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(run_benchmarks(modules, num_runs))
+
+
+main(sys.argv[1:], name=__name__)
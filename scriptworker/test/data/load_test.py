@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""Run a scriptworker against a local fake queue, and report its throughput.
+
+This starts ``scriptworker.test.fake_taskcluster``, creates ``num_tasks``
+tasks, and runs ``scriptworker.worker.main`` in a subprocess against it
+until every task is resolved.  Each task writes one artifact of
+``artifact_size`` bytes.  The fake can delay each request by ``latency``
+seconds, and fail requests at ``error_rate``.
+
+The results are printed as json:
+
+* ``tasksPerSecond``: tasks resolved per second, from the first claim to
+  the last resolution.
+* ``uploadMBPerSecond``: artifact megabytes received per second of upload.
+* ``cotVerificationSeconds``: the mean ``verify_chain_of_trust`` time,
+  from the worker's metrics, or ``null`` if chain of trust verification
+  is off.
+
+``config_overlay`` is an optional yaml file of extra worker config, e.g. to
+turn on ``verify_chain_of_trust`` or ``task_zygote_enabled``.
+
+Usage:
+    $0 [num_tasks] [artifact_size] [latency] [error_rate] [config_overlay]
+"""
+import aiohttp
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+import yaml
+
+from scriptworker.config import get_unfrozen_copy
+from scriptworker.constants import DEFAULT_CONFIG
+from scriptworker.test.fake_taskcluster import FakeTaskcluster
+
+log = logging.getLogger(__name__)
+TASK_SCRIPT = """import os, sys
+path = os.path.join(sys.argv[1], "public", "output.bin")
+os.makedirs(os.path.dirname(path), exist_ok=True)
+with open(path, "wb") as fh:
+    fh.write(os.urandom(int(sys.argv[2])))
+"""
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def write_config(tmp, fake, artifact_size, overlay_path=None):
+    config = get_unfrozen_copy(DEFAULT_CONFIG)
+    for key, value in config.items():
+        if value == "...":
+            config[key] = os.path.join(tmp, key)
+    config.update({
+        "credentials": {"clientId": "load-test", "accessToken": "load-test"},
+        "taskcluster_queue_url": fake.queue_url,
+        "poll_interval": 0,
+        "sign_chain_of_trust": False,
+        "verify_chain_of_trust": False,
+        "metrics_enabled": True,
+        "metrics_port": get_free_port(),
+        "task_script": [sys.executable, "-c", TASK_SCRIPT, config['artifact_dir'], str(artifact_size)],
+        "gpg_lockfile": os.path.join(tmp, "gpg_lockfile"),
+    })
+    if overlay_path:
+        with open(overlay_path) as fh:
+            config.update(yaml.safe_load(fh))
+    path = os.path.join(tmp, "scriptworker.yaml")
+    with open(path, "w") as fh:
+        yaml.safe_dump(config, fh)
+    return path, config
+
+
+async def get_cot_verification_seconds(config):
+    url = "http://{}:{}/metrics".format(config['metrics_host'], config['metrics_port'])
+    values = {}
+    with aiohttp.ClientSession() as session:
+        async with session.get(url) as resp:
+            for line in (await resp.text()).splitlines():
+                name, _, value = line.partition(" ")
+                values[name] = value
+    count = float(values.get("scriptworker_cot_verification_seconds_count", 0))
+    if count:
+        return float(values["scriptworker_cot_verification_seconds_sum"]) / count
+
+
+async def run_load_test(num_tasks, artifact_size, latency, error_rate, overlay_path=None):
+    fake = FakeTaskcluster(latency=latency, error_rate=error_rate, seed=0)
+    await fake.start()
+    for _ in range(num_tasks):
+        fake.create_task()
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path, config = write_config(tmp, fake, artifact_size, overlay_path)
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-c", "from scriptworker.worker import main; main()", config_path,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+        )
+        resolved = asyncio.ensure_future(fake.wait_for_resolved())
+        try:
+            await asyncio.wait([resolved, proc.wait()], return_when=asyncio.FIRST_COMPLETED)
+            if proc.returncode is not None:
+                raise Exception("The worker exited with {}".format(proc.returncode))
+            cot_seconds = await get_cot_verification_seconds(config)
+        finally:
+            resolved.cancel()
+            if proc.returncode is None:
+                proc.terminate()
+                await proc.wait()
+            await fake.stop()
+    tasks = fake.tasks.values()
+    elapsed = max(t['resolved'] for t in tasks) - min(t['claimed'] for t in tasks)
+    return {
+        "numTasks": num_tasks,
+        "artifactSize": artifact_size,
+        "latency": latency,
+        "errorRate": error_rate,
+        "states": {state: sum(1 for t in tasks if t['status']['state'] == state)
+                   for state in sorted(set(t['status']['state'] for t in tasks))},
+        "requests": dict(fake.counts),
+        "elapsedSeconds": elapsed,
+        "tasksPerSecond": num_tasks / elapsed,
+        "uploadMBPerSecond": fake.bytes_uploaded / 1024 ** 2 / fake.upload_seconds if fake.upload_seconds else None,
+        "cotVerificationSeconds": cot_seconds,
+    }
+
+
+def main(args, name=None):
+    if name not in (None, "__main__"):
+        return
+    log.setLevel(logging.DEBUG)
+    log.addHandler(logging.StreamHandler())
+    num_tasks, artifact_size, latency, error_rate, overlay_path = 10, 1024 ** 2, 0.0, 0.0, None
+    if len(args) > 0:
+        num_tasks = int(args[0])
+    if len(args) > 1:
+        artifact_size = int(args[1])
+    if len(args) > 2:
+        latency = float(args[2])
+    if len(args) > 3:
+        error_rate = float(args[3])
+    if len(args) > 4:
+        overlay_path = args[4]
+    loop = asyncio.get_event_loop()
+    results = loop.run_until_complete(run_load_test(num_tasks, artifact_size, latency, error_rate, overlay_path))
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+
+main(sys.argv[1:], name=__name__)
@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+"""A local stand-in for the Taskcluster queue and its S3 artifact store.
+
+This implements the queue endpoints and response fields that scriptworker
+uses, plus an in-memory S3 that artifacts are ``PUT`` to and downloaded
+from, so the worker can run end to end without a Taskcluster deployment.
+Credentials aren't checked.  Each request can be delayed by ``latency``
+seconds, and fail with a 500 with probability ``error_rate``.
+
+Point the worker at it with ``taskcluster_queue_url``.
+
+Attributes:
+    log (logging.Logger): the log object for the module.
+
+"""
+import asyncio
+import collections
+import datetime
+import logging
+import random
+import time
+from urllib.parse import unquote
+
+import aiohttp.web
+import slugid
+
+log = logging.getLogger(__name__)
+
+
+def _timestamp(seconds_from_now=0):
+    when = datetime.datetime.utcnow() + datetime.timedelta(seconds=seconds_from_now)
+    return when.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _task_id(request):
+    return request.match_info['taskId']
+
+
+# FakeTaskcluster {{{1
+class FakeTaskcluster(object):
+    """An in-memory Taskcluster queue and S3 artifact store.
+
+    Attributes:
+        latency (float): the number of seconds to delay each request.
+        error_rate (float): the probability of each request failing with a 500.
+        tasks (dict): ``{taskId: {"task": task_defn, "status": status}}``
+        pending (collections.deque): the pending taskIds, in order.
+        artifacts (dict): ``{(taskId, runId, name): {"contentType": ..., "data": bytes}}``
+        counts (collections.Counter): the number of requests per endpoint.
+        bytes_uploaded (int): the number of bytes ``PUT`` to S3.
+        bytes_downloaded (int): the number of bytes downloaded from S3.
+        upload_seconds (float): the time spent reading S3 uploads.
+        url (str): the root url, once started.
+        queue_url (str): the queue's base url, for ``taskcluster_queue_url``.
+
+    """
+
+    def __init__(self, latency=0, error_rate=0, seed=None):
+        """Initialize FakeTaskcluster."""
+        self.latency = latency
+        self.error_rate = error_rate
+        self.tasks = {}
+        self.pending = collections.deque()
+        self.artifacts = {}
+        self.counts = collections.Counter()
+        self.bytes_uploaded = 0
+        self.bytes_downloaded = 0
+        self.upload_seconds = 0
+        self.url = None
+        self.queue_url = None
+        self._random = random.Random(seed)
+        self._resolved = asyncio.Event()
+        self._app = None
+
+    # tasks {{{2
+    def create_task(self, task_defn=None, task_id=None):
+        """Add a pending task.
+
+        Args:
+            task_defn (dict, optional): the task definition.  Defaults to a
+                minimal task with no dependencies.  ``provisionerId`` and
+                ``workerType`` default to those of the worker that claims it.
+            task_id (str, optional): the taskId.  Defaults to a new slugid.
+
+        Returns:
+            str: the taskId.
+
+        """
+        task_id = task_id or slugid.nice().decode('utf-8')
+        task_defn = task_defn or {}
+        task_defn.setdefault('taskGroupId', task_id)
+        task_defn.setdefault('dependencies', [])
+        task_defn.setdefault('scopes', [])
+        task_defn.setdefault('payload', {})
+        task_defn.setdefault('created', _timestamp())
+        task_defn.setdefault('deadline', _timestamp(86400))
+        task_defn.setdefault('expires', _timestamp(86400 * 30))
+        self.tasks[task_id] = {
+            "task": task_defn,
+            "status": {"taskId": task_id, "state": "pending", "runs": []},
+            "claimed": None,
+            "resolved": None,
+        }
+        self.pending.append(task_id)
+        self._resolved.clear()
+        return task_id
+
+    @property
+    def resolved(self):
+        """list: the taskIds of the resolved tasks."""
+        return [task_id for task_id, task in self.tasks.items() if task['resolved'] is not None]
+
+    async def wait_for_resolved(self):
+        """Wait until every task is resolved."""
+        while len(self.resolved) < len(self.tasks):
+            self._resolved.clear()
+            await self._resolved.wait()
+
+    def _resolve(self, request, state, reason):
+        task_id = _task_id(request)
+        task = self.tasks.get(task_id)
+        if task is None:
+            raise aiohttp.web.HTTPNotFound()
+        if task['status']['state'] != 'running':
+            raise aiohttp.web.HTTPConflict()
+        task['status']['state'] = state
+        task['status']['runs'][-1].update({"state": state, "reasonResolved": reason, "resolved": _timestamp()})
+        task['resolved'] = time.monotonic()
+        self._resolved.set()
+        return aiohttp.web.json_response({"status": task['status']})
+
+    # queue endpoints {{{2
+    async def claim_work(self, request):
+        """Claim up to ``tasks`` pending tasks."""
+        payload = await request.json()
+        claims = []
+        while self.pending and len(claims) < payload.get('tasks', 1):
+            task_id = self.pending.popleft()
+            task = self.tasks[task_id]
+            task['task'].setdefault('provisionerId', request.match_info['provisionerId'])
+            task['task'].setdefault('workerType', request.match_info['workerType'])
+            run_id = len(task['status']['runs'])
+            task['status']['state'] = 'running'
+            task['status']['runs'].append({
+                "runId": run_id, "state": "running", "workerGroup": payload['workerGroup'],
+                "workerId": payload['workerId'], "started": _timestamp(),
+            })
+            task['claimed'] = time.monotonic()
+            claims.append({
+                "status": task['status'],
+                "runId": run_id,
+                "workerGroup": payload['workerGroup'],
+                "workerId": payload['workerId'],
+                "takenUntil": _timestamp(1200),
+                "task": task['task'],
+                "credentials": {"clientId": "fake-temp", "accessToken": "fake", "certificate": "{}"},
+            })
+        return aiohttp.web.json_response({"tasks": claims})
+
+    async def reclaim_task(self, request):
+        """Reclaim a running task."""
+        task = self.tasks.get(_task_id(request))
+        if task is None or task['status']['state'] != 'running':
+            raise aiohttp.web.HTTPConflict()
+        return aiohttp.web.json_response({
+            "status": task['status'],
+            "runId": int(request.match_info['runId']),
+            "takenUntil": _timestamp(1200),
+            "credentials": {"clientId": "fake-temp", "accessToken": "fake", "certificate": "{}"},
+        })
+
+    async def report_completed(self, request):
+        """Resolve a task as completed."""
+        return self._resolve(request, "completed", "completed")
+
+    async def report_failed(self, request):
+        """Resolve a task as failed."""
+        return self._resolve(request, "failed", "failed")
+
+    async def report_exception(self, request):
+        """Resolve a task as exception."""
+        payload = await request.json()
+        return self._resolve(request, "exception", payload.get('reason'))
+
+    async def create_artifact(self, request):
+        """Return a ``putUrl`` for an s3 artifact."""
+        payload = await request.json()
+        task_id, run_id = _task_id(request), request.match_info['runId']
+        name = unquote(request.match_info['name'])
+        if task_id not in self.tasks:
+            raise aiohttp.web.HTTPNotFound()
+        self.artifacts[(task_id, run_id, name)] = {"contentType": payload['contentType'], "data": None}
+        return aiohttp.web.json_response({
+            "storageType": "s3",
+            "putUrl": "{}/s3/{}/{}/{}".format(self.url, task_id, run_id, name),
+            "expires": payload['expires'],
+            "contentType": payload['contentType'],
+        })
+
+    async def get_task(self, request):
+        """Return a task definition."""
+        task = self.tasks.get(_task_id(request))
+        if task is None:
+            raise aiohttp.web.HTTPNotFound()
+        return aiohttp.web.json_response(task['task'])
+
+    async def get_latest_artifact(self, request):
+        """Redirect to the latest run's copy of an artifact."""
+        task_id = _task_id(request)
+        name = unquote(request.match_info['name'])
+        task = self.tasks.get(task_id)
+        if task is None or not task['status']['runs']:
+            raise aiohttp.web.HTTPNotFound()
+        run_id = str(task['status']['runs'][-1]['runId'])
+        if (task_id, run_id, name) not in self.artifacts:
+            raise aiohttp.web.HTTPNotFound()
+        raise aiohttp.web.HTTPSeeOther("{}/s3/{}/{}/{}".format(self.url, task_id, run_id, name))
+
+    # s3 endpoints {{{2
+    async def s3_put(self, request):
+        """Store an artifact upload."""
+        key = (request.match_info['taskId'], request.match_info['runId'], request.match_info['name'])
+        if key not in self.artifacts:
+            raise aiohttp.web.HTTPForbidden()
+        start = time.monotonic()
+        data = await request.read()
+        self.upload_seconds += time.monotonic() - start
+        self.artifacts[key].update({"data": data, "contentEncoding": request.headers.get('Content-Encoding')})
+        self.bytes_uploaded += len(data)
+        return aiohttp.web.Response(status=200)
+
+    async def s3_get(self, request):
+        """Download an artifact."""
+        key = (request.match_info['taskId'], request.match_info['runId'], request.match_info['name'])
+        artifact = self.artifacts.get(key)
+        if artifact is None or artifact['data'] is None:
+            raise aiohttp.web.HTTPNotFound()
+        self.bytes_downloaded += len(artifact['data'])
+        headers = {"Content-Type": artifact['contentType']}
+        if artifact.get('contentEncoding'):
+            headers['Content-Encoding'] = artifact['contentEncoding']
+        return aiohttp.web.Response(body=artifact['data'], headers=headers)
+
+    # server {{{2
+    async def _middleware(self, app, handler):
+        async def middleware(request):
+            self.counts[handler.__name__] += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.error_rate and self._random.random() < self.error_rate:
+                raise aiohttp.web.HTTPInternalServerError(text="injected error")
+            return await handler(request)
+        return middleware
+
+    def make_app(self):
+        """Create the aiohttp app.
+
+        Returns:
+            aiohttp.web.Application: the app.
+
+        """
+        app = aiohttp.web.Application(middlewares=[self._middleware], client_max_size=1024 ** 3)
+        queue_routes = (
+            ("POST", "/claim-work/{provisionerId}/{workerType}", self.claim_work),
+            ("POST", "/task/{taskId}/runs/{runId}/reclaim", self.reclaim_task),
+            ("POST", "/task/{taskId}/runs/{runId}/completed", self.report_completed),
+            ("POST", "/task/{taskId}/runs/{runId}/failed", self.report_failed),
+            ("POST", "/task/{taskId}/runs/{runId}/exception", self.report_exception),
+            ("POST", "/task/{taskId}/runs/{runId}/artifacts/{name:.+}", self.create_artifact),
+            ("GET", "/task/{taskId}/artifacts/{name:.+}", self.get_latest_artifact),
+            ("GET", "/task/{taskId}", self.get_task),
+        )
+        for method, path, handler in queue_routes:
+            app.router.add_route(method, "/queue/v1" + path, handler)
+        app.router.add_route("PUT", "/s3/{taskId}/{runId}/{name:.+}", self.s3_put)
+        app.router.add_route("GET", "/s3/{taskId}/{runId}/{name:.+}", self.s3_get)
+        return app
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start serving.
+
+        Args:
+            host (str, optional): the host to listen on.  Defaults to 127.0.0.1.
+            port (int, optional): the port to listen on.  Defaults to 0, a
+                random free port.
+
+        """
+        self._app = self.make_app()
+        self._app['handler'] = self._app.make_handler(access_log=None)
+        self._app['server'] = await asyncio.get_event_loop().create_server(self._app['handler'], host, port)
+        host, port = self._app['server'].sockets[0].getsockname()[:2]
+        self.url = "http://{}:{}".format(host, port)
+        self.queue_url = "{}/queue/v1".format(self.url)
+        log.info("Serving the fake queue at {}".format(self.queue_url))
+
+    async def stop(self):
+        """Stop serving."""
+        self._app['server'].close()
+        await self._app['server'].wait_closed()
+        await self._app.shutdown()
+        await self._app['handler'].shutdown(10)
+        await self._app.cleanup()
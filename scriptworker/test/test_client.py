@@ -5,12 +5,13 @@
 import arrow
 from copy import deepcopy
 import json
+import jsonschema
 import os
 import pytest
 from shutil import copyfile
 import scriptworker.client as client
 from scriptworker.constants import DEFAULT_CONFIG
-from scriptworker.exceptions import ScriptWorkerTaskException
+from scriptworker.exceptions import ScriptWorkerException, ScriptWorkerTaskException
 from . import tmpdir
 
 assert tmpdir  # silence pyflakes
@@ -128,6 +129,42 @@ def test_invalid_task(schema):
         client.validate_json_schema({'foo': task}, schema)
 
 
+def test_get_schema_validator(schema):
+    validator = client.get_schema_validator(schema)
+    assert client.get_schema_validator(schema) is validator
+    assert client.get_schema_validator(deepcopy(schema)) is not validator
+
+
+def test_get_schema_validator_bad_schema():
+    with pytest.raises(jsonschema.exceptions.SchemaError):
+        client.get_schema_validator({"type": 12})
+
+
+def test_load_json_schema(tmpdir):
+    path = os.path.join(tmpdir, "schema.json")
+    copyfile(SCHEMA, path)
+    schema = client.load_json_schema(path)
+    assert client.load_json_schema(path) is schema
+    with open(path, "w") as fh:
+        json.dump({"type": "object", "required": ["foo"]}, fh)
+    os.utime(path, ns=(0, 0))
+    new_schema = client.load_json_schema(path)
+    assert new_schema is not schema
+    assert new_schema['required'] == ["foo"]
+    with pytest.raises(ScriptWorkerTaskException):
+        client.validate_json_schema({}, new_schema)
+
+
+@pytest.mark.parametrize("contents", (None, "{invalid json"))
+def test_load_json_schema_exception(tmpdir, contents):
+    path = os.path.join(tmpdir, "schema.json")
+    if contents is not None:
+        with open(path, "w") as fh:
+            fh.write(contents)
+    with pytest.raises(ScriptWorkerException):
+        client.load_json_schema(path, exception=ScriptWorkerException)
+
+
 @pytest.mark.parametrize("valid_artifact_rules,valid_artifact_task_ids,url,expected", LEGAL_URLS)
 def test_artifact_url(valid_artifact_rules, valid_artifact_task_ids, url, expected):
     value = client.validate_artifact_url(valid_artifact_rules, valid_artifact_task_ids, url)
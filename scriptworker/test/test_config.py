@@ -128,6 +128,13 @@ def test_check_config_bad_keyring(t_config):
     assert "needs to start with %(gpg_home)s/" in "\n".join(messages)
 
 
+@pytest.mark.parametrize("status", ("success", "bad-status"))
+def test_check_config_bad_limit_breach_status(t_config, status):
+    t_config['task_limit_breach_status'] = status
+    messages = config.check_config(t_config, "test_path")
+    assert "task_limit_breach_status {} isn't a failing status".format(status) in "\n".join(messages)
+
+
 @pytest.mark.parametrize("params", ("provisioner_id", "worker_group", "worker_type", "worker_id"))
 def test_check_config_invalid_ids(params, t_config):
     t_config[params] = 'twenty-three-characters'
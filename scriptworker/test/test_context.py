@@ -90,3 +90,14 @@ def test_temp_queue(context, mocker):
     assert taskcluster.async.Queue.called_once_with({
         'credentials': context.temp_credentials,
     }, session=context.session)
+
+
+def test_create_queue_base_url(context, mocker):
+    queue = mocker.patch('taskcluster.async.Queue')
+    context.session = {'c': 'd'}
+    context.config['taskcluster_queue_url'] = "http://localhost:1234/queue/v1"
+    context.create_queue({'a': 'b'})
+    queue.assert_called_once_with({
+        'credentials': {'a': 'b'},
+        'baseUrl': "http://localhost:1234/queue/v1",
+    }, session=context.session)
@@ -66,11 +66,30 @@ def artifacts():
 
 
 # tests {{{1
-def test_get_cot_artifacts(artifacts, context):
+@pytest.mark.parametrize("enabled", (True, False))
+def test_get_cot_environment(context, enabled):
+    context.config['cot_environment_resource_usage'] = enabled
+    assert cot.get_cot_environment(context) == {}
+    context.resource_usage = {"wallSeconds": 1.5}
+    expected = {"resourceUsage": {"wallSeconds": 1.5}} if enabled else {}
+    assert cot.get_cot_environment(context) == expected
+
+
+@pytest.mark.parametrize("num_threads", (1, 4))
+def test_get_cot_artifacts(artifacts, context, num_threads):
+    context.config['chain_of_trust_hash_threads'] = num_threads
     value = cot.get_cot_artifacts(context)
     assert value == artifacts
 
 
+def test_get_cot_artifacts_multiple_algs(artifacts, context):
+    value = cot.get_cot_artifacts(context, hash_algs=("sha256", "sha512"))
+    assert sorted(value.keys()) == sorted(artifacts.keys())
+    for filepath, hashes in value.items():
+        assert hashes['sha256'] == artifacts[filepath]['sha256']
+        assert len(hashes['sha512']) == 128
+
+
 def test_generate_cot_body(artifacts, context):
     assert cot.generate_cot_body(context) == expected_cot_body(context, artifacts)
 
@@ -526,8 +526,8 @@ async def test_download_cot(chain, mocker, raises, event_loop):
 @pytest.mark.asyncio
 async def test_download_cot_artifact(chain, path, sha, raises, mocker, event_loop):
 
-    def fake_get_hash(*args, **kwargs):
-        return sha
+    def fake_get_hashes(path, hash_algs=("sha256", )):
+        return {alg: sha for alg in hash_algs}
 
     link = mock.MagicMock()
     link.task_id = 'task_id'
@@ -547,7 +547,7 @@ async def test_download_cot_artifact(chain, path, sha, raises, mocker, event_loo
     chain.links = [link]
     mocker.patch.object(cotverify, 'get_artifact_url', new=noop_sync)
     mocker.patch.object(cotverify, 'download_artifacts', new=noop_async)
-    mocker.patch.object(cotverify, 'get_hash', new=fake_get_hash)
+    mocker.patch.object(cotverify, 'get_hashes', new=fake_get_hashes)
     if raises:
         with pytest.raises(CoTError):
             await cotverify.download_cot_artifact(chain, 'task_id', path)
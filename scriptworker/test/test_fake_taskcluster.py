@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Run the worker end to end against scriptworker.test.fake_taskcluster
+"""
+import aiohttp
+import os
+import pytest
+import sys
+import scriptworker.worker as worker
+from scriptworker.constants import STATUSES
+from . import event_loop, rw_context
+from .fake_taskcluster import FakeTaskcluster
+
+assert event_loop, rw_context  # silence pyflakes
+
+TASK_SCRIPT = """import os, sys
+path = os.path.join(sys.argv[1], "public", "output.txt")
+os.makedirs(os.path.dirname(path))
+with open(path, "w") as fh:
+    fh.write("x" * 1000)
+sys.exit({})
+"""
+
+
+# constants helpers and fixtures {{{1
+@pytest.yield_fixture(scope='function')
+def fake(event_loop):
+    fake = FakeTaskcluster(seed=0)
+    event_loop.run_until_complete(fake.start())
+    yield fake
+    event_loop.run_until_complete(fake.stop())
+
+
+@pytest.yield_fixture(scope='function')
+def context(rw_context, fake, event_loop):
+    rw_context.config.update({
+        'taskcluster_queue_url': fake.queue_url,
+        'poll_interval': 0,
+        'sign_chain_of_trust': False,
+        'verify_chain_of_trust': False,
+        'task_max_timeout': 10,
+    })
+    rw_context.credentials = {"clientId": "fake", "accessToken": "fake"}
+    with aiohttp.ClientSession() as session:
+        rw_context.session = session
+        yield rw_context
+
+
+def set_task_script(context, exit_code):
+    path = os.path.join(context.config['work_dir'], "..", "script.py")
+    with open(path, "w") as fh:
+        fh.write(TASK_SCRIPT.format(exit_code))
+    context.config['task_script'] = (sys.executable, path, context.config['artifact_dir'])
+
+
+# run_loop {{{1
+@pytest.mark.parametrize("exit_code,state", (
+    (0, "completed"), (1, "failed"), (STATUSES['malformed-payload'], "exception"),
+))
+def test_run_loop(context, fake, event_loop, exit_code, state):
+    set_task_script(context, exit_code)
+    task_id = fake.create_task()
+    status = event_loop.run_until_complete(worker.run_loop(context))
+    assert status == exit_code
+    assert fake.tasks[task_id]['status']['state'] == state
+    assert fake.tasks[task_id]['status']['runs'][0]['reasonResolved'] in (state, "malformed-payload")
+    assert fake.artifacts[(task_id, "0", "public/output.txt")]['data'] == b"x" * 1000
+    assert fake.bytes_uploaded >= 1000
+    assert event_loop.run_until_complete(worker.run_loop(context)) is None
+
+
+def test_run_loop_errors(context, fake, event_loop):
+    set_task_script(context, 0)
+    fake.create_task()
+    fake.error_rate = 1
+    assert event_loop.run_until_complete(worker.run_loop(context)) is None
+    assert fake.counts['claim_work'] > 1
+    assert fake.pending
+
@@ -4,6 +4,7 @@
 """
 import arrow
 from contextlib import contextmanager
+import fcntl
 import glob
 import json
 import mock
@@ -15,7 +16,7 @@ import subprocess
 import tarfile
 from scriptworker.exceptions import ScriptWorkerGPGException, ScriptWorkerRetryException
 import scriptworker.gpg as sgpg
-from scriptworker.utils import rm
+from scriptworker.utils import makedirs, rm
 from . import GOOD_GPG_KEYS, BAD_GPG_KEYS, event_loop, noop_async, noop_sync, tmpdir, touch
 from . import rw_context as context
 
@@ -224,6 +225,43 @@ def test_keyid_fingerprint_exception(base_context, keyid, fingerprint, path):
         sgpg.fingerprint_to_keyid(gpg, fingerprint.replace('C', '1').replace('F', 'C'))
 
 
+def test_key_index_invalidation(context):
+    gpg = sgpg.GPG(context)
+    keyid, fingerprint, path = KEYS_AND_FINGERPRINTS[0]
+    assert sgpg.get_key_index(gpg)['fingerprint_to_keyid'] == {}
+    with pytest.raises(ScriptWorkerGPGException):
+        sgpg.fingerprint_to_keyid(gpg, fingerprint)
+    with open("{}.pub".format(path), "r") as fh:
+        sgpg.import_key(gpg, fh.read())
+    assert sgpg.fingerprint_to_keyid(gpg, fingerprint) == keyid
+    assert sgpg.keyid_to_fingerprint(gpg, keyid) == fingerprint
+    index = sgpg.get_key_index(gpg)
+    assert index['uid_to_fingerprints'] == {
+        'Scriptworker Test (test key for scriptworker) <scriptworker@example.com>': [fingerprint],
+    }
+    # unchanged keyrings reuse the cached index
+    assert sgpg.get_key_index(gpg) is index
+
+
+# GPG {{{1
+def test_GPG_cache(context, tmpdir):
+    gpg = sgpg.GPG(context)
+    assert sgpg.GPG(context) is gpg
+    assert sgpg.GPG(context, gpg_home=tmpdir) is not gpg
+    # a different encoding gets its own instance, and doesn't change the cached one
+    encoding = context.config['gpg_encoding']
+    context.config['gpg_encoding'] = 'latin-1'
+    latin1_gpg = sgpg.GPG(context)
+    assert latin1_gpg is not gpg
+    assert latin1_gpg.encoding == 'latin-1'
+    assert gpg.encoding == encoding
+    context.config['gpg_encoding'] = encoding
+    rm(context.config['gpg_home'])
+    gpg2 = sgpg.GPG(context)
+    assert gpg2 is not gpg
+    assert os.path.isdir(context.config['gpg_home'])
+
+
 # signatures {{{1
 @pytest.mark.parametrize("params", GOOD_GPG_KEYS.items())
 def test_verify_good_signatures(base_context, params):
@@ -394,6 +432,48 @@ def test_sign_key_twice(context):
     sgpg.sign_key(context, fingerprint, signing_key=fingerprint)
 
 
+@pytest.mark.parametrize("exportable", (True, False))
+def test_sign_keys(context, exportable):
+    gpg = sgpg.GPG(context)
+    my_keyid, my_fingerprint = KEYS_AND_FINGERPRINTS[0][0:2]
+    for suffix in (".sec", ".pub"):
+        with open("{}{}".format(KEYS_AND_FINGERPRINTS[0][2], suffix), "r") as fh:
+            sgpg.import_key(gpg, fh.read())
+    sgpg.create_gpg_conf(context.config['gpg_home'], my_fingerprint=my_fingerprint)
+    sgpg.check_ownertrust(context)
+    fingerprints = sgpg.consume_valid_keys(
+        context, keydir=os.path.join(PUBKEY_DIR, "unsigned"), ignore_suffixes=(".sec", )
+    )
+    assert fingerprints
+    sgpg.sign_keys(context, fingerprints, signing_key=my_fingerprint, exportable=exportable)
+    for fingerprint in fingerprints:
+        output = sgpg.get_list_sigs_output(context, fingerprint, validate=False)
+        assert ":{}:".format(my_keyid) in output, fingerprint
+        # local signatures are marked with an `l` in the sig class
+        assert (":10l:" in output) is not exportable
+
+
+def test_sign_keys_noop(context, mocker):
+    mocker.patch.object(subprocess, "Popen")
+    sgpg.sign_keys(context, [])
+    subprocess.Popen.assert_not_called()
+
+
+@pytest.mark.parametrize("output,exitcode", ((
+    [b"[GNUPG:] GET_LINE keyedit.prompt\n", b"[GNUPG:] GET_HIDDEN passphrase.enter\n"], 0
+), (
+    [b"[GNUPG:] GET_LINE keyedit.prompt\n", b"gpg: signing failed\n"], 2
+)))
+def test_sign_keys_exception(context, mocker, output, exitcode):
+    proc = mock.MagicMock()
+    proc.stdout.readline.side_effect = output + [b""]
+    proc.wait.return_value = exitcode
+    mocker.patch.object(subprocess, "Popen", return_value=proc)
+    with pytest.raises(ScriptWorkerGPGException):
+        sgpg.sign_keys(context, [KEYS_AND_FINGERPRINTS[0][1]])
+    proc.stdin.write.assert_any_call(b"lsign\n")
+
+
 @pytest.mark.parametrize("exportable", (True, False))
 def test_sign_key_exportable(context, exportable):
     gpg_home2 = os.path.join(context.config['gpg_home'], "two")
@@ -459,6 +539,79 @@ def test_get_list_sigs_output_failure(base_context, mocker):
         sgpg.get_list_sigs_output(base_context, "nonexistent_fingerprint")
 
 
+def _import_pubkeys(context, keys_and_fingerprints):
+    gpg = sgpg.GPG(context)
+    for _, _, path in keys_and_fingerprints:
+        with open("{}.pub".format(path), "r") as fh:
+            sgpg.import_key(gpg, fh.read())
+
+
+def test_get_list_sigs_outputs(context):
+    _import_pubkeys(context, KEYS_AND_FINGERPRINTS)
+    fingerprints = [fingerprint for _, fingerprint, _ in KEYS_AND_FINGERPRINTS]
+    results = sgpg.get_list_sigs_outputs(context, fingerprints)
+    assert sorted(results.keys()) == sorted(fingerprints)
+    for keyid, fingerprint, _ in KEYS_AND_FINGERPRINTS:
+        assert results[fingerprint] == sgpg.get_list_sigs_output(context, fingerprint)
+        assert results[fingerprint]['keyid'] == keyid
+    raw = sgpg.get_list_sigs_outputs(context, fingerprints, validate=False)
+    for fingerprint in fingerprints:
+        assert "fpr:::::::::{}:".format(fingerprint) in raw[fingerprint]
+        for other in set(fingerprints) - {fingerprint}:
+            assert other not in raw[fingerprint]
+
+
+def test_get_list_sigs_outputs_failure(context):
+    _import_pubkeys(context, KEYS_AND_FINGERPRINTS[:2])
+    fingerprints = [fingerprint for _, fingerprint, _ in KEYS_AND_FINGERPRINTS[:3]]
+    with pytest.raises(ScriptWorkerGPGException) as excinfo:
+        sgpg.get_list_sigs_outputs(context, fingerprints, expected={'sig_keyids': ['bad sig keyid']})
+    message = str(excinfo.value)
+    # both bad keys and the missing key are reported
+    for fingerprint in fingerprints[:2]:
+        assert "{}: Missing expected signatures".format(fingerprint) in message
+    assert fingerprints[2] in message
+    assert sgpg.get_list_sigs_outputs(context, []) == {}
+
+
+def test_get_list_sigs_outputs_stderr(context, tmpdir):
+    _import_pubkeys(context, KEYS_AND_FINGERPRINTS[:2])
+    fingerprints = [fingerprint for _, fingerprint, _ in KEYS_AND_FINGERPRINTS[:2]]
+    expected = sgpg.get_list_sigs_outputs(context, fingerprints)
+    real_gpg_path = sgpg.guess_gpg_path(context)
+    context.config['gpg_path'] = os.path.join(str(tmpdir), "gpg")
+
+    def write_gpg(contents):
+        with open(context.config['gpg_path'], "w") as fh:
+            fh.write("#!/bin/sh\n" + contents.format(real_gpg_path))
+        os.chmod(context.config['gpg_path'], 0o755)
+
+    # gpg warnings on stderr don't end up in the parsed records
+    write_gpg('echo "gpg: WARNING: unsafe permissions on homedir" >&2\nexec {} "$@"\n')
+    assert sgpg.get_list_sigs_outputs(context, fingerprints) == expected
+    # ...but they're in the exception if gpg fails
+    write_gpg('{} "$@"\necho "gpg: fatal: oh no" >&2\nexit 2\n')
+    with pytest.raises(ScriptWorkerGPGException) as excinfo:
+        sgpg.get_list_sigs_outputs(context, fingerprints)
+    assert "exited 2:" in str(excinfo.value)
+    assert "gpg: fatal: oh no" in str(excinfo.value)
+
+
+def test_iter_list_sigs_records():
+    lines = [
+        "tru::1:1472242430:0:3:1:5",
+        "pub:f:2048:1:AAAA:1472242430:::-:::escaESCA:",
+        "fpr:::::::::A:",
+        "pub:f:2048:1:BBBB:1472242430:::-:::escaESCA:",
+        "fpr:::::::::B:",
+        "sig:::1:AAAA:1472242430::::a:10l:::::8:",
+    ]
+    assert list(sgpg._iter_list_sigs_records(lines)) == [
+        lines[0:3], [lines[0]] + lines[3:],
+    ]
+    assert list(sgpg._iter_list_sigs_records(lines[:1])) == []
+
+
 def test_parse_trust_line_failure():
     line = 'tru:t:::::::::'
     with pytest.raises(ScriptWorkerGPGException):
@@ -550,6 +703,57 @@ def test_consume_valid_keys_suffixes(context):
     sgpg.consume_valid_keys(context, PUBKEY_DIR, ignore_suffixes=('.json', '.asc', '.unsigned.pub'))
 
 
+@pytest.mark.parametrize("keyid,fingerprint,path", KEYS_AND_FINGERPRINTS)
+def test_get_armored_key_fingerprints(keyid, fingerprint, path):
+    with open("{}.pub".format(path), "r") as fh:
+        contents = fh.read()
+    assert sgpg.get_armored_key_fingerprints(contents) == [fingerprint]
+    assert sgpg.get_armored_key_fingerprints(contents + contents) == [fingerprint, fingerprint]
+
+
+@pytest.mark.parametrize("contents", (
+    "", "not a key",
+    "-----BEGIN PGP PUBLIC KEY BLOCK-----\n\nnotbase64!!!\n-----END PGP PUBLIC KEY BLOCK-----\n",
+    "-----BEGIN PGP PUBLIC KEY BLOCK-----\n\nmQENBFfZ\n",
+    "-----BEGIN PGP PUBLIC KEY BLOCK-----\n\nmQENBFfZ\n-----END PGP PUBLIC KEY BLOCK-----\n",
+))
+def test_get_armored_key_fingerprints_exception(contents):
+    with pytest.raises(ScriptWorkerGPGException):
+        sgpg.get_armored_key_fingerprints(contents)
+
+
+def test_get_armored_key_fingerprints_secret():
+    with open("{}.sec".format(KEYS_AND_FINGERPRINTS[0][2]), "r") as fh:
+        contents = fh.read()
+    with pytest.raises(ScriptWorkerGPGException):
+        sgpg.get_armored_key_fingerprints(contents)
+
+
+@pytest.mark.parametrize("batch_size,num_imports", ((1, 4), (3, 2), (100, 1)))
+def test_consume_valid_keys_batch(context, mocker, batch_size, num_imports):
+    context.config['gpg_import_batch_size'] = batch_size
+    with open(os.path.join(PUBKEY_DIR, "manifest.json")) as fh:
+        manifest = json.load(fh)
+    import_key = mocker.patch.object(sgpg, "import_key", wraps=sgpg.import_key)
+    fingerprints = sgpg.consume_valid_keys(
+        context, os.path.join(PUBKEY_DIR, "unsigned")
+    )
+    assert sorted(fingerprints) == sorted(manifest.keys())
+    assert import_key.call_count == num_imports
+    index = sgpg.get_key_index(sgpg.GPG(context))
+    assert set(index['fingerprint_to_keyid'].keys()) == set(manifest.keys())
+
+
+def test_consume_valid_keys_batch_bad_file(context, tmpdir):
+    for path in glob.glob(os.path.join(PUBKEY_DIR, "unsigned", "*")):
+        shutil.copyfile(path, os.path.join(tmpdir, os.path.basename(path)))
+    with open(os.path.join(tmpdir, "bad.pub"), "w") as fh:
+        fh.write("not a key")
+    with pytest.raises(ScriptWorkerGPGException) as excinfo:
+        sgpg.consume_valid_keys(context, tmpdir)
+    assert "bad.pub" in str(excinfo.value)
+
+
 def test_rebuild_gpg_home_flat(context):
     sgpg.rebuild_gpg_home_flat(
         context,
@@ -710,12 +914,206 @@ def test_build_gpg_homedirs_from_repo(context, mocker, event_loop):
         homedirs[key].append(worker_dir)
         homedirs[key] = sorted(homedirs[key])
 
+    context.config['gpg_homedir_build_processes'] = 1
     sgpg.build_gpg_homedirs_from_repo(
         context, "tag", verify_function=noop_async, flat_function=counter, signed_function=counter
     )
     assert homedirs == expected
 
 
+def _write_build_info(context, path, *args, **kwargs):
+    makedirs(path)
+    with open(os.path.join(path, "build_info"), "w") as fh:
+        json.dump({
+            "pid": os.getpid(),
+            "signed": 'untrusted_path' in kwargs,
+            "ignore_suffixes": list(kwargs['ignore_suffixes']),
+        }, fh)
+
+
+def _die_build(context, path, *args, **kwargs):
+    if os.path.basename(path) == "scriptworker":
+        raise ScriptWorkerGPGException("died building {}".format(path))
+
+
+def test_build_gpg_homedirs_from_repo_parallel(context, event_loop):
+    basedir = os.path.join(context.config['work_dir'], "gpg_homedirs")
+    sgpg.build_gpg_homedirs_from_repo(
+        context, "tag", basedir=basedir, verify_function=noop_async,
+        flat_function=_write_build_info, signed_function=_write_build_info,
+    )
+    pids = set()
+    for worker_impl, worker_config in context.config['gpg_homedirs'].items():
+        with open(os.path.join(basedir, worker_impl, "build_info")) as fh:
+            info = json.load(fh)
+        assert info['signed'] is (worker_config['type'] == 'signed')
+        assert info['ignore_suffixes'] == list(worker_config['ignore_suffixes'])
+        pids.add(info['pid'])
+    assert os.getpid() not in pids
+
+
+def test_build_gpg_homedirs_from_repo_parallel_exception(context, event_loop):
+    with pytest.raises(ScriptWorkerGPGException):
+        sgpg.build_gpg_homedirs_from_repo(
+            context, "tag", verify_function=noop_async,
+            flat_function=_die_build, signed_function=_die_build,
+        )
+
+
+# update_gpg_homedirs_from_diff {{{1
+UNSIGNED_KEYS = sorted(glob.glob(os.path.join(PUBKEY_DIR, "unsigned", "*.pub")))
+
+
+def _git_commit(path, message):
+    subprocess.check_call(["git", "add", "-A", "."], cwd=path)
+    subprocess.check_call(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-q", "-m", message],
+        cwd=path,
+    )
+    return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=path).decode('utf-8').strip()
+
+
+def _fingerprint_from_path(path):
+    return os.path.basename(path).split('.')[0]
+
+
+@pytest.fixture(scope='function')
+def key_repo_context(context):
+    repo_path = os.path.join(context.config['work_dir'], "repo")
+    worker_path = os.path.join(repo_path, "docker-worker")
+    makedirs(worker_path)
+    subprocess.check_call(["git", "init", "-q"], cwd=repo_path)
+    for i in (0, 1):
+        shutil.copyfile(UNSIGNED_KEYS[i], os.path.join(worker_path, "{}.pub".format(i)))
+    touch(os.path.join(worker_path, "README.md"))
+    old_revision = _git_commit(repo_path, "one")
+    context.config.update({
+        'git_key_repo_dir': repo_path,
+        'base_gpg_home_dir': os.path.join(context.config['work_dir'], "gpg_homedirs"),
+        'pubkey_path': "{}.pub".format(KEYS_AND_FINGERPRINTS[0][2]),
+        'privkey_path': "{}.sec".format(KEYS_AND_FINGERPRINTS[0][2]),
+        'gpg_homedirs': {"docker-worker": {"type": "flat", "ignore_suffixes": (".md", )}},
+    })
+    # build the live homedir at old_revision
+    gpg_home = os.path.join(context.config['base_gpg_home_dir'], "docker-worker")
+    makedirs(gpg_home)
+    os.chmod(gpg_home, 0o700)
+    gpg = sgpg.GPG(context, gpg_home=gpg_home)
+    for path in (context.config['privkey_path'], context.config['pubkey_path']):
+        with open(path, "r") as fh:
+            sgpg.import_key(gpg, fh.read())
+    sgpg.create_gpg_conf(gpg_home, my_fingerprint=KEYS_AND_FINGERPRINTS[0][1])
+    sgpg.check_ownertrust(context, gpg_home=gpg_home)
+    sgpg.consume_valid_keys(context, keydir=worker_path, ignore_suffixes=(".md", ), gpg_home=gpg_home)
+    sgpg.write_gpg_homedirs_revision(context.config['base_gpg_home_dir'], old_revision)
+    # delete key 1, add key 2, touch README.md
+    os.remove(os.path.join(worker_path, "1.pub"))
+    shutil.copyfile(UNSIGNED_KEYS[2], os.path.join(worker_path, "2.pub"))
+    with open(os.path.join(worker_path, "README.md"), "w") as fh:
+        fh.write("changed")
+    new_revision = _git_commit(repo_path, "two")
+    yield context, old_revision, new_revision
+
+
+def test_update_gpg_homedirs_from_diff(key_repo_context, event_loop):
+    context, old_revision, new_revision = key_repo_context
+    basedir = "{}.tmp".format(context.config['base_gpg_home_dir'])
+    diff = event_loop.run_until_complete(
+        sgpg.get_git_diff(context.config['git_key_repo_dir'], old_revision, new_revision)
+    )
+    assert diff == {
+        "docker-worker/1.pub": "D",
+        "docker-worker/2.pub": "A",
+        "docker-worker/README.md": "M",
+    }
+    sgpg.update_gpg_homedirs_from_diff(
+        context, "tag", old_revision, new_revision, basedir=basedir,
+        verify_function=noop_async,
+    )
+    new_gpg = sgpg.GPG(context, gpg_home=os.path.join(basedir, "docker-worker"))
+    index = sgpg.get_key_index(new_gpg)
+    assert _fingerprint_from_path(UNSIGNED_KEYS[0]) in index['fingerprint_to_keyid']
+    assert _fingerprint_from_path(UNSIGNED_KEYS[1]) not in index['fingerprint_to_keyid']
+    added = _fingerprint_from_path(UNSIGNED_KEYS[2])
+    assert added in index['fingerprint_to_keyid']
+    output = sgpg.get_list_sigs_output(
+        context, added, gpg_home=os.path.join(basedir, "docker-worker"), validate=False
+    )
+    assert ":{}:".format(KEYS_AND_FINGERPRINTS[0][0]) in output
+    # the live homedir is untouched
+    live_gpg = sgpg.GPG(context, gpg_home=os.path.join(context.config['base_gpg_home_dir'], "docker-worker"))
+    assert _fingerprint_from_path(UNSIGNED_KEYS[1]) in sgpg.get_key_index(live_gpg)['fingerprint_to_keyid']
+
+
+def test_update_gpg_homedirs_from_diff_signed(key_repo_context, event_loop, mocker):
+    context, old_revision, new_revision = key_repo_context
+    context.config['gpg_homedirs'] = {"docker-worker": {"type": "signed", "ignore_suffixes": (".md", )}}
+    calls = []
+    mocker.patch.object(sgpg, "check_ownertrust", new=lambda *args, **kwargs: calls.append(kwargs['gpg_home']))
+    basedir = "{}.tmp".format(context.config['base_gpg_home_dir'])
+    sgpg.update_gpg_homedirs_from_diff(
+        context, "tag", old_revision, new_revision, basedir=basedir,
+        verify_function=noop_async,
+    )
+    # no trusted/ changes, but ownertrust is still checked
+    assert calls == [os.path.join(basedir, "docker-worker")]
+
+
+def test_update_gpg_homedirs_from_diff_new_own_key(key_repo_context, event_loop):
+    context, old_revision, new_revision = key_repo_context
+    context.config['pubkey_path'] = "{}.pub".format(KEYS_AND_FINGERPRINTS[1][2])
+    with pytest.raises(ScriptWorkerGPGException):
+        sgpg.update_gpg_homedirs_from_diff(
+            context, "tag", old_revision, new_revision,
+            basedir="{}.tmp".format(context.config['base_gpg_home_dir']),
+            verify_function=noop_async,
+        )
+
+
+def test_update_gpg_homedirs_from_diff_wrong_revision(key_repo_context, event_loop):
+    context, old_revision, new_revision = key_repo_context
+    with pytest.raises(ScriptWorkerGPGException):
+        sgpg.update_gpg_homedirs_from_diff(
+            context, "tag", new_revision, new_revision,
+            basedir="{}.tmp".format(context.config['base_gpg_home_dir']),
+            verify_function=noop_async,
+        )
+
+
+@pytest.mark.parametrize("exc", (
+    None, ScriptWorkerGPGException("no"), UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte"),
+))
+def test_update_git_and_rebuild_homedirs_incremental(context, mocker, event_loop, exc):
+    calls = []
+
+    async def new_revision(*args, **kwargs):
+        return ("new", "tag")
+
+    def incremental(*args, **kwargs):
+        calls.append("incremental")
+        if exc is not None:
+            raise exc
+
+    def full(*args, **kwargs):
+        calls.append("full")
+
+    basedir = os.path.join(context.config['work_dir'], "gpg_homedirs.tmp")
+    makedirs(basedir)
+    mocker.patch.object(sgpg, "rebuild_gpg_home_signed", new=noop_sync)
+    mocker.patch.object(sgpg, "overwrite_gpg_home", new=noop_sync)
+    mocker.patch.object(sgpg, "retry_async", new=new_revision)
+    mocker.patch.object(sgpg, "get_last_good_git_revision", return_value="old")
+    mocker.patch.object(sgpg, "update_gpg_homedirs_from_diff", new=incremental)
+    mocker.patch.object(sgpg, "build_gpg_homedirs_from_repo", new=full)
+    mocker.patch.object(sgpg, "write_last_good_git_revision", new=noop_sync)
+    assert sgpg._update_git_and_rebuild_homedirs(context, basedir=basedir) == "new"
+    if exc is None:
+        assert calls == ["incremental"]
+    else:
+        assert calls == ["incremental", "full"]
+    assert sgpg.get_gpg_homedirs_revision(basedir) == "new"
+
+
 # rebuild_gpg_homedirs {{{1
 @pytest.mark.parametrize("new_rev_found", [True, False])
 def test_rebuild_gpg_homedirs(context, mocker, event_loop, new_rev_found):
@@ -778,6 +1176,70 @@ def test_rebuild_gpg_homedirs_lockfile(context, mocker, event_loop):
     sgpg.rebuild_gpg_homedirs()
 
 
+# versioned gpg homedirs {{{1
+def test_publish_and_gc_gpg_homedir_versions(context):
+    base = context.config['base_gpg_home_dir']
+    # migrate a real base_gpg_home_dir to a symlink
+    makedirs(base)
+    versions = []
+    for _ in range(3):
+        version = sgpg.create_gpg_homedir_version(context)
+        assert os.path.dirname(version) == sgpg.get_gpg_homedir_versions_dir(context)
+        sgpg.publish_gpg_homedir_version(context, version)
+        assert os.path.realpath(base) == version
+        versions.append(version)
+    with sgpg.pin_gpg_homedir_version(context) as pinned:
+        assert pinned == versions[2]
+        # a verification holds versions[1]
+        with open(os.path.join(versions[1], sgpg.GPG_HOMEDIRS_VERSION_LOCK_FILENAME), "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_SH)
+            assert sgpg.gc_gpg_homedir_versions(context) == [versions[0]]
+        assert sgpg.gc_gpg_homedir_versions(context) == [versions[1]]
+    assert os.path.isdir(versions[2])
+    assert os.listdir(sgpg.get_gpg_homedir_versions_dir(context)) == [os.path.basename(versions[2])]
+
+
+def test_pin_gpg_homedir_version_no_symlink(context):
+    with sgpg.pin_gpg_homedir_version(context) as pinned:
+        assert pinned == context.config['base_gpg_home_dir']
+
+
+def test_pin_gpg_homedir_version_missing(context):
+    version = os.path.join(sgpg.get_gpg_homedir_versions_dir(context), "missing")
+    rm(context.config['base_gpg_home_dir'])
+    makedirs(os.path.dirname(context.config['base_gpg_home_dir']))
+    os.symlink(version, context.config['base_gpg_home_dir'])
+    with pytest.raises(ScriptWorkerGPGException):
+        with sgpg.pin_gpg_homedir_version(context):
+            pass
+
+
+@pytest.mark.parametrize("new_revision", ("new", None))
+def test_rebuild_gpg_homedirs_publish(context, mocker, new_revision):
+    def fake_context(*args):
+        return (context, None)
+
+    def fake_rebuild(context, basedir=None):
+        touch(os.path.join(basedir, "built"))
+        return new_revision
+
+    old_version = sgpg.create_gpg_homedir_version(context)
+    sgpg.publish_gpg_homedir_version(context, old_version)
+    # left over from the older .tmp dir handoff
+    makedirs(sgpg.get_tmp_base_gpg_home_dir(context))
+    sgpg.create_lockfile(context, message="ready")
+    mocker.patch.object(sgpg, "get_context_from_cmdln", new=fake_context)
+    mocker.patch.object(sgpg, "update_logging_config", new=noop_sync)
+    mocker.patch.object(sgpg, "_update_git_and_rebuild_homedirs", new=fake_rebuild)
+    sgpg.rebuild_gpg_homedirs()
+    base = context.config['base_gpg_home_dir']
+    versions = os.listdir(sgpg.get_gpg_homedir_versions_dir(context))
+    assert len(versions) == 1
+    assert os.path.exists(os.path.join(base, "built")) is bool(new_revision)
+    assert not os.path.exists(sgpg.get_tmp_base_gpg_home_dir(context))
+    assert not os.path.exists(context.config['gpg_lockfile'])
+
+
 # last_good_git_revision {{{1
 def test_last_good_git_revision_exists(context):
     try:
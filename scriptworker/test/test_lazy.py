@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Test scriptworker.lazy
+"""
+import json
+import mock
+import os
+import pytest
+import subprocess
+import sys
+from scriptworker.lazy import LazyModule, lazy_import
+
+HEAVY_MODULES = ("aiohttp", "arrow", "gnupg", "jsonschema", "pexpect", "taskcluster", "yaml")
+
+
+# lazy_import {{{1
+def test_lazy_import():
+    lazy_path = lazy_import("os.path")
+    assert isinstance(lazy_path, LazyModule)
+    assert lazy_path.join("a", "b") == os.path.join("a", "b")
+    assert repr(lazy_path) == "<lazy module 'os.path'>"
+    with pytest.raises(AttributeError):
+        lazy_path.nonexistent_attribute
+
+
+def test_lazy_import_patch():
+    lazy_path = lazy_import("os.path")
+    with mock.patch.object(os.path, "join", return_value="patched"):
+        assert lazy_path.join("a", "b") == "patched"
+    assert lazy_path.join("a", "b") == os.path.join("a", "b")
+
+
+@pytest.mark.parametrize("module", ("scriptworker.client", "scriptworker.worker", "scriptworker.cot.verify"))
+def test_no_heavy_imports(module):
+    output = subprocess.check_output([
+        sys.executable, "-c",
+        "import json, sys; import {}; print(json.dumps(sorted(sys.modules)))".format(module)
+    ])
+    loaded = set([name.split('.')[0] for name in json.loads(output.decode('utf-8'))])
+    assert loaded.isdisjoint(HEAVY_MODULES)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Test scriptworker.limits
+"""
+import os
+import pytest
+import resource
+import signal
+import subprocess
+import sys
+import scriptworker.limits as limits
+from . import event_loop, read, rw_context as context
+
+assert event_loop, context  # silence pyflakes
+
+
+# get_rlimits {{{1
+def test_get_rlimits(context):
+    assert limits.get_rlimits(context.config) == []
+    context.config['task_rlimit_as'] = 2 ** 30
+    context.config['task_rlimit_cpu'] = 60
+    context.config['task_rlimit_nofile'] = 64
+    assert limits.get_rlimits(context.config) == [
+        (resource.RLIMIT_AS, (2 ** 30, 2 ** 30)),
+        (resource.RLIMIT_CPU, (60, 61)),
+        (resource.RLIMIT_NOFILE, (64, 64)),
+    ]
+
+
+# get_preexec_fn {{{1
+def test_get_preexec_fn(tmpdir):
+    cgroup = str(tmpdir)
+    output = subprocess.check_output(
+        [sys.executable, "-c", "import os, resource\n"
+         "print(os.getsid(0) == os.getpid(), resource.getrlimit(resource.RLIMIT_NOFILE))"],
+        preexec_fn=limits.get_preexec_fn([(resource.RLIMIT_NOFILE, (64, 64))], cgroup),
+    )
+    assert output.decode('utf-8') == "True (64, 64)\n"
+    assert read(os.path.join(cgroup, "cgroup.procs")) == "0"
+
+
+# create_task_cgroup {{{1
+def test_create_task_cgroup(context, tmpdir):
+    assert limits.create_task_cgroup(context.config) is None
+    context.config['task_cgroup_parent'] = str(tmpdir)
+    context.config['task_cgroup_memory_max'] = 2 ** 30
+    context.config['task_cgroup_cpu_max_percent'] = 150
+    cgroup = limits.create_task_cgroup(context.config)
+    assert os.path.dirname(cgroup) == str(tmpdir)
+    assert os.path.basename(cgroup).startswith("task-")
+    assert read(os.path.join(cgroup, "memory.max")) == str(2 ** 30)
+    assert read(os.path.join(cgroup, "cpu.max")) == "150000 100000"
+    assert not os.path.exists(os.path.join(cgroup, "memory.swap.max"))
+
+
+def test_create_task_cgroup_error(context, tmpdir):
+    context.config['task_cgroup_parent'] = os.path.join(str(tmpdir), "nonexistent")
+    assert limits.create_task_cgroup(context.config) is None
+
+
+# remove_task_cgroup {{{1
+@pytest.mark.asyncio
+async def test_remove_task_cgroup(event_loop, tmpdir):
+    await limits.remove_task_cgroup(None)
+    cgroup = os.path.join(str(tmpdir), "task-1")
+    os.mkdir(cgroup)
+    await limits.remove_task_cgroup(cgroup)
+    assert not os.path.exists(cgroup)
+
+
+@pytest.mark.asyncio
+async def test_remove_task_cgroup_busy(event_loop, tmpdir, mocker):
+    cgroup = str(tmpdir)
+    with open(os.path.join(cgroup, "cgroup.kill"), "w") as fh:
+        fh.write("0")
+    warning = mocker.patch.object(limits.log, "warning")
+    await limits.remove_task_cgroup(cgroup, attempts=2, sleep_time=0)
+    assert read(os.path.join(cgroup, "cgroup.kill")) == "1"
+    assert os.path.exists(cgroup)
+    warning.assert_called_once()
+
+
+# get_limit_breach {{{1
+@pytest.mark.parametrize("returncode,events,expected", (
+    (0, None, None),
+    (-signal.SIGKILL, None, None),
+    (-signal.SIGXCPU, None, ("cpu", "task_rlimit_cpu")),
+    (-signal.SIGXFSZ, None, ("fsize", "file size")),
+    (-signal.SIGKILL, "low 0\nhigh 0\nmax 3\noom 0\noom_kill 0\n", None),
+    (-signal.SIGKILL, "low 0\nhigh 0\nmax 3\noom 1\noom_kill 2\n", ("memory", "2 process(es)")),
+    (1, "low 0\nhigh 0\nmax 3\noom 1\noom_kill 2\n", ("memory", "2 process(es)")),
+    (0, "low 0\nhigh 0\nmax 3\noom 1\noom_kill 2\n", None),
+))
+def test_get_limit_breach(tmpdir, returncode, events, expected):
+    cgroup = None
+    if events is not None:
+        cgroup = str(tmpdir)
+        with open(os.path.join(cgroup, "memory.events"), "w") as fh:
+            fh.write(events)
+    breach = limits.get_limit_breach(returncode, cgroup)
+    if expected is None:
+        assert breach is None
+    else:
+        assert breach[0] == expected[0]
+        assert expected[1] in breach[1]
+
+
+def test_get_limit_breach_no_events(tmpdir):
+    assert limits.get_limit_breach(1, str(tmpdir)) is None
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Test scriptworker.livelog
+"""
+import aiohttp
+import mock
+import pytest
+import scriptworker.livelog as livelog
+import scriptworker.log as swlog
+from . import event_loop, read, rw_context as context
+
+assert event_loop, context  # silence pyflakes
+
+
+# LiveLogClient {{{1
+def test_live_log_client(event_loop):
+    client = livelog.LiveLogClient(max_pending_bytes=8)
+    client("foo\n")
+    client("bar\n")
+    assert list(client.chunks) == [b"foo\n", b"bar\n"]
+    assert client.event.is_set()
+    assert not client.overflowed
+    client("baz\n")
+    assert client.overflowed
+    assert client.pending_bytes == 8
+    client.close()
+    assert client.closed
+
+
+# live log server {{{1
+@pytest.mark.asyncio
+async def test_live_log_server(context, event_loop):
+    context.config['live_log_port'] = 0
+    with swlog.get_log_filehandle(context) as log_fh:
+        log_fh.write("one\n")
+        app = await livelog.start_live_log_server(context, log_fh)
+        async with aiohttp.ClientSession() as session:
+            async with session.get(app['url']) as response:
+                assert response.status == 200
+                assert await response.content.readline() == b"one\n"
+                log_fh.write("two\n")
+                assert await response.content.readline() == b"two\n"
+                log_fh.write("three\n")
+                await livelog.stop_live_log_server(app)
+                assert await response.read() == b"three\n"
+        assert log_fh.listeners == []
+    assert read(swlog.get_log_filename(context)) == "one\ntwo\nthree\n"
+
+
+@pytest.mark.asyncio
+async def test_live_log_server_overflow(context, event_loop):
+    context.config['live_log_port'] = 0
+    context.config['live_log_max_pending_bytes'] = 4
+    with swlog.get_log_filehandle(context) as log_fh:
+        app = await livelog.start_live_log_server(context, log_fh)
+        async with aiohttp.ClientSession() as session:
+            async with session.get(app['url']) as response:
+                # nothing has been sent yet, so the client can't fall behind
+                # until we write without awaiting
+                log_fh.write("one\n")
+                log_fh.write("two\n")
+                body = await response.read()
+        await livelog.stop_live_log_server(app)
+    assert body == b"one\n\n[scriptworker: live log client fell behind; disconnecting]\n"
+
+
+@pytest.mark.asyncio
+async def test_live_log_server_truncated(context, event_loop):
+    context.config['live_log_port'] = 0
+    context.config['task_log_head_bytes'] = 10
+    context.config['task_log_tail_bytes'] = 4
+    with swlog.get_log_filehandle(context) as log_fh:
+        log_fh.write("0123456789abcdefghij")
+        app = await livelog.start_live_log_server(context, log_fh)
+        async with aiohttp.ClientSession() as session:
+            # the head is streamed from disk in several chunks
+            with mock.patch.object(livelog, "LIVE_LOG_CHUNK_SIZE", new=3):
+                async with session.get(app['url']) as response:
+                    assert await response.content.readexactly(10) == b"0123456789"
+                    log_fh.write("klm\n")
+                    await livelog.stop_live_log_server(app)
+                    body = await response.read()
+    expected = b"\n[scriptworker: 6 bytes of task output truncated]\nghijklm\n"
+    assert body == expected
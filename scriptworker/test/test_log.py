@@ -3,6 +3,7 @@
 """Test scriptworker.log
 """
 import asyncio
+import atexit
 from asyncio.subprocess import PIPE
 import logging
 import os
@@ -38,6 +39,49 @@ def test_get_log_filehandle(context, text):
     assert read(log_file) == text + text
 
 
+@pytest.mark.parametrize("head_bytes,tail_bytes,expected,dropped", ((
+    100, 100, "0123456789" * 3, 0
+), (
+    5, 7, "01234\n[scriptworker: 18 bytes of task output truncated]\n3456789", 18
+), (
+    0, 0, "\n[scriptworker: 30 bytes of task output truncated]\n", 30
+)))
+def test_bounded_log_file(context, head_bytes, tail_bytes, expected, dropped):
+    context.config['task_log_head_bytes'] = head_bytes
+    context.config['task_log_tail_bytes'] = tail_bytes
+    with swlog.get_log_filehandle(context) as log_fh:
+        for _ in range(3):
+            log_fh.write("0123456789")
+    assert read(swlog.get_log_filename(context)) == expected
+    assert log_fh.dropped_bytes == dropped
+
+
+def test_bounded_log_file_multibyte(context):
+    context.config['task_log_head_bytes'] = 2
+    context.config['task_log_tail_bytes'] = 6
+    with swlog.get_log_filehandle(context) as log_fh:
+        log_fh.write("a💩b💩c💩")
+    # the head and tail are cut at character boundaries
+    assert read(swlog.get_log_filename(context)) == \
+        "a💩\n[scriptworker: 5 bytes of task output truncated]\nc💩"
+
+
+def test_bounded_log_file_snapshot(context):
+    context.config['task_log_head_bytes'] = 3
+    context.config['task_log_tail_bytes'] = 4
+    with swlog.get_log_filehandle(context) as log_fh:
+        # the tail's first character is split across the dropped bytes and
+        # two chunks
+        for text in ("abc", "xx", "💩", "yz"):
+            log_fh.write(text)
+        path, head_length, tail_chunks = log_fh.get_snapshot()
+        with open(path, "rb") as fh:
+            contents = fh.read(head_length) + b"".join(tail_chunks)
+    expected = "abc\n[scriptworker: 6 bytes of task output truncated]\nyz"
+    assert contents.decode('utf-8') == expected
+    assert read(swlog.get_log_filename(context)) == expected
+
+
 def test_pipe_to_log(context, event_loop):
     cmd = r""">&2 echo "foo" && echo "bar" && exit 0"""
     proc = event_loop.run_until_complete(
@@ -56,6 +100,62 @@ def test_pipe_to_log(context, event_loop):
     assert read(log_file) in ("foo\nbar\n", "bar\nfoo\n")
 
 
+class FakePipe(object):
+    def __init__(self, data):
+        self.data = data
+
+    async def read(self, n):
+        chunk, self.data = self.data[:n], self.data[n:]
+        return chunk
+
+
+@pytest.mark.parametrize("chunk_size", (1, 3, 1024))
+def test_pipe_to_log_chunks(context, text, event_loop, mocker, chunk_size):
+    data = text + "no trailing newline"
+    logged = []
+    mocker.patch.object(swlog.log, "log", new=lambda level, msg: logged.append(msg))
+    with swlog.get_log_filehandle(context) as log_fh:
+        event_loop.run_until_complete(
+            swlog.pipe_to_log(FakePipe(data.encode('utf-8')), filehandles=[log_fh], chunk_size=chunk_size)
+        )
+    assert read(swlog.get_log_filename(context)) == data
+    assert logged == data.splitlines()
+
+
+def test_pipe_to_log_long_line(context, event_loop, mocker):
+    mocker.patch.object(swlog, "MAX_PARTIAL_LINE_LENGTH", new=10)
+    logged = []
+    mocker.patch.object(swlog.log, "log", new=lambda level, msg: logged.append(msg))
+    event_loop.run_until_complete(
+        swlog.pipe_to_log(FakePipe(b"x" * 25 + b"\ny\n"), chunk_size=5)
+    )
+    assert logged == ["x" * 10, "x" * 10, "x" * 5, "y"]
+
+
+def test_pipe_to_log_carriage_return(context, event_loop, mocker):
+    logged = []
+    mocker.patch.object(swlog.log, "log", new=lambda level, msg: logged.append(msg))
+    event_loop.run_until_complete(
+        swlog.pipe_to_log(FakePipe(b"10%\r50%\r100%\ndone\x0bok\n"), chunk_size=4)
+    )
+    assert logged == ["10%\r50%\r100%", "done\x0bok"]
+
+
+def test_pipe_to_log_rate_limit(context, event_loop, mocker):
+    data = "".join(["line {}\n".format(i) for i in range(10)])
+    logged = []
+    mocker.patch.object(swlog.log, "log", new=lambda level, msg: logged.append(msg))
+    with swlog.get_log_filehandle(context) as log_fh:
+        event_loop.run_until_complete(
+            swlog.pipe_to_log(FakePipe(data.encode('utf-8')), filehandles=[log_fh], max_lines_per_second=3)
+        )
+    assert read(swlog.get_log_filename(context)) == data
+    assert logged == [
+        "line 0", "line 1", "line 2",
+        "[7 lines not logged; over the limit of 3 lines per second]",
+    ]
+
+
 def test_update_logging_config_verbose(context):
     swlog.update_logging_config(context, log_name=context.config['log_dir'])
     log = logging.getLogger(context.config['log_dir'])
@@ -80,6 +180,41 @@ def test_update_logging_config_not_verbose(context):
     assert len(log.handlers) == 2
 
 
+def test_update_logging_config_queue(context):
+    context.config['log_via_queue'] = True
+    context.config['log_max_bytes'] = 100
+    context.config['log_num_backups'] = 2
+    log = logging.getLogger(context.config['log_dir'])
+    listener = swlog.update_logging_config(context, log_name=context.config['log_dir'])
+    assert [type(h) for h in log.handlers] == [logging.handlers.QueueHandler, logging.NullHandler]
+    assert [type(h) for h in listener.handlers] == [logging.StreamHandler, logging.handlers.RotatingFileHandler]
+    for i in range(20):
+        log.info("message %d", i)
+    listener.stop()
+    atexit.unregister(listener.stop)
+    path = os.path.join(context.config['log_dir'], "worker.log")
+    # rotation still happens, in the listener thread
+    assert os.path.exists(path + ".1")
+    assert read(path).splitlines()[-1].endswith("message 19")
+
+
+def test_update_logging_config_no_queue(context):
+    assert swlog.update_logging_config(context, log_name=context.config['log_dir']) is None
+
+
+def test_contextual_log_handler_queue(context):
+    context.config['log_via_queue'] = True
+    contextual_path = os.path.join(context.config['artifact_dir'], "test.log")
+    log = logging.getLogger("{}.child".format(context.config['log_dir']))
+    listener = swlog.update_logging_config(context, log_name=context.config['log_dir'])
+    with swlog.contextual_log_handler(context, path=contextual_path, log_obj=log):
+        log.info("foo %s", "bar")
+    listener.stop()
+    atexit.unregister(listener.stop)
+    assert read(contextual_path).endswith("foo bar\n")
+    assert read(os.path.join(context.config['log_dir'], "worker.log")).endswith("foo bar\n")
+
+
 def test_contextual_log_handler(context, mocker):
     contextual_path = os.path.join(context.config['artifact_dir'], "test.log")
     swlog.log.setLevel(logging.DEBUG)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Test scriptworker.loopmon
+"""
+import asyncio
+import pytest
+import time
+import scriptworker.loopmon as loopmon
+from scriptworker.loopmon import LoopLagMonitor, start_loop_monitoring
+from scriptworker.metrics import LOOP_LAG_SECONDS
+from . import event_loop, rw_context as context
+
+assert event_loop, context  # silence pyflakes
+
+
+def block_the_loop(seconds):
+    time.sleep(seconds)
+
+
+# LoopLagMonitor {{{1
+@pytest.mark.asyncio
+async def test_loop_lag_monitor(event_loop, mocker):
+    warning = mocker.patch.object(loopmon.log, "warning")
+    count, _ = LOOP_LAG_SECONDS.get()
+    monitor = LoopLagMonitor(loop=event_loop, interval=0.01, threshold=0.1)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        block_the_loop(0.3)
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+    assert max(monitor.samples) >= 0.2
+    assert LOOP_LAG_SECONDS.get()[0] > count
+    messages = [args[0] for args, _ in warning.call_args_list]
+    assert len(messages) == 1
+    assert "Event loop blocked" in messages[0]
+    assert "block_the_loop" in messages[0]
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_monitor_stop(event_loop, mocker):
+    warning = mocker.patch.object(loopmon.log, "warning")
+    monitor = LoopLagMonitor(loop=event_loop, interval=0.01, threshold=0.05)
+    monitor.start()
+    watchdog = monitor._watchdog
+    await asyncio.sleep(0.02)
+    await monitor.stop()
+    assert not watchdog.is_alive()
+    assert monitor._heartbeat is None
+    # the heartbeat has stopped, but there's no watchdog left to notice
+    block_the_loop(0.1)
+    warning.assert_not_called()
+
+
+def test_percentiles(event_loop):
+    monitor = LoopLagMonitor(loop=event_loop, max_samples=100)
+    assert monitor.percentiles() == {}
+    for i in range(100):
+        monitor.record(i / 100)
+    assert monitor.percentiles() == {"p50": 0.5, "p90": 0.9, "p99": 0.99, "p100": 0.99}
+    assert monitor.percentiles(percents=(0, )) == {"p0": 0}
+    monitor.record(1)
+    assert len(monitor.samples) == 100
+    assert monitor.percentiles()["p100"] == 1
+
+
+# start_loop_monitoring {{{1
+@pytest.mark.asyncio
+async def test_start_loop_monitoring(context, event_loop):
+    context.config['loop_lag_monitor_enabled'] = True
+    context.config['loop_lag_interval'] = 0.01
+    context.config['loop_lag_threshold'] = 1.0
+    monitor = start_loop_monitoring(context, loop=event_loop)
+    try:
+        assert monitor.interval == 0.01
+        assert monitor.threshold == 1.0
+        await asyncio.sleep(0.05)
+        assert monitor.samples
+    finally:
+        await monitor.stop()
+    assert not event_loop.get_debug()
+
+
+def test_start_loop_monitoring_disabled(context, event_loop):
+    assert start_loop_monitoring(context, loop=event_loop) is None
+    assert not event_loop.get_debug()
+
+
+def test_start_loop_monitoring_slow_callbacks(context, event_loop):
+    context.config['asyncio_slow_callback_duration'] = 0.2
+    assert start_loop_monitoring(context, loop=event_loop) is None
+    assert event_loop.get_debug()
+    assert event_loop.slow_callback_duration == 0.2
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Test scriptworker.metrics
+"""
+import aiohttp
+import mock
+import os
+import pytest
+import scriptworker.gpg as gpg
+import scriptworker.metrics as metrics
+import scriptworker.task as task
+from . import event_loop, rw_context as context
+
+assert event_loop, context  # silence pyflakes
+
+
+# Counter and Histogram {{{1
+def test_counter():
+    counter = metrics.Counter("test_total", "A test counter.", labelnames=("status", ), registry=None)
+    counter.inc(status="success")
+    counter.inc(2, status='fail"ure')
+    assert counter.get(status="success") == 1
+    assert counter.collect() == [
+        'test_total{status="fail\\"ure"} 2.0',
+        'test_total{status="success"} 1.0',
+    ]
+    with pytest.raises(ValueError):
+        counter.inc(other="label")
+
+
+def test_histogram():
+    histogram = metrics.Histogram("test_seconds", "A test histogram.", buckets=(1, 5), registry=None)
+    histogram.observe(0.5)
+    histogram.observe(3)
+    histogram.observe(10)
+    assert histogram.get() == (3, 13.5)
+    assert histogram.collect() == [
+        'test_seconds_bucket{le="1.0"} 1',
+        'test_seconds_bucket{le="5.0"} 2',
+        'test_seconds_bucket{le="+Inf"} 3',
+        'test_seconds_count 3',
+        'test_seconds_sum 13.5',
+    ]
+    with pytest.raises(ValueError):
+        with histogram.time():
+            raise ValueError("still observed")
+    assert histogram.get()[0] == 4
+    assert not hasattr(histogram, "inc")
+
+
+def test_generate_latest():
+    registry = []
+    counter = metrics.Counter("test_total", "A test counter.", registry=registry)
+    counter.inc()
+    assert registry == [counter]
+    assert metrics.generate_latest(registry) == \
+        "# HELP test_total A test counter.\n# TYPE test_total counter\ntest_total 1.0\n"
+
+
+# worker metrics {{{1
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tasks,claimed,empty", ((
+    None, 0, 1
+), (
+    {"tasks": [{}, {}]}, 2, 0
+)))
+async def test_claim_work_metrics(context, tasks, claimed, empty):
+    async def claim_work(*args):
+        return tasks
+
+    context.queue = mock.MagicMock()
+    context.queue.claimWork = claim_work
+    old_claimed = metrics.TASKS_CLAIMED.get()
+    old_empty = metrics.EMPTY_CLAIMS.get()
+    old_count = metrics.CLAIM_WORK_SECONDS.get()[0]
+    await task.claim_work(context)
+    assert metrics.TASKS_CLAIMED.get() == old_claimed + claimed
+    assert metrics.EMPTY_CLAIMS.get() == old_empty + empty
+    assert metrics.CLAIM_WORK_SECONDS.get()[0] == old_count + 1
+
+
+def test_gpg_metrics(context):
+    old_count = metrics.GPG_SECONDS.get(operation="check_trustdb")[0]
+    with mock.patch.object(gpg.subprocess, "check_call"):
+        gpg.check_ownertrust(context)
+    assert metrics.GPG_SECONDS.get(operation="check_trustdb")[0] == old_count + 1
+
+
+# metrics server {{{1
+@pytest.mark.asyncio
+async def test_metrics_server_disabled(context):
+    context.config['metrics_enabled'] = False
+    assert await metrics.start_metrics_server(context) is None
+    await metrics.stop_metrics_server(None)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("unix_socket", (True, False))
+async def test_metrics_server(context, unix_socket):
+    registry = []
+    metrics.Counter("test_total", "A test counter.", registry=registry).inc()
+    context.config['metrics_enabled'] = True
+    context.config['metrics_port'] = 0
+    if unix_socket:
+        context.config['metrics_unix_socket'] = os.path.join(context.config['work_dir'], "metrics.sock")
+        connector = aiohttp.UnixConnector(path=context.config['metrics_unix_socket'])
+        url = "http://localhost/metrics"
+    app = await metrics.start_metrics_server(context, registry=registry)
+    if not unix_socket:
+        connector = None
+        url = app['url']
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            async with session.get(url) as response:
+                assert response.status == 200
+                assert await response.text() == metrics.generate_latest(registry)
+    finally:
+        await metrics.stop_metrics_server(app)
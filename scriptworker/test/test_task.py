@@ -10,7 +10,11 @@ import os
 import pprint
 import pytest
 import scriptworker.task as task
+from scriptworker.constants import STATUSES
 import scriptworker.log as log
+import scriptworker.metrics as metrics
+import signal
+import subprocess
 import sys
 import taskcluster.exceptions
 import taskcluster.async
@@ -59,6 +63,24 @@ def test_get_worker_type(defn, result):
     assert task.get_worker_type(defn) == result
 
 
+# get_resource_usage {{{1
+def test_get_resource_usage():
+    fields = ("ru_utime", "ru_stime", "ru_maxrss", "ru_inblock", "ru_oublock", "ru_nvcsw", "ru_nivcsw")
+    before = mock.Mock(**{field: 1 for field in fields})
+    after = mock.Mock(**{field: 3 for field in fields})
+    assert task.get_resource_usage(before, after, 2.5) == {
+        "wallSeconds": 2.5,
+        "userCpuSeconds": 2,
+        "systemCpuSeconds": 2,
+        "maxRssKiB": 3,
+        "blockInputOps": 2,
+        "blockOutputOps": 2,
+        "voluntaryContextSwitches": 2,
+        "involuntaryContextSwitches": 2,
+    }
+    assert task.get_resource_usage(after, after, 2.5)["maxRssKiB"] is None
+
+
 # run_task {{{1
 def test_run_task(context, event_loop):
     status = event_loop.run_until_complete(
@@ -67,15 +89,56 @@ def test_run_task(context, event_loop):
     log_file = log.get_log_filename(context)
     assert read(log_file) in ("bar\nfoo\nexit code: 1\n", "foo\nbar\nexit code: 1\n")
     assert status == 1
+    assert context.resource_usage["wallSeconds"] > 0
+    assert context.resource_usage["userCpuSeconds"] >= 0
+
+
+def test_run_task_resource_usage(context, event_loop):
+    context.config['task_max_timeout'] = 10
+    context.config['task_script'] = (
+        sys.executable, "-c", "import time\nstart = time.process_time()\nwhile time.process_time() - start < .2: pass"
+    )
+    assert event_loop.run_until_complete(task.run_task(context)) == 0
+    usage = context.resource_usage
+    assert usage["userCpuSeconds"] + usage["systemCpuSeconds"] >= .2
+    assert usage["wallSeconds"] >= .2
+
+
+def test_run_task_rlimit_cpu(context, event_loop):
+    context.config['task_max_timeout'] = 10
+    context.config['task_rlimit_cpu'] = 1
+    context.config['task_script'] = (sys.executable, "-c", "while True: pass")
+    old_breaches = metrics.RESOURCE_LIMIT_BREACHES.get(limit="cpu")
+    status = event_loop.run_until_complete(task.run_task(context))
+    assert status == STATUSES['resource-unavailable']
+    assert metrics.RESOURCE_LIMIT_BREACHES.get(limit="cpu") == old_breaches + 1
+    contents = read(log.get_log_filename(context))
+    assert "exit code: {}".format(-signal.SIGXCPU) in contents
+    assert "Resource limit exceeded: the task script exceeded task_rlimit_cpu" in contents
+
+
+def test_run_task_live_log(context, event_loop, mocker):
+    context.config['live_log_enabled'] = True
+    context.config['live_log_port'] = 0
+    stop = mocker.patch.object(task, "stop_live_log_server", wraps=task.stop_live_log_server)
+    status = event_loop.run_until_complete(
+        task.run_task(context)
+    )
+    log_file = log.get_log_filename(context)
+    assert read(log_file) in ("bar\nfoo\nexit code: 1\n", "foo\nbar\nexit code: 1\n")
+    assert status == 1
+    stop.assert_called_once()
 
 
 # report* {{{1
 def test_reportCompleted(context, successful_queue, event_loop):
     context.temp_queue = successful_queue
+    old_completed = metrics.TASKS_COMPLETED.get(status="success")
     event_loop.run_until_complete(
         task.complete_task(context, 0)
     )
     assert successful_queue.info == ["reportCompleted", ('taskId', 'runId'), {}]
+    assert metrics.TASKS_COMPLETED.get(status="success") == old_completed + 1
 
 
 def test_reportFailed(context, successful_queue, event_loop):
@@ -97,18 +160,22 @@ def test_reportException(context, successful_queue, event_loop):
 # complete_task {{{1
 def test_complete_task_409(context, unsuccessful_queue, event_loop):
     context.temp_queue = unsuccessful_queue
+    old_completed = metrics.TASKS_COMPLETED.get(status="success")
     event_loop.run_until_complete(
         task.complete_task(context, 0)
     )
+    assert metrics.TASKS_COMPLETED.get(status="success") == old_completed
 
 
 def test_complete_task_non_409(context, unsuccessful_queue, event_loop):
     unsuccessful_queue.status = 500
     context.temp_queue = unsuccessful_queue
+    old_completed = metrics.TASKS_COMPLETED.get(status="success")
     with pytest.raises(taskcluster.exceptions.TaskclusterRestFailure):
         event_loop.run_until_complete(
             task.complete_task(context, 0)
         )
+    assert metrics.TASKS_COMPLETED.get(status="success") == old_completed
 
 
 # reclaim_task {{{1
@@ -150,31 +217,65 @@ async def test_reclaim_task_mock(context, mocker, event_loop):
     await task.reclaim_task(context, context.task)
 
 
-# max_timeout {{{1
-def test_max_timeout_noop(context):
-    with mock.patch.object(task.log, 'debug') as p:
-        task.max_timeout(context, "invalid_proc", 0)
-        assert not p.called
+# kill_process_group {{{1
+async def _launch(*args):
+    return await asyncio.create_subprocess_exec(
+        *args, stdout=subprocess.PIPE, preexec_fn=os.setsid
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("script,expected", (
+    ("exit 0", "exit"),
+    ("echo started; sleep 30", "sigterm"),
+    ("trap '' TERM; echo started; sleep 30", "sigkill"),
+))
+async def test_kill_process_group(event_loop, script, expected):
+    proc = await _launch("bash", "-c", script)
+    await proc.stdout.readline()
+    if expected == "exit":
+        await proc.wait()
+    start = time.monotonic()
+    assert await task.kill_process_group(proc, 0.5) == expected
+    assert proc.returncode is not None
+    assert time.monotonic() - start < 5
+
+
+# supervise_process {{{1
+@pytest.mark.asyncio
+async def test_supervise_process(event_loop):
+    proc = await _launch("bash", "-c", "echo foo")
+    assert await task.supervise_process(proc, 5, 1, aws=[proc.stdout.read()]) is None
+    assert proc.returncode == 0
+
+
+@pytest.mark.asyncio
+async def test_supervise_process_straggler(event_loop):
+    proc = await _launch("bash", "-c", "sleep 30 & echo started")
+    start = time.monotonic()
+    assert await task.supervise_process(proc, 0.5, 1, aws=[proc.stdout.read()]) == "exit"
+    assert proc.returncode == 0
+    assert time.monotonic() - start < 5
 
 
-def test_max_timeout(context, event_loop):
+def test_run_task_timeout(context, event_loop):
     temp_dir = os.path.join(context.config['work_dir'], "timeout")
     context.config['task_script'] = (
         sys.executable, TIMEOUT_SCRIPT, temp_dir
     )
     context.config['task_max_timeout'] = 3
-    event_loop.run_until_complete(task.run_task(context))
-    try:
-        event_loop.run_until_complete(asyncio.sleep(10))  # Let kill() calls run
-    except RuntimeError:
-        pass
+    context.config['task_kill_grace_period'] = 1
+    status = event_loop.run_until_complete(task.run_task(context))
+    assert status == -signal.SIGTERM
+    assert "the task script was ended by sigterm" in read(log.get_log_filename(context))
     files = {}
     for path in glob.glob(os.path.join(temp_dir, '*')):
-        files[path] = (time.ctime(os.path.getmtime(path)), os.stat(path).st_size)
+        files[path] = (os.path.getmtime(path), os.stat(path).st_size)
         print("{} {}".format(path, files[path]))
+    event_loop.run_until_complete(asyncio.sleep(1))
     for path in glob.glob(os.path.join(temp_dir, '*')):
         print("Checking {}...".format(path))
-        assert files[path] == (time.ctime(os.path.getmtime(path)), os.stat(path).st_size)
+        assert files[path] == (os.path.getmtime(path), os.stat(path).st_size)
     assert len(files.keys()) == 6
 
 
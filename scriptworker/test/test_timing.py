@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Test scriptworker.timing
+"""
+import json
+import os
+import pytest
+from scriptworker.timing import TaskTimer, get_task_timing, log_task_timing, timed, write_task_timing_artifact
+from . import rw_context as context
+
+assert context  # silence pyflakes
+
+
+# TaskTimer {{{1
+def test_task_timer(mocker):
+    fake_time = mocker.patch("scriptworker.timing.time")
+    fake_time.monotonic.side_effect = [10, 11, 13, 14, 16, 17, 19, 20]
+    timer = TaskTimer()
+    with timer.span("one"):
+        pass
+    with pytest.raises(ValueError):
+        with timer.span("two"):
+            raise ValueError("the time is added anyway")
+    with timer.span("one"):
+        pass
+    record = timer.to_dict(taskId="taskId")
+    assert record["taskId"] == "taskId"
+    assert record["totalSeconds"] == 10
+    assert record["phases"] == {
+        "one": {"count": 2, "seconds": 4},
+        "two": {"count": 1, "seconds": 2},
+    }
+
+
+# timed {{{1
+def test_timed(context):
+    with timed(context, "noop"):
+        pass
+    assert get_task_timing(context) is None
+    log_task_timing(context)
+    write_task_timing_artifact(context)
+    assert not os.path.exists(os.path.join(context.config['task_log_dir'], "timing.json"))
+    context.timer = TaskTimer()
+    context.claim_task = {"runId": 1, "status": {"taskId": "taskId"}, "task": {}, "credentials": {}}
+    with timed(context, "phase"):
+        pass
+    record = get_task_timing(context)
+    assert record["taskId"] == "taskId"
+    assert record["runId"] == 1
+    assert record["phases"]["phase"]["count"] == 1
+    assert "resourceUsage" not in record
+    context.resource_usage = {"wallSeconds": 1.5}
+    assert get_task_timing(context)["resourceUsage"] == {"wallSeconds": 1.5}
+
+
+def test_write_task_timing_artifact(context):
+    context.timer = TaskTimer()
+    context.timer.add("phase", 1.5)
+    write_task_timing_artifact(context)
+    with open(os.path.join(context.config['task_log_dir'], "timing.json")) as fh:
+        record = json.load(fh)
+    assert record["phases"] == {"phase": {"count": 1, "seconds": 1.5}}
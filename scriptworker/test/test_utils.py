@@ -196,7 +196,7 @@ def test_retry_async_always_fail(event_loop):
 
 # create_temp_creds {{{1
 def test_create_temp_creds():
-    with mock.patch.object(utils, 'createTemporaryCredentials') as p:
+    with mock.patch('taskcluster.client.createTemporaryCredentials') as p:
         p.return_value = {
             "one": b"one",
             "two": "two",
@@ -253,6 +253,39 @@ def test_filepaths_in_dir(tmpdir):
     assert sorted(utils.filepaths_in_dir(tmpdir)) == filepaths
 
 
+def test_filepaths_in_dir_repeated_prefix(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    os.makedirs(os.path.join("foo", "bar", "foo"))
+    touch(os.path.join("foo", "bar", "foo", "baz"))
+    assert utils.filepaths_in_dir("foo") == ["bar/foo/baz"]
+
+
+# scan_dir {{{1
+def test_scan_dir(tmpdir):
+    os.makedirs(os.path.join(tmpdir, "dir", "subdir"))
+    touch(os.path.join(tmpdir, "dir", "subdir", "file"))
+    touch(os.path.join(tmpdir, "file"))
+    os.symlink(os.path.join(tmpdir, "dir"), os.path.join(tmpdir, "dir_link"))
+    os.symlink(os.path.join(tmpdir, "nonexistent"), os.path.join(tmpdir, "broken_link"))
+    files = utils.scan_dir(tmpdir)
+    assert not isinstance(files, list)
+    files = dict(files)
+    assert sorted(files.keys()) == ["broken_link", "dir/subdir/file", "file"]
+    for filepath in ("dir/subdir/file", "file"):
+        stat = os.stat(os.path.join(tmpdir, filepath))
+        assert files[filepath].st_size == stat.st_size
+        assert files[filepath].st_ino == stat.st_ino
+        assert files[filepath].st_mtime_ns == stat.st_mtime_ns
+
+
+def test_scan_dir_no_context_manager(tmpdir, mocker):
+    """On python 3.5, the scandir iterator isn't a context manager."""
+    touch(os.path.join(tmpdir, "file"))
+    scandir = os.scandir
+    mocker.patch.object(os, "scandir", new=lambda path: iter(list(scandir(path))))
+    assert [filepath for filepath, _ in utils.scan_dir(tmpdir)] == ["file"]
+
+
 # get_hash {{{1
 def test_get_hash():
     path = os.path.join(os.path.dirname(__file__), "data", "azure.xml")
@@ -260,6 +293,41 @@ def test_get_hash():
     assert sha == "584818280d7908da33c810a25ffb838b1e7cec1547abd50c859521229942c5a5"
 
 
+@pytest.mark.parametrize("chunk_size", (7, 1024 * 1024))
+def test_get_hashes(chunk_size):
+    path = os.path.join(os.path.dirname(__file__), "data", "azure.xml")
+    hashes = utils.get_hashes(path, hash_algs=("sha256", "sha512"), chunk_size=chunk_size)
+    assert hashes == {
+        "sha256": utils.get_hash(path, hash_alg="sha256"),
+        "sha512": utils.get_hash(path, hash_alg="sha512"),
+    }
+    assert hashes["sha256"] == "584818280d7908da33c810a25ffb838b1e7cec1547abd50c859521229942c5a5"
+
+
+def test_get_hashes_cache(tmpdir, mocker):
+    utils.clear_hash_cache()
+    path = os.path.join(tmpdir, "foo")
+    with open(path, "w") as fh:
+        fh.write("foo")
+    sha256 = utils.get_hash(path)
+    new = mocker.patch.object(utils.hashlib, "new", wraps=utils.hashlib.new)
+    # cached
+    assert utils.get_hash(path) == sha256
+    assert new.call_count == 0
+    # only the uncached algorithm is computed
+    hashes = utils.get_hashes(path, hash_algs=("sha256", "sha512"))
+    assert hashes["sha256"] == sha256
+    new.assert_called_once_with("sha512")
+    # a changed file is hashed again
+    with open(path, "w") as fh:
+        fh.write("foobar")
+    assert utils.get_hash(path) != sha256
+    assert new.call_count == 2
+    utils.clear_hash_cache()
+    assert utils.get_hash(path) == utils.get_hashes(path)["sha256"]
+    assert new.call_count == 3
+
+
 # makedirs {{{1
 def test_makedirs_empty():
     utils.makedirs(None)
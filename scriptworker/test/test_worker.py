@@ -15,6 +15,7 @@ import shutil
 import sys
 from scriptworker.constants import STATUSES
 from scriptworker.exceptions import ScriptWorkerException
+from scriptworker.utils import makedirs
 import scriptworker.worker as worker
 from . import event_loop, noop_async, noop_sync, rw_context, successful_queue, tmpdir
 
@@ -56,40 +57,25 @@ def test_main(mocker, context, event_loop):
 
 # async_main {{{1
 def test_async_main(context, event_loop, mocker, tmpdir):
-    path = "{}.tmp".format(context.config['base_gpg_home_dir'])
-
-    async def tweak_lockfile(_):
-        path = "{}.tmp".format(context.config['base_gpg_home_dir'])
-        try:
-            os.makedirs(path)
-        except FileExistsError:
-            pass
-        lockfile = context.config['gpg_lockfile']
-        if os.path.exists(lockfile):
-            with open(lockfile, "w") as fh:
-                print("ready:", file=fh)
-        else:
-            with open(lockfile, "w") as fh:
-                print("locked:", file=fh)
-
-    def exit(*args, **kwargs):
-        sys.exit()
-
-    try:
-        mocker.patch.object(worker, 'run_loop', new=tweak_lockfile)
-        mocker.patch.object(asyncio, 'sleep', new=noop_async)
-        mocker.patch.object(worker, 'rm', new=noop_sync)
-        mocker.patch.object(os, 'rename', new=noop_sync)
-        mocker.patch.object(worker, 'rm_lockfile', new=exit)
-        event_loop.run_until_complete(worker.async_main(context))
-        event_loop.run_until_complete(worker.async_main(context))
-        with pytest.raises(SystemExit):
-            event_loop.run_until_complete(
-                worker.async_main(context)
-            )
-    finally:
-        if os.path.exists(path):
-            shutil.rmtree(path)
+    calls = []
+    base = context.config['base_gpg_home_dir']
+    tmp_path = "{}.tmp".format(base)
+    makedirs(tmp_path)
+    with open(context.config['gpg_lockfile'], "w") as fh:
+        print("ready:", file=fh)
+
+    async def fake_run_loop(_):
+        calls.append("run_loop")
+
+    mocker.patch.object(worker, 'run_loop', new=fake_run_loop)
+    mocker.patch.object(asyncio, 'sleep', new=noop_async)
+    event_loop.run_until_complete(worker.async_main(context))
+    assert calls == ["run_loop"]
+    # gpg homedirs are published by rebuild_gpg_homedirs now; the worker
+    # doesn't touch the old .tmp dir handoff
+    assert os.path.isdir(tmp_path)
+    assert not os.path.islink(base)
+    assert os.path.exists(context.config['gpg_lockfile'])
 
 
 # run_loop {{{1
@@ -121,6 +107,35 @@ def test_mocker_run_loop(context, successful_queue, event_loop, verify_cot, mock
     assert status == task
 
 
+def test_mocker_run_loop_timing(context, successful_queue, event_loop, mocker):
+    task = {"foo": "bar", "credentials": {"a": "b"}, "task": {'task_defn': True}}
+
+    async def claim_work(*args, **kwargs):
+        return {'tasks': [deepcopy(task)]}
+
+    def generate_cot(context):
+        with open(os.path.join(context.config['task_log_dir'], "timing.json")) as fh:
+            artifacts.append(json.load(fh))
+
+    context.config['task_timing_artifact'] = True
+    context.queue = successful_queue
+    records = []
+    artifacts = []
+    mocker.patch.object(worker, "claim_work", new=claim_work)
+    mocker.patch.object(worker, "reclaim_task", new=noop_async)
+    mocker.patch.object(worker, "run_task", new=noop_async)
+    mocker.patch.object(worker, "generate_cot", new=generate_cot)
+    mocker.patch.object(worker, "upload_artifacts", new=noop_async)
+    mocker.patch.object(worker, "complete_task", new=noop_async)
+    mocker.patch.object(worker, "log_task_timing", new=lambda c: records.append(c.timer.to_dict()))
+    event_loop.run_until_complete(worker.run_loop(context))
+    assert sorted(records[0]['phases'].keys()) == [
+        "claim_work", "cleanup", "complete_task", "generate_cot", "run_task", "upload_artifacts",
+    ]
+    assert sorted(artifacts[0]['phases'].keys()) == ["claim_work", "run_task"]
+    assert context.timer is None
+
+
 def test_mocker_run_loop_noop(context, successful_queue, event_loop, mocker):
     context.queue = successful_queue
     mocker.patch.object(worker, "claim_work", new=noop_async)
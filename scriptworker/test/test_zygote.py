@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""Test scriptworker.zygote
+"""
+import asyncio
+import os
+import pytest
+import resource
+import signal
+import sys
+import scriptworker.log as swlog
+import scriptworker.task as task
+import scriptworker.zygote as zygote
+from . import event_loop, read, rw_context
+
+assert event_loop, rw_context  # silence pyflakes
+
+
+# constants helpers and fixtures {{{1
+@pytest.yield_fixture(scope='function')
+def context(rw_context, event_loop):
+    rw_context.config['task_zygote_enabled'] = True
+    rw_context.config['task_max_timeout'] = 10
+    yield rw_context
+    if rw_context.zygote is not None:
+        event_loop.run_until_complete(rw_context.zygote.stop())
+
+
+@pytest.yield_fixture(scope='function')
+def running_zygote(event_loop):
+    zyg = zygote.Zygote(sys.executable, preload_modules=("colorsys", ))
+    event_loop.run_until_complete(zyg.start())
+    yield zyg
+    event_loop.run_until_complete(zyg.stop())
+
+
+def write_script(tmpdir, contents):
+    path = os.path.join(str(tmpdir), "script.py")
+    with open(path, "w") as fh:
+        fh.write(contents)
+    return path
+
+
+async def launch(zyg, tmpdir, contents, *args, **kwargs):
+    path = write_script(tmpdir, contents)
+    proc = await zyg.launch([path] + list(args), str(tmpdir), {"FOO": "bar"}, **kwargs)
+    stdout = await proc.stdout.read()
+    stderr = await proc.stderr.read()
+    await proc.wait()
+    return proc, stdout.decode('utf-8'), stderr.decode('utf-8')
+
+
+# Zygote {{{1
+@pytest.mark.asyncio
+async def test_zygote_launch(event_loop, running_zygote, tmpdir):
+    contents = (
+        "import os, sys\n"
+        "print(sys.argv[1:], os.getcwd(), dict(os.environ), 'colorsys' in sys.modules)\n"
+        "print(os.getsid(0) == os.getpid(), file=sys.stderr)\n"
+        "sys.exit(3)\n"
+    )
+    for _ in range(2):
+        proc, stdout, stderr = await launch(running_zygote, tmpdir, contents, "one", "two")
+        assert proc.returncode == 3
+        assert stdout == "['one', 'two'] {} {{'FOO': 'bar'}} True\n".format(str(tmpdir))
+        assert stderr == "True\n"
+        assert proc.rusage.ru_maxrss > 0
+    assert running_zygote.running
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("contents,returncode,stderr", (
+    ("pass\n", 0, ""),
+    ("raise SystemExit\n", 0, ""),
+    ("raise SystemExit('oh no')\n", 1, "oh no\n"),
+    ("raise ValueError('oh no')\n", 1, "ValueError: oh no\n"),
+    ("import os, signal\nos.kill(os.getpid(), signal.SIGTERM)\n", -signal.SIGTERM, ""),
+))
+async def test_zygote_returncode(event_loop, running_zygote, tmpdir, contents, returncode, stderr):
+    proc, _, actual_stderr = await launch(running_zygote, tmpdir, contents)
+    assert proc.returncode == returncode
+    assert actual_stderr.endswith(stderr)
+
+
+@pytest.mark.asyncio
+async def test_zygote_limits(event_loop, running_zygote, tmpdir):
+    cgroup = os.path.join(str(tmpdir), "cgroup")
+    os.mkdir(cgroup)
+    contents = "import resource\nprint(resource.getrlimit(resource.RLIMIT_NOFILE))\n"
+    proc, stdout, _ = await launch(
+        running_zygote, tmpdir, contents, rlimits=[(resource.RLIMIT_NOFILE, (64, 64))], cgroup=cgroup
+    )
+    assert stdout == "(64, 64)\n"
+    assert read(os.path.join(cgroup, "cgroup.procs")) == "0"
+
+
+@pytest.mark.asyncio
+async def test_zygote_exit(event_loop, running_zygote, tmpdir):
+    path = write_script(tmpdir, "import time\nprint('started', flush=True)\ntime.sleep(30)\n")
+    proc = await running_zygote.launch([path], str(tmpdir), {})
+    await proc.stdout.readline()
+    running_zygote.proc.kill()
+    assert await proc.wait() == -signal.SIGKILL
+    assert not running_zygote.running
+    with pytest.raises(OSError):
+        await running_zygote.launch([path], str(tmpdir), {})
+
+
+@pytest.mark.asyncio
+async def test_zygote_bad_preload(event_loop):
+    zyg = zygote.Zygote(sys.executable, preload_modules=("scriptworker_nonexistent_module", ))
+    with pytest.raises(OSError):
+        await zyg.start()
+    assert not zyg.running
+
+
+@pytest.mark.asyncio
+async def test_zygote_start_timeout(event_loop, tmpdir):
+    python = write_script(tmpdir, "#!/bin/sh\nexec sleep 30\n")
+    os.chmod(python, 0o755)
+    zyg = zygote.Zygote(python)
+    with pytest.raises(OSError):
+        await zyg.start(timeout=.1)
+    assert zyg.proc.returncode == -signal.SIGKILL
+    assert not zyg.running
+    await zyg.stop()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("event", (
+    b"not json\n",
+    b'{"event": "started", "id": 12345, "pid": 1}\n',
+))
+async def test_zygote_bad_event(event_loop, running_zygote, event):
+    future = event_loop.create_future()
+    running_zygote._launches[12344] = (future, None, None)
+    running_zygote.proc.stdout.feed_data(event)
+    with pytest.raises(OSError):
+        await asyncio.wait_for(future, 10)
+    assert not running_zygote.running
+
+
+# start_zygote {{{1
+@pytest.mark.asyncio
+async def test_start_zygote(context, event_loop):
+    context.config['task_zygote_enabled'] = False
+    assert await zygote.start_zygote(context) is None
+    context.config['task_zygote_enabled'] = True
+    context.config['task_script'] = (sys.executable, "script.py")
+    zyg = await zygote.start_zygote(context)
+    assert zyg.running
+    assert await zygote.start_zygote(context) is zyg
+
+
+@pytest.mark.asyncio
+async def test_start_zygote_error(context, event_loop):
+    context.config['task_script'] = (os.path.join(os.path.dirname(__file__), "nonexistent"), "script.py")
+    assert await zygote.start_zygote(context) is None
+    assert await zygote.launch_in_zygote(context) is None
+
+
+# run_task {{{1
+def test_run_task_zygote(context, event_loop, tmpdir):
+    path = write_script(tmpdir, "import sys\nprint('foo')\nprint('bar', file=sys.stderr)\nsys.exit(1)\n")
+    context.config['task_script'] = (sys.executable, path)
+    for _ in range(2):
+        status = event_loop.run_until_complete(task.run_task(context))
+        assert status == 1
+        assert read(swlog.get_log_filename(context)) in ("bar\nfoo\nexit code: 1\n", "foo\nbar\nexit code: 1\n")
+        assert context.resource_usage["maxRssKiB"] > 0
+    assert context.zygote.running
+
+
+def test_run_task_zygote_timeout(context, event_loop, tmpdir):
+    path = write_script(tmpdir, "import time\ntime.sleep(30)\n")
+    context.config['task_script'] = (sys.executable, path)
+    context.config['task_max_timeout'] = .5
+    status = event_loop.run_until_complete(task.run_task(context))
+    assert status == -signal.SIGTERM
+    assert "ended by sigterm" in read(swlog.get_log_filename(context))
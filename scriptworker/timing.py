@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""Per-task phase timing.
+
+The worker sets ``context.timer`` to a new ``TaskTimer`` for each task, and
+the task phases are wrapped in ``timed(context, name)``.  When the task is
+done, ``log_task_timing`` logs a json timing record.
+
+Attributes:
+    log (logging.Logger): the log object for the module.
+
+"""
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from scriptworker.utils import format_json, makedirs
+
+log = logging.getLogger(__name__)
+
+
+# TaskTimer {{{1
+class TaskTimer(object):
+    """Add up how long each phase of a task takes.
+
+    Phases are named with dots for sub-phases, e.g.
+    ``verify_chain_of_trust.download_cot``.  A phase that runs more than once,
+    e.g. compressing each artifact, is added up, and its ``count`` is the
+    number of times it ran.
+
+    Attributes:
+        start (float): the ``time.monotonic`` time the timer was created.
+        start_time (float): the unix time the timer was created.
+        phases (dict): ``{name: {"count": int, "seconds": float}}``
+
+    """
+
+    def __init__(self):
+        """Initialize TaskTimer."""
+        self.start = time.monotonic()
+        self.start_time = time.time()
+        self.phases = {}
+
+    def add(self, name, seconds):
+        """Add ``seconds`` to phase ``name``.
+
+        Args:
+            name (str): the phase name.
+            seconds (float): the duration to add.
+
+        """
+        phase = self.phases.setdefault(name, {"count": 0, "seconds": 0.0})
+        phase["count"] += 1
+        phase["seconds"] += seconds
+
+    @contextmanager
+    def span(self, name):
+        """Time the ``with`` block as phase ``name``.
+
+        The time is added even if the block raises.
+
+        Args:
+            name (str): the phase name.
+
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, time.monotonic() - start)
+
+    def to_dict(self, **kwargs):
+        """Get the timing record.
+
+        Args:
+            **kwargs: extra keys to add to the record, e.g. ``taskId``.
+
+        Returns:
+            dict: the timing record.
+
+        """
+        record = dict(kwargs)
+        record.update({
+            "startTime": self.start_time,
+            "totalSeconds": round(time.monotonic() - self.start, 6),
+            "phases": {
+                name: {"count": phase["count"], "seconds": round(phase["seconds"], 6)}
+                for name, phase in self.phases.items()
+            },
+        })
+        return record
+
+
+# timed {{{1
+@contextmanager
+def timed(context, name):
+    """Time the ``with`` block as phase ``name`` of ``context.timer``.
+
+    This is a no-op if ``context.timer`` is None, e.g. outside of the worker.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+        name (str): the phase name.
+
+    """
+    if context.timer is None:
+        yield
+    else:
+        with context.timer.span(name):
+            yield
+
+
+# get_task_timing {{{1
+def get_task_timing(context):
+    """Get the timing record for the current task.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+
+    Returns:
+        dict: the timing record, or None if ``context.timer`` is None.  It
+            includes the task script's ``resourceUsage`` once it's finished.
+
+    """
+    if context.timer is None:
+        return None
+    claim_task = context.claim_task or {}
+    kwargs = {}
+    if context.resource_usage is not None:
+        kwargs['resourceUsage'] = context.resource_usage
+    return context.timer.to_dict(
+        taskId=claim_task.get('status', {}).get('taskId'),
+        runId=claim_task.get('runId'),
+        workerId=context.config['worker_id'],
+        **kwargs
+    )
+
+
+# write_task_timing_artifact {{{1
+def write_task_timing_artifact(context):
+    """Write the timing record so far to ``task_log_dir/timing.json``.
+
+    This is written before ``generate_cot``, so the chain of trust artifact
+    covers it, and uploaded with the other artifacts.  So it doesn't include
+    the ``generate_cot``, upload or ``complete_task`` times; those are only
+    in the worker log.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+
+    """
+    record = get_task_timing(context)
+    if record is None:
+        return
+    makedirs(context.config['task_log_dir'])
+    path = os.path.join(context.config['task_log_dir'], "timing.json")
+    with open(path, "w") as fh:
+        fh.write(format_json(record))
+
+
+# log_task_timing {{{1
+def log_task_timing(context):
+    """Log the timing record for the current task.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+
+    """
+    record = get_task_timing(context)
+    if record is not None:
+        log.info("Task timing: {}".format(json.dumps(record, sort_keys=True)))
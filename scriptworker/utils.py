@@ -5,8 +5,6 @@ Attributes:
     log (logging.Logger): the log object for the module
 
 """
-import aiohttp
-import arrow
 import asyncio
 import functools
 import hashlib
@@ -16,12 +14,24 @@ import os
 import random
 import re
 import shutil
+import threading
+from collections import OrderedDict
 from urllib.parse import unquote, urlparse
-from taskcluster.client import createTemporaryCredentials
 from scriptworker.exceptions import DownloadError, ScriptWorkerException, ScriptWorkerRetryException, ScriptWorkerTaskException
+from scriptworker.lazy import lazy_import
+from scriptworker.metrics import BYTES_DOWNLOADED
+
+aiohttp = lazy_import("aiohttp")
+arrow = lazy_import("arrow")
+taskcluster_client = lazy_import("taskcluster.client")
 
 log = logging.getLogger(__name__)
 
+# ``get_hashes`` results, keyed by (st_dev, st_ino, st_size, st_mtime_ns, hash_alg)
+_HASH_CACHE = OrderedDict()
+_HASH_CACHE_LOCK = threading.Lock()
+_HASH_CACHE_SIZE = 10000
+
 
 # request {{{1
 async def request(context, url, timeout=60, method='get', good=(200, ),
@@ -284,8 +294,9 @@ def create_temp_creds(client_id, access_token, start=None, expires=None,
     start = start or now.datetime
     expires = expires or now.replace(days=31).datetime
     scopes = scopes or ['assume:project:taskcluster:worker-test-scopes', ]
-    creds = createTemporaryCredentials(client_id, access_token, start, expires,
-                                       scopes, name=name)
+    creds = taskcluster_client.createTemporaryCredentials(
+        client_id, access_token, start, expires, scopes, name=name
+    )
     for key, value in creds.items():
         try:
             creds[key] = value.decode('utf-8')
@@ -327,6 +338,42 @@ async def raise_future_exceptions(tasks):
     return result
 
 
+# scan_dir {{{1
+def scan_dir(path):
+    """Find all files in a directory, yielding their relative paths and stats.
+
+    This walks ``path`` with ``os.scandir``, so each file's stat comes from
+    the same pass.  Like ``os.walk``, symlinks to directories aren't followed.
+
+    Args:
+        path (str): the directory path to walk
+
+    Yields:
+        tuple: (relative path, ``os.stat_result``) for each file inside of
+            ``path`` or its subdirectories.
+
+    """
+    dirs = [("", path)]
+    while dirs:
+        rel_dir, abs_dir = dirs.pop()
+        # Exhaust the iterator before yielding, so its directory fd is closed
+        # even if the caller stops early.  (The scandir iterator is only a
+        # context manager on python 3.6+.)
+        entries = list(os.scandir(abs_dir))
+        for entry in entries:
+            rel_path = os.path.join(rel_dir, entry.name)
+            if entry.is_dir():
+                if not entry.is_symlink():
+                    dirs.append((rel_path, entry.path))
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                # broken symlink
+                stat = entry.stat(follow_symlinks=False)
+            yield rel_path, stat
+
+
 # filepaths_in_dir {{{1
 def filepaths_in_dir(path):
     """Find all files in a directory, and return the relative paths to those files.
@@ -339,13 +386,7 @@ def filepaths_in_dir(path):
             subdirectories.
 
     """
-    filepaths = []
-    for root, directories, filenames in os.walk(path):
-        for filename in filenames:
-            filepath = os.path.join(root, filename)
-            filepath = filepath.replace(path, '').lstrip('/')
-            filepaths.append(filepath)
-    return filepaths
+    return [filepath for filepath, _ in scan_dir(path)]
 
 
 # get_hash {{{1
@@ -362,11 +403,67 @@ def get_hash(path, hash_alg="sha256"):
         str: the hexdigest of the hash.
 
     """
-    h = hashlib.new(hash_alg)
+    return get_hashes(path, hash_algs=(hash_alg, ))[hash_alg]
+
+
+# get_hashes {{{1
+def _hash_cache_key(stat, hash_alg):
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, hash_alg)
+
+
+def clear_hash_cache():
+    """Empty the ``get_hashes`` cache."""
+    with _HASH_CACHE_LOCK:
+        _HASH_CACHE.clear()
+
+
+def get_hashes(path, hash_algs=("sha256", ), chunk_size=1024 * 1024, stat=None):
+    """Get several hashes of the file at ``path``, reading it once.
+
+    hashlib releases the GIL while hashing large buffers, so this can be run
+    in threads.
+
+    Hashes are cached by the file's device, inode, size and mtime, so a file
+    is only read again for an algorithm if it has changed.  A hash is only
+    cached if the file's stat is the same before and after reading it.
+
+    Args:
+        path (str): the path to the file to hash.
+        hash_algs (list, optional): the algorithms to use.  Defaults to
+            ``("sha256", )``.
+        chunk_size (int, optional): the number of bytes to read at a time.
+            Defaults to 1MB.
+        stat (os.stat_result, optional): the stat of ``path``, if the caller
+            already has it, e.g. from ``scan_dir``.  Defaults to None.
+
+    Returns:
+        dict: the hexdigests, keyed by algorithm.
+
+    """
+    stat = stat or os.stat(path)
+    digests = {}
+    with _HASH_CACHE_LOCK:
+        for alg in hash_algs:
+            key = _hash_cache_key(stat, alg)
+            if key in _HASH_CACHE:
+                _HASH_CACHE.move_to_end(key)
+                digests[alg] = _HASH_CACHE[key]
+    hashes = {alg: hashlib.new(alg) for alg in hash_algs if alg not in digests}
+    if not hashes:
+        return digests
     with open(path, "rb") as f:
-        for chunk in iter(functools.partial(f.read, 4096), b''):
-            h.update(chunk)
-    return h.hexdigest()
+        for chunk in iter(functools.partial(f.read, chunk_size), b''):
+            for h in hashes.values():
+                h.update(chunk)
+    new_stat = os.stat(path)
+    with _HASH_CACHE_LOCK:
+        for alg, h in hashes.items():
+            digests[alg] = h.hexdigest()
+            if _hash_cache_key(new_stat, alg) == _hash_cache_key(stat, alg):
+                _HASH_CACHE[_hash_cache_key(stat, alg)] = digests[alg]
+        while len(_HASH_CACHE) > _HASH_CACHE_SIZE:
+            _HASH_CACHE.popitem(last=False)
+    return digests
 
 
 # format_json {{{1
@@ -443,6 +540,7 @@ async def download_file(context, url, abs_filename, session=None, chunk_size=128
                 if not chunk:
                     break
                 fd.write(chunk)
+                BYTES_DOWNLOADED.inc(len(chunk))
     log.info("Done")
 
 
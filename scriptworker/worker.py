@@ -5,11 +5,8 @@ Attributes:
     log (logging.Logger): the log object for the module.
 
 """
-import aiohttp
-import arrow
 import asyncio
 import logging
-import os
 import sys
 
 from scriptworker.artifacts import upload_artifacts
@@ -17,10 +14,17 @@ from scriptworker.config import get_context_from_cmdln
 from scriptworker.constants import STATUSES
 from scriptworker.cot.generate import generate_cot
 from scriptworker.cot.verify import ChainOfTrust, verify_chain_of_trust
-from scriptworker.gpg import get_tmp_base_gpg_home_dir, is_lockfile_present, rm_lockfile
 from scriptworker.exceptions import ScriptWorkerException
+from scriptworker.lazy import lazy_import
+from scriptworker.loopmon import start_loop_monitoring
+from scriptworker.metrics import COT_VERIFICATION_SECONDS, start_metrics_server
 from scriptworker.task import claim_work, complete_task, reclaim_task, run_task, worst_level
-from scriptworker.utils import cleanup, rm
+from scriptworker.timing import TaskTimer, log_task_timing, timed, write_task_timing_artifact
+from scriptworker.utils import cleanup
+from scriptworker.zygote import start_zygote
+
+aiohttp = lazy_import("aiohttp")
+arrow = lazy_import("arrow")
 
 log = logging.getLogger(__name__)
 
@@ -40,13 +44,16 @@ async def run_loop(context, creds_key="credentials"):
 
     """
     loop = asyncio.get_event_loop()
-    tasks = await claim_work(context)
+    timer = TaskTimer()
+    with timer.span("claim_work"):
+        tasks = await claim_work(context)
     status = None
     if tasks:
         # Assume only a single task, but should more than one fall through,
         # run them sequentially.  A side effect is our return status will
         # be the status of the final task run.
         for task_defn in tasks.get('tasks', []):
+            context.timer = timer
             context.claim_task = task_defn
             log.info("Going to run task!")
             status = 0
@@ -54,22 +61,34 @@ async def run_loop(context, creds_key="credentials"):
             try:
                 if context.config['verify_chain_of_trust']:
                     chain = ChainOfTrust(context, context.config['cot_job_type'])
-                    await verify_chain_of_trust(chain)
-                status = await run_task(context)
-                generate_cot(context)
+                    with timed(context, "verify_chain_of_trust"), COT_VERIFICATION_SECONDS.time():
+                        await verify_chain_of_trust(chain)
+                with timed(context, "run_task"):
+                    status = await run_task(context)
+                # before generate_cot, so the timing artifact is in chainOfTrust.json
+                if context.config['task_timing_artifact']:
+                    write_task_timing_artifact(context)
+                with timed(context, "generate_cot"):
+                    generate_cot(context)
             except ScriptWorkerException as e:
                 status = worst_level(status, e.exit_code)
                 log.error("Hit ScriptWorkerException: {}".format(e))
             try:
-                await upload_artifacts(context)
+                with timed(context, "upload_artifacts"):
+                    await upload_artifacts(context)
             except ScriptWorkerException as e:
                 status = worst_level(status, e.exit_code)
                 log.error("Hit ScriptWorkerException: {}".format(e))
             except aiohttp.ClientError as e:
                 status = worst_level(status, STATUSES['intermittent-task'])
                 log.error("Hit aiohttp error: {}".format(e))
-            await complete_task(context, status)
-            cleanup(context)
+            with timed(context, "complete_task"):
+                await complete_task(context, status)
+            with timed(context, "cleanup"):
+                cleanup(context)
+            log_task_timing(context)
+            context.timer = None
+            timer = TaskTimer()
             await asyncio.sleep(1)
     await asyncio.sleep(context.config['poll_interval'])
     return status
@@ -85,14 +104,6 @@ async def async_main(context):
     Args:
         context (scriptworker.context.Context): the scriptworker context.
     """
-    tmp_gpg_home = get_tmp_base_gpg_home_dir(context)
-    state = is_lockfile_present(context, "scriptworker", logging.DEBUG)
-    if os.path.exists(tmp_gpg_home) and state == "ready":
-        try:
-            rm(context.config['base_gpg_home_dir'])
-            os.rename(tmp_gpg_home, context.config['base_gpg_home_dir'])
-        finally:
-            rm_lockfile(context)
     await run_loop(context)
     await asyncio.sleep(context.config['poll_interval'])
 
@@ -104,6 +115,9 @@ def main():
     cleanup(context)
     conn = aiohttp.TCPConnector(limit=context.config['aiohttp_max_connections'])
     loop = asyncio.get_event_loop()
+    loop.run_until_complete(start_metrics_server(context))
+    start_loop_monitoring(context, loop=loop)
+    loop.run_until_complete(start_zygote(context))
     with aiohttp.ClientSession(connector=conn) as session:
         context.session = session
         context.credentials = credentials
@@ -0,0 +1,478 @@
+#!/usr/bin/env python
+"""Launch task scripts from a pre-warmed python interpreter.
+
+If ``task_zygote_enabled`` is set, ``task_script`` must be
+``(python, script, args...)``.  The worker starts a zygote: ``python``
+running this file, which imports ``task_zygote_preload_modules`` once.  For
+each task, the zygote forks, and the child runs ``script`` with ``runpy``,
+in the worker's environment and working directory, in a new session, with
+the task's stdout and stderr pipes, resource limits and cgroup.  The task
+script skips the interpreter startup and the preloaded imports, so modules
+that read the environment at import time will see the zygote's environment.
+
+The zygote reaps its children, and reports each task script's exit status
+and rusage back to the worker.
+
+This file is run as a script by the task script's python, which may not
+have the worker's dependencies, so it only imports the standard library.
+
+Attributes:
+    log (logging.Logger): the log object for the module.
+    RUSAGE_FIELDS (tuple): the rusage fields the zygote reports.
+    MAX_REQUEST_SIZE (int): the maximum size of a launch request, in bytes.
+
+"""
+import array
+import asyncio
+import importlib
+import json
+import logging
+import os
+import resource
+import runpy
+import selectors
+import signal
+import socket
+import sys
+import traceback
+import types
+
+log = logging.getLogger(__name__)
+
+RUSAGE_FIELDS = (
+    "ru_utime", "ru_stime", "ru_maxrss", "ru_inblock", "ru_oublock", "ru_nvcsw", "ru_nivcsw",
+)
+MAX_REQUEST_SIZE = 1024 * 1024
+
+
+# Zygote {{{1
+class ZygoteProcess(object):
+    """A task script launched by the zygote.
+
+    This has the parts of the ``asyncio.subprocess.Process`` interface that
+    ``run_task`` uses.
+
+    Attributes:
+        pid (int): the process id.  The task script is its process group
+            leader.
+        stdout (asyncio.StreamReader): the task script's stdout.
+        stderr (asyncio.StreamReader): the task script's stderr.
+        returncode (int): the return code, once the task script has exited.
+        rusage (types.SimpleNamespace): the task script's rusage from
+            ``wait4``, once it has exited.
+
+    """
+
+    def __init__(self, pid, stdout, stderr):
+        """Initialize ZygoteProcess."""
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self.rusage = None
+        self._exited = asyncio.Future()
+
+    def _set_exited(self, returncode, rusage=None):
+        self.returncode = returncode
+        if rusage is not None:
+            self.rusage = types.SimpleNamespace(**rusage)
+        if not self._exited.done():
+            self._exited.set_result(returncode)
+
+    async def wait(self):
+        """Wait for the task script to exit.
+
+        Returns:
+            int: the return code.
+
+        """
+        # shield, so a timed out wait doesn't cancel the other waits
+        return await asyncio.shield(self._exited)
+
+
+class Zygote(object):
+    """A pre-warmed python interpreter that forks task scripts.
+
+    Attributes:
+        python (str): the path to the python interpreter.
+        preload_modules (tuple): the modules to import in the zygote.
+        proc (asyncio.subprocess.Process): the zygote process, once started.
+
+    """
+
+    def __init__(self, python, preload_modules=()):
+        """Initialize Zygote."""
+        self.python = python
+        self.preload_modules = tuple(preload_modules)
+        self.proc = None
+        self._sock = None
+        self._reader = None
+        self._request_id = 0
+        self._launches = {}
+        self._procs = {}
+
+    @property
+    def running(self):
+        """bool: whether the zygote is running."""
+        return self.proc is not None and self.proc.returncode is None and \
+            self._reader is not None and not self._reader.done()
+
+    async def start(self, timeout=60):
+        """Start the zygote, and wait for it to finish its preloads.
+
+        Args:
+            timeout (int, optional): the number of seconds to wait for the
+                zygote to be ready before killing it.  Defaults to 60.
+
+        Raises:
+            OSError: if the zygote exits, or isn't ready within ``timeout``.
+
+        """
+        self._sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            self.proc = await asyncio.create_subprocess_exec(
+                self.python, os.path.abspath(__file__), str(child_sock.fileno()), *self.preload_modules,
+                stdout=asyncio.subprocess.PIPE, stdin=asyncio.subprocess.DEVNULL,
+                pass_fds=(child_sock.fileno(), ),
+            )
+        finally:
+            child_sock.close()
+        try:
+            line = await asyncio.wait_for(self.proc.stdout.readline(), timeout)
+        except asyncio.TimeoutError:
+            self.proc.kill()
+            await self.proc.wait()
+            raise OSError("The zygote wasn't ready within {} seconds".format(timeout))
+        if not line:
+            await self.proc.wait()
+            raise OSError("The zygote exited with {} before it was ready".format(self.proc.returncode))
+        log.info("Started zygote {} with {}, preloading {}".format(
+            self.proc.pid, self.python, self.preload_modules
+        ))
+        self._reader = asyncio.ensure_future(self._read_events())
+
+    async def stop(self, timeout=10):
+        """Stop the zygote.
+
+        Task scripts that are still running are killed, since the zygote
+        can't reap them once it's gone.
+
+        Args:
+            timeout (int, optional): the number of seconds to wait for the
+                zygote to exit before killing it.  Defaults to 10.
+
+        """
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if self.proc is not None and self.proc.returncode is None:
+            try:
+                await asyncio.wait_for(self.proc.wait(), timeout)
+            except asyncio.TimeoutError:
+                self.proc.kill()
+                await self.proc.wait()
+        if self._reader is not None:
+            await self._reader
+
+    async def launch(self, argv, cwd, env, rlimits=(), cgroup=None):
+        """Fork a task script from the zygote.
+
+        Args:
+            argv (list): the script to run, and its arguments.
+            cwd (str): the working directory.
+            env (dict): the environment.
+            rlimits (list, optional): ``(resource, (soft, hard))`` tuples to
+                set in the task script.  Defaults to ().
+            cgroup (str, optional): the path of the cgroup to run the task
+                script in, if any.  Defaults to None.
+
+        Returns:
+            ZygoteProcess: the task script.
+
+        Raises:
+            OSError: if the zygote isn't running, or can't fork.
+
+        """
+        if not self.running:
+            raise OSError("The zygote isn't running")
+        loop = asyncio.get_event_loop()
+        self._request_id += 1
+        request_id = self._request_id
+        request = json.dumps({
+            "id": request_id, "argv": list(argv), "cwd": cwd, "env": dict(env),
+            "rlimits": [list(rlimit) for rlimit in rlimits], "cgroup": cgroup,
+        }).encode('utf-8')
+        if len(request) > MAX_REQUEST_SIZE:
+            raise OSError("The zygote launch request is too large: {} bytes".format(len(request)))
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        transports = []
+        try:
+            for fd in (stdout_read, stderr_read):
+                transports.append(await _connect_read_pipe(fd))
+            future = loop.create_future()
+            self._launches[request_id] = (future, transports[0][1], transports[1][1])
+            self._sock.sendmsg(
+                [request], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", [stdout_write, stderr_write]))]
+            )
+        except Exception:
+            self._launches.pop(request_id, None)
+            for fd in (stdout_read, stderr_read)[len(transports):]:
+                os.close(fd)
+            for transport, _ in transports:
+                transport.close()
+            raise
+        finally:
+            os.close(stdout_write)
+            os.close(stderr_write)
+        return await future
+
+    async def _read_events(self):
+        try:
+            while True:
+                line = await self.proc.stdout.readline()
+                if not line:
+                    break
+                event = json.loads(line.decode('utf-8'))
+                if event['event'] == 'started':
+                    future, stdout, stderr = self._launches.pop(event['id'])
+                    proc = ZygoteProcess(event['pid'], stdout, stderr)
+                    self._procs[proc.pid] = proc
+                    future.set_result(proc)
+                elif event['event'] == 'error':
+                    future, _, _ = self._launches.pop(event['id'])
+                    future.set_exception(
+                        OSError("The zygote can't launch the task script: {}".format(event['message']))
+                    )
+                elif event['event'] == 'exited':
+                    proc = self._procs.pop(event['pid'], None)
+                    if proc is not None:
+                        proc._set_exited(event['returncode'], event['rusage'])
+        except Exception:
+            # we can't trust the zygote's state after an unexpected event
+            log.exception("Unexpected event from the zygote; killing it")
+            try:
+                self.proc.kill()
+            except ProcessLookupError:
+                pass
+        finally:
+            # don't leave launch() waiting on a reader that's gone, however it exited
+            await self.proc.wait()
+            if self._launches or self._procs:
+                log.error("The zygote exited with {}".format(self.proc.returncode))
+            for future, _, _ in self._launches.values():
+                if not future.done():
+                    future.set_exception(OSError("The zygote exited with {}".format(self.proc.returncode)))
+            self._launches = {}
+            # nothing is left to reap these, so kill them
+            for proc in self._procs.values():
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                proc._set_exited(-signal.SIGKILL)
+            self._procs = {}
+
+
+async def _connect_read_pipe(fd):
+    loop = asyncio.get_event_loop()
+    reader = asyncio.StreamReader(loop=loop)
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader, loop=loop), os.fdopen(fd, "rb", 0)
+    )
+    return transport, reader
+
+
+# launch_in_zygote {{{1
+async def start_zygote(context):
+    """Start ``context.zygote``, if ``task_zygote_enabled`` is set and it isn't running.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+
+    Returns:
+        Zygote: the running zygote, or None if ``task_zygote_enabled`` is
+            False or the zygote can't start.
+
+    """
+    if not context.config['task_zygote_enabled']:
+        return None
+    if context.zygote is not None and context.zygote.running:
+        return context.zygote
+    zygote = Zygote(context.config['task_script'][0], context.config['task_zygote_preload_modules'])
+    try:
+        await zygote.start(timeout=context.config['task_zygote_start_timeout'])
+    except OSError as exc:
+        log.warning("Can't start the zygote: {}".format(exc))
+        await zygote.stop()
+        zygote = None
+    context.zygote = zygote
+    return zygote
+
+
+async def launch_in_zygote(context, rlimits=(), cgroup=None):
+    """Launch ``task_script`` from the zygote.
+
+    Args:
+        context (scriptworker.context.Context): the scriptworker context.
+        rlimits (list, optional): ``(resource, (soft, hard))`` tuples to set
+            in the task script.  Defaults to ().
+        cgroup (str, optional): the path of the cgroup to run the task
+            script in, if any.  Defaults to None.
+
+    Returns:
+        ZygoteProcess: the task script, or None if ``task_zygote_enabled`` is
+            False or the zygote can't launch it, so it should be exec'ed.
+
+    """
+    zygote = await start_zygote(context)
+    if zygote is None:
+        return None
+    try:
+        return await zygote.launch(
+            context.config['task_script'][1:], os.getcwd(), os.environ, rlimits=rlimits, cgroup=cgroup
+        )
+    except OSError as exc:
+        log.warning("Can't launch the task script from the zygote; falling back to exec: {}".format(exc))
+        await zygote.stop()
+        context.zygote = None
+        return None
+
+
+# zygote server {{{1
+def _send_event(event):
+    sys.stdout.write(json.dumps(event) + "\n")
+    sys.stdout.flush()
+
+
+def _run_task_script(request, stdout_fd, stderr_fd):
+    """Run the task script in the forked child, and exit."""
+    exitcode = 1
+    try:
+        os.setsid()
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        for fd in (devnull, stdout_fd, stderr_fd):
+            os.close(fd)
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        if request['cgroup']:
+            # writing 0 moves the writing process
+            with open(os.path.join(request['cgroup'], "cgroup.procs"), "w") as fh:
+                fh.write("0")
+        for resource_, limits in request['rlimits']:
+            resource.setrlimit(resource_, tuple(limits))
+        sys.argv = list(request['argv'])
+        try:
+            runpy.run_path(sys.argv[0], run_name="__main__")
+            exitcode = 0
+        except SystemExit as exc:
+            if exc.code is None or isinstance(exc.code, int):
+                exitcode = exc.code or 0
+            else:
+                print(exc.code, file=sys.stderr)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os._exit(exitcode)
+
+
+def _reap_children():
+    while True:
+        try:
+            pid, status, rusage = os.wait4(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        if os.WIFSIGNALED(status):
+            returncode = -os.WTERMSIG(status)
+        else:
+            returncode = os.WEXITSTATUS(status)
+        _send_event({
+            "event": "exited", "pid": pid, "returncode": returncode,
+            "rusage": {field: getattr(rusage, field) for field in RUSAGE_FIELDS},
+        })
+
+
+def serve(control_fd, preload_modules=()):
+    """Run the zygote: preload modules, then fork task scripts on request.
+
+    Args:
+        control_fd (int): the ``SOCK_SEQPACKET`` socket the worker sends
+            launch requests on, with the task script's stdout and stderr.
+        preload_modules (list, optional): the modules to import before
+            forking.  Defaults to ().
+
+    """
+    for module in preload_modules:
+        importlib.import_module(module)
+    sock = socket.fromfd(control_fd, socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    os.close(control_fd)
+    wakeup_read, wakeup_write = os.pipe()
+    os.set_blocking(wakeup_read, False)
+    os.set_blocking(wakeup_write, False)
+    signal.signal(signal.SIGCHLD, lambda *args: None)
+    signal.set_wakeup_fd(wakeup_write)
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    selector.register(wakeup_read, selectors.EVENT_READ)
+    _send_event({"event": "ready", "pid": os.getpid()})
+    fd_size = array.array("i").itemsize
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj == wakeup_read:
+                try:
+                    while os.read(wakeup_read, 1024):
+                        pass
+                except BlockingIOError:
+                    pass
+                _reap_children()
+                continue
+            data, ancdata, _, _ = sock.recvmsg(MAX_REQUEST_SIZE, socket.CMSG_LEN(2 * fd_size))
+            if not data:
+                # the worker closed the socket
+                return
+            fds = array.array("i")
+            for level, type_, cmsg_data in ancdata:
+                if level == socket.SOL_SOCKET and type_ == socket.SCM_RIGHTS:
+                    fds.frombytes(cmsg_data[:len(cmsg_data) - (len(cmsg_data) % fd_size)])
+            request = json.loads(data.decode('utf-8'))
+            try:
+                pid = os.fork()
+            except OSError as exc:
+                _send_event({"event": "error", "id": request['id'], "message": str(exc)})
+            else:
+                if pid == 0:
+                    selector.close()
+                    sock.close()
+                    os.close(wakeup_read)
+                    os.close(wakeup_write)
+                    _run_task_script(request, fds[0], fds[1])
+                _send_event({"event": "started", "id": request['id'], "pid": pid})
+            for fd in fds:
+                os.close(fd)
+
+
+def main(args):
+    """Zygote entry point.
+
+    Args:
+        args (list): the control socket fd, then the modules to preload.
+
+    """
+    serve(int(args[0]), args[1:])
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])